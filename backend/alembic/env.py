@@ -30,6 +30,12 @@ target_metadata = Base.metadata
 # ... etc.
 
 
+def _env_database_url():
+    """DATABASE_URL, or the SQLite file named by SQLITE_PATH (as in database.py)."""
+    sqlite_path = os.getenv("SQLITE_PATH")
+    return os.getenv("DATABASE_URL") or (f"sqlite:///{os.path.abspath(sqlite_path)}" if sqlite_path else None)
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -43,7 +49,7 @@ def run_migrations_offline() -> None:
 
     """
     # Use environment variable for database URL
-    url = os.getenv("DATABASE_URL") or config.get_main_option("sqlalchemy.url")
+    url = _env_database_url() or config.get_main_option("sqlalchemy.url")
     context.configure(
         url=url,
         target_metadata=target_metadata,
@@ -63,7 +69,7 @@ def run_migrations_online() -> None:
 
     """
     # Use environment variable for database URL
-    database_url = os.getenv("DATABASE_URL")
+    database_url = _env_database_url()
     if database_url:
         # Override the config with environment variable
         config.set_main_option("sqlalchemy.url", database_url)
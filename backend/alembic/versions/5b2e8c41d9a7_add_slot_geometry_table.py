@@ -0,0 +1,49 @@
+"""add_slot_geometry_table
+
+Revision ID: 5b2e8c41d9a7
+Revises: d74b7f1e5938
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e8c41d9a7'
+down_revision: Union[str, Sequence[str], None] = 'd74b7f1e5938'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('slot_geometry',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('inventory_list_id', sa.String(), nullable=False),
+        sa.Column('tray_config_id', sa.Integer(), nullable=False),
+        sa.Column('buffer_pct', sa.Float(), nullable=False),
+        sa.Column('sku_id', sa.String(), nullable=False),
+        sa.Column('length_in', sa.Float(), nullable=True),
+        sa.Column('width_in', sa.Float(), nullable=True),
+        sa.Column('height_in', sa.Float(), nullable=True),
+        sa.Column('height_orientation', sa.String(), nullable=True),
+        sa.Column('layers', sa.Float(), nullable=True),
+        sa.Column('grid_dim1', sa.Float(), nullable=True),
+        sa.Column('grid_dim2', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['inventory_list_id'], ['inventory_lists.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['tray_config_id'], ['tray_configs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('inventory_list_id', 'tray_config_id', 'buffer_pct', 'sku_id', name='uq_slot_geometry_key')
+    )
+    op.create_index(op.f('ix_slot_geometry_id'), 'slot_geometry', ['id'], unique=False)
+    op.create_index('ix_slot_geometry_list_config', 'slot_geometry', ['inventory_list_id', 'tray_config_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_slot_geometry_list_config', table_name='slot_geometry')
+    op.drop_index(op.f('ix_slot_geometry_id'), table_name='slot_geometry')
+    op.drop_table('slot_geometry')
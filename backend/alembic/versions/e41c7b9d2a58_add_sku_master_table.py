@@ -0,0 +1,108 @@
+"""add_sku_master_table
+
+Moves description and dimensions out of inventory into a shared skus table
+with integer ids. inventory.sku_id and daily_sales.sku_id become integer
+foreign keys to skus.id. A code listed with different attributes in several
+lists keeps those of its most recent inventory row.
+
+Revision ID: e41c7b9d2a58
+Revises: 5b2e8c41d9a7
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41c7b9d2a58'
+down_revision: Union[str, Sequence[str], None] = '5b2e8c41d9a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SKU_COLUMNS = ['description', 'length_in', 'width_in', 'height_in', 'weight_lb']
+
+
+def _drop_sku_id_indexes(batch_op, table):
+    """Drop the indexes and unique constraints that cover sku_id (names differ between databases)."""
+    inspector = sa.inspect(op.get_bind())
+    for constraint in inspector.get_unique_constraints(table):
+        if 'sku_id' in constraint['column_names'] and constraint['name']:
+            batch_op.drop_constraint(constraint['name'], type_='unique')
+    for index in inspector.get_indexes(table):
+        # PostgreSQL also lists the index behind a unique constraint; it went with the constraint
+        if 'sku_id' in index['column_names'] and not index.get('duplicates_constraint'):
+            batch_op.drop_index(index['name'])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('skus',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sku_code', sa.String(), nullable=False),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('length_in', sa.Float(), nullable=True),
+        sa.Column('width_in', sa.Float(), nullable=True),
+        sa.Column('height_in', sa.Float(), nullable=True),
+        sa.Column('weight_lb', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_skus_id'), 'skus', ['id'], unique=False)
+    op.create_index(op.f('ix_skus_sku_code'), 'skus', ['sku_code'], unique=True)
+
+    # One master row per code, from its most recent inventory row; then codes only seen in sales
+    op.execute(
+        "INSERT INTO skus (sku_code, description, length_in, width_in, height_in, weight_lb) "
+        "SELECT sku_id, description, length_in, width_in, height_in, weight_lb FROM inventory "
+        "WHERE id IN (SELECT MAX(id) FROM inventory WHERE sku_id IS NOT NULL GROUP BY sku_id)"
+    )
+    op.execute(
+        "INSERT INTO skus (sku_code) SELECT DISTINCT sku_id FROM daily_sales "
+        "WHERE sku_id NOT IN (SELECT sku_code FROM skus)"
+    )
+    # Rows without a SKU were never readable by the API (import skips them)
+    op.execute("DELETE FROM inventory WHERE sku_id IS NULL")
+
+    for table in ('inventory', 'daily_sales'):
+        op.add_column(table, sa.Column('sku_key', sa.Integer(), nullable=True))
+        op.execute(f"UPDATE {table} SET sku_key = (SELECT skus.id FROM skus WHERE skus.sku_code = {table}.sku_id)")
+        with op.batch_alter_table(table) as batch_op:
+            _drop_sku_id_indexes(batch_op, table)
+            batch_op.drop_column('sku_id')
+            if table == 'inventory':
+                for column in SKU_COLUMNS:
+                    batch_op.drop_column(column)
+            batch_op.alter_column('sku_key', new_column_name='sku_id', existing_type=sa.Integer(), nullable=False)
+        # Constraints on the renamed column go in a second pass (SQLite rebuilds the table per batch)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.create_foreign_key(f'fk_{table}_sku', 'skus', ['sku_id'], ['id'])
+            if table == 'inventory':
+                batch_op.create_unique_constraint('uq_inventory_sku_list', ['sku_id', 'inventory_list_id'])
+        op.create_index(op.f(f'ix_{table}_sku_id'), table, ['sku_id'], unique=False)
+    op.create_index('ix_daily_sales_list_sku', 'daily_sales', ['inventory_list_id', 'sku_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_daily_sales_list_sku', table_name='daily_sales')
+    for table in ('inventory', 'daily_sales'):
+        op.add_column(table, sa.Column('sku_code', sa.String(), nullable=True))
+        op.execute(f"UPDATE {table} SET sku_code = (SELECT skus.sku_code FROM skus WHERE skus.id = {table}.sku_id)")
+        if table == 'inventory':
+            for column in SKU_COLUMNS:
+                op.add_column(table, sa.Column(column, sa.String() if column == 'description' else sa.Float(), nullable=True))
+                op.execute(f"UPDATE inventory SET {column} = (SELECT skus.{column} FROM skus WHERE skus.id = inventory.sku_id)")
+        with op.batch_alter_table(table) as batch_op:
+            _drop_sku_id_indexes(batch_op, table)
+            batch_op.drop_constraint(f'fk_{table}_sku', type_='foreignkey')
+            batch_op.drop_column('sku_id')
+            batch_op.alter_column('sku_code', new_column_name='sku_id', existing_type=sa.String(), nullable=table != 'daily_sales')
+        if table == 'inventory':
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.create_unique_constraint('uq_inventory_sku_list', ['sku_id', 'inventory_list_id'])
+        op.create_index(op.f(f'ix_{table}_sku_id'), table, ['sku_id'], unique=False)
+    op.drop_index(op.f('ix_skus_sku_code'), table_name='skus')
+    op.drop_index(op.f('ix_skus_id'), table_name='skus')
+    op.drop_table('skus')
@@ -1,8 +1,34 @@
 # Algorithms package for tray optimization
-from .rectpack_algorithm import optimise_rectpack
-from .simple_algorithm import optimise_simple
+# Engine modules are imported lazily (see registry.py) so importing this
+# package does not pull in rectpack or any other heavy dependency.
+from .registry import (
+    EngineSpec,
+    register_engine,
+    resolve_engine,
+    is_registered,
+    load_engine,
+    list_engines,
+    engine_names,
+)
+
+_LAZY_EXPORTS = {
+    'optimise_rectpack': 'rectpack',
+    'optimise_simple': 'simple',
+}
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        return load_engine(_LAZY_EXPORTS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
     'optimise_rectpack',
-    'optimise_simple'
-] 
\ No newline at end of file
+    'optimise_simple',
+    'EngineSpec',
+    'register_engine',
+    'resolve_engine',
+    'is_registered',
+    'load_engine',
+    'list_engines',
+    'engine_names',
+]
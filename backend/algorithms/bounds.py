@@ -0,0 +1,95 @@
+"""
+Lower bounds on the number of trays a set of slot rectangles needs.
+
+All bounds are valid for any packing of the given rectangles without
+rotation, so a plan that reaches the best of them is optimal for its slots.
+With rotation=True the projection bounds use each slot's shorter side, which
+it occupies along both tray axes whichever way it is turned.
+"""
+import numpy as np
+
+TOL = 1e-9
+
+
+def area_bound(w, l, W, L) -> int:
+    """Continuous bound: total slot area over tray area."""
+    w, l = np.asarray(w, dtype=float), np.asarray(l, dtype=float)
+    if not len(w):
+        return 0
+    return int(np.ceil((w * l).sum() / (W * L) - TOL))
+
+
+def l2_bound_1d(sizes, capacity) -> int:
+    """
+    Martello-Toth L2 bound for 1D bin packing, evaluated for every threshold
+    alpha <= capacity / 2 at once using sorted sizes and prefix sums.
+    """
+    s = np.sort(np.asarray(sizes, dtype=float))
+    if not len(s):
+        return 0
+    C = float(capacity)
+    prefix = np.concatenate([[0.0], np.cumsum(s)])
+    total = prefix[-1]
+
+    def count_gt(v):
+        return len(s) - np.searchsorted(s, v, side="right")
+
+    def sum_gt(v):
+        return total - prefix[np.searchsorted(s, v, side="right")]
+
+    def sum_ge(v):
+        return total - prefix[np.searchsorted(s, v, side="left")]
+
+    alpha = np.unique(np.concatenate([[0.0], s[s <= C / 2]]))
+    n1 = count_gt(C - alpha)                         # items that fit with nothing >= alpha
+    n2 = count_gt(C / 2) - n1                        # large items with room for alpha
+    sum2 = sum_gt(C / 2) - sum_gt(C - alpha)
+    sum3 = sum_ge(alpha) - sum_gt(C / 2)             # small items alpha <= s <= C/2
+    spill = np.maximum(0, np.ceil((sum3 - (n2 * C - sum2)) / C - TOL))
+    return int(max(np.ceil(total / C - TOL), (n1 + n2 + spill).max()))
+
+
+def projection_bounds(w, l, W, L):
+    """
+    L2 on the 1D projections: slots longer than half the tray overlap along its
+    length, so they sit side by side and their widths form a 1D bin packing
+    instance with capacity W; likewise widths over half give lengths vs L.
+    """
+    w, l = np.asarray(w, dtype=float), np.asarray(l, dtype=float)
+    return l2_bound_1d(w[l > L / 2], W), l2_bound_1d(l[w > W / 2], L)
+
+
+def weight_bound(total_weight, weight_limit_lb) -> int:
+    if not weight_limit_lb or not total_weight:
+        return 0
+    return int(np.ceil(total_weight / weight_limit_lb - TOL))
+
+
+def lower_bounds(w, l, W, L, total_weight=None, weight_limit_lb=None, rotation=False) -> dict:
+    """All 2D bounds for slot rectangles w x l on W x L trays, plus the best of them."""
+    if rotation:
+        short = np.minimum(np.asarray(w, dtype=float), np.asarray(l, dtype=float))
+        l2_width, l2_length = projection_bounds(short, short, W, L)
+    else:
+        l2_width, l2_length = projection_bounds(w, l, W, L)
+    bounds = {
+        'area': area_bound(w, l, W, L),
+        'l2_width': l2_width,
+        'l2_length': l2_length,
+        'weight': weight_bound(total_weight, weight_limit_lb),
+    }
+    bounds['lower_bound_trays'] = max(bounds.values())
+    return bounds
+
+
+def layout_lower_bounds(tray_layouts, W, L, total_weight=None, weight_limit_lb=None) -> dict:
+    """lower_bounds() for the slots of a 2D tray layout."""
+    slots = [slot for tray in tray_layouts for slot in tray['slots']]
+    w = [slot['width_in'] for slot in slots]
+    l = [slot['length_in'] for slot in slots]
+    rotation = any(slot.get('rotated') is not None for slot in slots)
+    return lower_bounds(w, l, W, L, total_weight, weight_limit_lb, rotation=rotation)
+
+
+def gap_pct(trays, lower_bound) -> float:
+    return round(100 * (trays - lower_bound) / trays, 2) if trays else 0.0
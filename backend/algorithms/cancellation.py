@@ -0,0 +1,61 @@
+"""
+Cooperative cancellation and deadlines for engine runs.
+
+Engines take cancel_token=None or a CancelToken and check it at stage
+boundaries and every PROGRESS_EVERY items of their packing loops:
+- cancelled (DELETE /jobs/{job_id}) raises RunCancelled and the run is dropped;
+- past the deadline the engine stops and returns what it has, with
+  attrs['incomplete'] describing what was left out.
+"""
+import threading
+import time
+
+
+class RunCancelled(Exception):
+    """The run was cancelled through its CancelToken."""
+
+
+class CancelToken:
+    """
+    A cancel flag plus an optional wall-clock deadline (time.time(), so it means
+    the same in every process). The flag is a threading.Event in thread mode or a
+    Manager Event proxy in process mode; a threading.Event does not survive
+    pickling, so a token shipped to a spawned worker keeps only its deadline.
+    """
+
+    def __init__(self, event=None, deadline_ms: int = None):
+        self.event = event if event is not None else threading.Event()
+        self.deadline = time.time() + deadline_ms / 1000 if deadline_ms else None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if isinstance(state["event"], threading.Event):
+            state["event"] = None
+        return state
+
+    def cancel(self):
+        if self.event is not None:
+            self.event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.event is not None and self.event.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def remaining_s(self, default: float = None):
+        """Seconds to the deadline (never negative), or default without one."""
+        return max(0.0, self.deadline - time.time()) if self.deadline is not None else default
+
+    def check(self):
+        """Raise RunCancelled if cancelled; returns True if the deadline has passed."""
+        if self.cancelled:
+            raise RunCancelled("Optimization cancelled")
+        return self.expired
+
+
+def incomplete(reason: str, **details) -> dict:
+    """attrs['incomplete'] of a partial plan."""
+    return {"reason": reason, **details}
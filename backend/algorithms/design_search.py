@@ -0,0 +1,170 @@
+"""
+Tray dimension design-space search.
+
+Every (length, width, depth, buffer) point of a grid is scored with the
+millisecond estimator; optional refinement rounds add the midpoints around
+the estimated Pareto frontier. The frontier points and the best estimates
+are then confirmed with the full packer in a process pool, and the
+confirmed Pareto frontier of tray count vs tray area is returned.
+"""
+import os
+import time
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from .estimator import estimate_trays
+
+# Worker processes for the confirmation runs (default: one per core)
+DESIGN_MAX_WORKERS = int(os.getenv("DESIGN_MAX_WORKERS", "0")) or None
+DESIGN_KEYS = ("tray_length_in", "tray_width_in", "tray_depth_in", "buffer_pct")
+
+
+def parse_values(spec: str, max_values: int = None) -> list:
+    """
+    '96,120,156' or a range 'start:stop:step' (stop included) -> list of floats.
+    ValueError when a dimension would hold more than max_values values,
+    checked before any range is built.
+    """
+    values = []
+    for part in str(spec).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if ":" in part:
+            start, stop, step = (float(v) for v in part.split(":"))
+            if not all(np.isfinite((start, stop, step))):
+                raise ValueError(f"Range bounds must be finite: {part}")
+            if step <= 0:
+                raise ValueError(f"Range step must be positive: {part}")
+            # Length of the arange below (a float: a tiny step can make it overflow an int)
+            count = max(0.0, np.ceil((stop + step / 2 - start) / step))
+            if max_values is not None and len(values) + count > max_values:
+                raise ValueError(f"More than {max_values} values: {part}")
+            values.extend(np.round(np.arange(start, stop + step / 2, step), 4).tolist())
+        else:
+            value = float(part)
+            if not np.isfinite(value):
+                raise ValueError(f"Values must be finite: {part}")
+            values.append(value)
+            if max_values is not None and len(values) > max_values:
+                raise ValueError(f"More than {max_values} values")
+    return sorted(set(values))
+
+
+def pareto_frontier(points: list, trays_key: str) -> list:
+    """
+    Points not dominated on (tray count, tray area), both minimized, by area.
+    Among points with the same count and area the shallowest tray is kept.
+    """
+    ordered = sorted(points, key=lambda p: (p["tray_area_sq_in"], p[trays_key], p["tray_depth_in"], -p["buffer_pct"]))
+    frontier, best = [], float("inf")
+    for point in ordered:
+        if point[trays_key] < best:
+            frontier.append(point)
+            best = point[trays_key]
+    return frontier
+
+
+def _estimate_point(df, point, rotation, weight_limit_lb):
+    """Estimator result for one design point (infeasible when an SKU does not fit)."""
+    try:
+        estimate = estimate_trays(df, rotation=rotation, weight_limit_lb=weight_limit_lb, **point)
+    except ValueError as e:
+        return dict(point, feasible=False, reason=str(e)[:200])
+    return dict(
+        point,
+        feasible=True,
+        tray_area_sq_in=point["tray_length_in"] * point["tray_width_in"],
+        estimated_trays=estimate["estimated_trays"],
+        lower_bound_trays=estimate["lower_bound_trays"],
+        estimated_area_utilization_pct=estimate["estimated_area_utilization_pct"],
+    )
+
+
+def _midpoints(values: list, value: float) -> list:
+    """Midpoints between value and its neighbours in the sorted values, to whole inches."""
+    i = values.index(value)
+    neighbours = values[max(0, i - 1):i] + values[i + 1:i + 2]
+    return [float(round((value + n) / 2)) for n in neighbours]
+
+
+def _confirm_point(df: pd.DataFrame, model: str, kw: dict):
+    """Worker entry point: full pack of one design point, returning only the tray count."""
+    import contextlib
+    import io
+    from .registry import load_engine
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = load_engine(model)(df, **kw)
+    return len(result.attrs.get("tray_layouts", [])), round(time.perf_counter() - started, 2)
+
+
+def search_tray_designs(df: pd.DataFrame, tray_lengths_in, tray_widths_in, tray_depths_in, buffer_pcts=(0.95,), refine_rounds: int = 1, top_k: int = 5, model: str = "rectpack", rotation: bool = False, weight_limit_lb: float = None, max_workers: int = None) -> dict:
+    """
+    Search tray dimensions for the fewest trays per tray area.
+    Returns the estimated points, the confirmed candidates and the confirmed
+    Pareto frontier (tray count vs tray area).
+    """
+    print(f"[DESIGN SEARCH] {len(df)} SKUs, grid {len(tray_lengths_in)}x{len(tray_widths_in)}x{len(tray_depths_in)}x{len(buffer_pcts)}")
+    started = time.perf_counter()
+    lengths, widths = sorted(tray_lengths_in), sorted(tray_widths_in)
+    points = {}
+    pending = [dict(zip(DESIGN_KEYS, p)) for p in itertools.product(lengths, widths, sorted(tray_depths_in), sorted(buffer_pcts))]
+
+    # Coarse grid, then refinement rounds around the estimated frontier
+    for round_no in range(refine_rounds + 1):
+        for point in pending:
+            key = tuple(point[k] for k in DESIGN_KEYS)
+            if key not in points:
+                points[key] = _estimate_point(df, point, rotation, weight_limit_lb)
+        if round_no == refine_rounds:
+            break
+        frontier = pareto_frontier([p for p in points.values() if p["feasible"]], "estimated_trays")
+        pending = [
+            dict({k: point[k] for k in DESIGN_KEYS}, tray_length_in=length, tray_width_in=width)
+            for point in frontier
+            for length in [point["tray_length_in"]] + _midpoints(lengths, point["tray_length_in"])
+            for width in [point["tray_width_in"]] + _midpoints(widths, point["tray_width_in"])
+        ]
+        lengths = sorted(set(lengths) | {p["tray_length_in"] for p in pending})
+        widths = sorted(set(widths) | {p["tray_width_in"] for p in pending})
+    estimate_s = round(time.perf_counter() - started, 2)
+
+    feasible = [p for p in points.values() if p["feasible"]]
+    print(f"[DESIGN SEARCH] Estimated {len(points)} points ({len(feasible)} feasible) in {estimate_s}s")
+    if not feasible:
+        return {"points": list(points.values()), "candidates": [], "frontier": [], "estimate_s": estimate_s, "confirm_s": 0.0}
+
+    # Confirm the estimated frontier plus the top_k estimates with the full packer
+    candidates = {tuple(p[k] for k in DESIGN_KEYS): p for p in pareto_frontier(feasible, "estimated_trays")}
+    for point in sorted(feasible, key=lambda p: (p["estimated_trays"], p["tray_area_sq_in"]))[:top_k]:
+        candidates.setdefault(tuple(point[k] for k in DESIGN_KEYS), point)
+    candidates = list(candidates.values())
+    kws = [dict({k: c[k] for k in DESIGN_KEYS}, rotation=rotation, weight_limit_lb=weight_limit_lb) for c in candidates]
+    workers = min(len(candidates), max_workers or DESIGN_MAX_WORKERS or os.cpu_count() or 1)
+    print(f"[DESIGN SEARCH] Confirming {len(candidates)} candidates with {model} on {workers} workers")
+    confirm_started = time.perf_counter()
+    if workers == 1:
+        results = [_confirm_point(df, model, kw) for kw in kws]
+    else:
+        # spawn: safe when called from a threaded server or from another pool worker
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(_confirm_point, itertools.repeat(df), itertools.repeat(model), kws))
+    confirm_s = round(time.perf_counter() - confirm_started, 2)
+
+    confirmed = [
+        dict(candidate, trays=trays, estimate_error=candidate["estimated_trays"] - trays, pack_s=elapsed)
+        for candidate, (trays, elapsed) in zip(candidates, results)
+    ]
+    frontier = pareto_frontier(confirmed, "trays")
+    print(f"[DESIGN SEARCH] Frontier of {len(frontier)} designs, total {round(time.perf_counter() - started, 2)}s")
+    return {
+        "points": sorted(points.values(), key=lambda p: tuple(p[k] for k in DESIGN_KEYS)),
+        "candidates": confirmed,
+        "frontier": frontier,
+        "estimate_s": estimate_s,
+        "confirm_s": confirm_s,
+    }
@@ -0,0 +1,90 @@
+"""
+Millisecond tray-count estimate without running a packer.
+
+The slots are the ones optimise_rectpack would build (same orientation and
+slot grid math, vectorized), the estimate is their total area over a
+calibrated fill factor, never below the proven lower bound.
+"""
+import time
+import numpy as np
+import pandas as pd
+from .geometry import quantity_column, slot_geometry
+from .bounds import lower_bounds
+
+# Fill factor of rectpack plans (slot area / tray area used), least-squares fit on
+# 40 generated lists of 150-1200 SKUs over tray sizes 24-48 x 72-156 in and buffers 0.85-1.0
+# (mean error 2% of the tray count, worst 6.5%):
+#   fill = FILL_BASE + FILL_PER_SLOT_AREA * mean slot area / tray area
+#                    + FILL_PER_WIDE_SLOTS * share of slots wider than half the tray
+#                    + FILL_PER_SLOT_LENGTH * mean slot length / tray length
+# Large slots and slots that cannot sit side by side leave bigger gaps.
+FILL_BASE = 0.987
+FILL_PER_SLOT_AREA = -0.5505
+FILL_PER_WIDE_SLOTS = -0.0553
+FILL_PER_SLOT_LENGTH = 0.0441
+FILL_MIN = 0.5
+FILL_MAX = 0.99
+
+
+def rectpack_slots(df: pd.DataFrame, tray_width_in: float = 36, tray_length_in: float = 156, tray_depth_in: float = 18, buffer_pct: float = 0.95, rotation: bool = False, stored_geometry: pd.DataFrame = None):
+    """
+    Vectorized version of optimise_rectpack's slot construction (sharing its
+    memoized per-SKU slot geometry).
+    Returns a dict of per-SKU arrays: slot_w, slot_l (whole inches) and copies
+    (how many of that slot the packer receives).
+    """
+    geometry = slot_geometry(df, tray_width_in, tray_length_in, tray_depth_in, buffer_pct, rotation=rotation, stored=stored_geometry)
+    W, L = int(tray_width_in * buffer_pct), int(tray_length_in * buffer_pct)
+    slot_w = np.clip(geometry["slot_w_in"], 1, W)
+    slot_l = np.clip(geometry["slot_l_in"], 1, L)
+
+    quantity = df[quantity_column(df)].to_numpy(dtype=float)
+    quantity = np.where(np.isnan(quantity) | (quantity <= 0), 1, quantity)
+    units_per_slot = np.maximum(1, np.floor(slot_w * slot_l / (geometry["grid_dim1"] * geometry["grid_dim2"])))
+    copies = np.maximum(1, np.ceil(quantity / (geometry["layers"] * units_per_slot))).astype(int)
+    return {"slot_w": slot_w, "slot_l": slot_l, "copies": copies}
+
+
+def fill_factor(w, l, W, L) -> float:
+    """Calibrated expected fill of rectpack trays for slots w x l on W x L trays."""
+    if not len(w):
+        return FILL_MAX
+    fill = (
+        FILL_BASE
+        + FILL_PER_SLOT_AREA * (w * l).mean() / (W * L)
+        + FILL_PER_WIDE_SLOTS * (w > W / 2).mean()
+        + FILL_PER_SLOT_LENGTH * (l / L).mean()
+    )
+    return float(np.clip(fill, FILL_MIN, FILL_MAX))
+
+
+def estimate_trays(df: pd.DataFrame, tray_width_in: float = 36, tray_length_in: float = 156, tray_depth_in: float = 18, buffer_pct: float = 0.95, rotation: bool = False, weight_limit_lb: float = None, stored_geometry: pd.DataFrame = None) -> dict:
+    """
+    Expected tray count and utilization for a list and tray configuration.
+    estimated_trays is never below lower_bound_trays (which no plan can beat).
+    """
+    started = time.perf_counter()
+    W, L = int(tray_width_in * buffer_pct), int(tray_length_in * buffer_pct)
+    oversized = (df["width_in"] > tray_width_in * buffer_pct) | (df["length_in"] > tray_length_in * buffer_pct)
+    if oversized.any():
+        raise ValueError(f"SKUs {df.loc[oversized, 'sku_id'].tolist()} are too large for tray: individual dimensions exceed {tray_width_in * buffer_pct:.1f}x{tray_length_in * buffer_pct:.1f}")
+    slots = rectpack_slots(df, tray_width_in, tray_length_in, tray_depth_in, buffer_pct, rotation, stored_geometry)
+    w = np.repeat(slots["slot_w"], slots["copies"])
+    l = np.repeat(slots["slot_l"], slots["copies"])
+    total_weight = float((df["weight_lb"].fillna(0) * df[quantity_column(df)].fillna(0)).sum()) if weight_limit_lb else None
+    bounds = lower_bounds(w, l, W, L, total_weight, weight_limit_lb, rotation=rotation)
+
+    slot_area = float((w * l).sum())
+    tray_area = W * L
+    fill = fill_factor(w, l, W, L)
+    estimated = max(bounds["lower_bound_trays"], int(np.ceil(slot_area / (tray_area * fill)))) if len(w) else 0
+    return {
+        "estimated_trays": estimated,
+        "lower_bound_trays": bounds["lower_bound_trays"],
+        "lower_bounds": bounds,
+        "fill_factor": round(fill, 3),
+        "estimated_area_utilization_pct": round(100 * slot_area / (estimated * tray_area), 1) if estimated else 0.0,
+        "slots": int(len(w)),
+        "total_slot_area_sq_in": slot_area,
+        "estimate_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
@@ -0,0 +1,395 @@
+import pandas as pd
+import numpy as np
+from .geometry import choose_vertical_orientation, quantity_column, slot_grid
+from .bounds import area_bound, weight_bound
+from .progress import PROGRESS_EVERY
+from .cancellation import incomplete
+
+# Floating point tolerance for coordinate comparisons (inches)
+EPS = 1e-6
+
+# Trays checked per vector pass in best_fit
+BEST_FIT_CHUNK = 32
+
+# Padding for unused box slots: never overlaps and never supports anything
+_EMPTY_BOX = np.array([np.inf, np.inf, np.inf, -np.inf, -np.inf, -np.inf])
+
+
+class _TrayPool:
+    """
+    All trays of one extreme-point run. The extreme points of every tray sit in
+    one flat array (tagged with their tray) and the placed boxes in a padded
+    per-tray array, so one block is screened against every open tray in a few
+    vector operations instead of a Python loop over trays.
+
+    Both are preallocated and grow by doubling. Each point also keeps its room
+    to the far tray walls, one row per axis, for the first fit screen. A
+    removed point is set to infinity in place (no room, fails every cover and
+    duplicate test) and the arrays are compacted once more than half is dead.
+    """
+
+    def __init__(self, width, length, depth, min_size=(0.0, 0.0, 0.0), capacity=64):
+        self.W, self.L, self.D = width, length, depth
+        self.limits = np.array([width, length, depth]) + EPS
+        self.min_size = np.asarray(min_size, dtype=float)   # smallest block: points with less room are dropped
+        capacity = max(int(capacity), 1)
+        self.n_trays = 0
+        self.boxes = np.tile(_EMPTY_BOX, (capacity, 8, 1))  # x0, y0, z0, x1, y1, z1
+        self.n_boxes = np.zeros(capacity, dtype=int)
+        self.free_volume = np.zeros(capacity)
+        self.weight = np.zeros(capacity)
+        self.is_open = np.zeros(capacity, dtype=bool)       # still considered for new blocks
+        self.items = []                                     # per tray: (block index, x, y, z)
+        self.points = np.full((4 * capacity, 3), np.inf)    # extreme points (x, y, z) of all trays
+        self.point_room = np.full((3, 4 * capacity), -np.inf)  # limits - point, per axis
+        self.point_tray = np.zeros(4 * capacity, dtype=int)
+        self.n_points = 0                                   # rows in use, dead ones included
+        self.n_dead = 0
+
+    def open_tray(self):
+        if self.n_trays == len(self.free_volume):
+            grow = len(self.free_volume)
+            self.boxes = np.concatenate([self.boxes, np.tile(_EMPTY_BOX, (grow, self.boxes.shape[1], 1))])
+            self.n_boxes = np.concatenate([self.n_boxes, np.zeros(grow, dtype=int)])
+            self.free_volume = np.concatenate([self.free_volume, np.zeros(grow)])
+            self.weight = np.concatenate([self.weight, np.zeros(grow)])
+            self.is_open = np.concatenate([self.is_open, np.zeros(grow, dtype=bool)])
+        t = self.n_trays
+        self.n_trays += 1
+        self.free_volume[t] = self.W * self.L * self.D
+        self.is_open[t] = True
+        self.items.append([])
+        self._add_points(np.zeros((1, 3)), t)
+        return t
+
+    def close(self, t):
+        self.is_open[t] = False
+        self._remove_points(np.flatnonzero(self.point_tray[:self.n_points] == t))
+
+    def _add_points(self, new_points, t):
+        end = self.n_points + len(new_points)
+        if end > len(self.points):
+            grow = max(len(self.points), len(new_points))
+            self.points = np.concatenate([self.points, np.full((grow, 3), np.inf)])
+            self.point_room = np.concatenate([self.point_room, np.full((3, grow), -np.inf)], axis=1)
+            self.point_tray = np.concatenate([self.point_tray, np.zeros(grow, dtype=int)])
+        self.points[self.n_points:end] = new_points
+        self.point_room[:, self.n_points:end] = (self.limits - new_points).T
+        self.point_tray[self.n_points:end] = t
+        self.n_points = end
+
+    def _remove_points(self, rows):
+        rows = rows[np.isfinite(self.points[rows, 0])]
+        self.points[rows] = np.inf
+        self.point_room[:, rows] = -np.inf
+        self.n_dead += len(rows)
+        if self.n_dead * 2 > self.n_points:
+            live = np.flatnonzero(np.isfinite(self.points[:self.n_points, 0]))
+            n = len(live)
+            self.points[:n] = self.points[live]
+            self.point_room[:, :n] = self.point_room[:, live]
+            self.point_tray[:n] = self.point_tray[live]
+            self.points[n:self.n_points] = np.inf
+            self.point_room[:, n:self.n_points] = -np.inf
+            self.n_points, self.n_dead = n, 0
+
+    def best_fit(self, w, l, h, weight, weight_limit_lb=None):
+        """
+        (tray, position) for a w x l x h box: the fullest open tray with a feasible
+        extreme point, and in it the point with the tightest vertical fit, then
+        back-left. None when no open tray can take the box.
+        """
+        # Cheap screens first: free volume and weight per tray, then points the box fits inside
+        tray_ok = self.is_open[:self.n_trays] & (self.free_volume[:self.n_trays] + EPS >= w * l * h)
+        if weight_limit_lb:
+            tray_ok &= self.weight[:self.n_trays] + weight <= weight_limit_lb + EPS
+        points, point_tray = self.points[:self.n_points], self.point_tray[:self.n_points]
+        room = self.point_room[:, :self.n_points]
+        in_bounds = (room[0] >= w) & (room[1] >= l) & (room[2] >= h) & tray_ok[point_tray]
+        cand = np.flatnonzero(in_bounds)
+        if not len(cand):
+            return None
+
+        # Fullest trays first, a chunk at a time: the first chunk with a feasible
+        # point holds the best fit, so the rest never need the full check
+        trays = np.unique(point_tray[cand])
+        trays = trays[np.argsort(self.free_volume[trays], kind="stable")]
+        rank = np.empty(self.n_trays, dtype=int)
+        rank[trays] = np.arange(len(trays))
+        cand_rank = rank[point_tray[cand]]
+        for start in range(0, len(trays), BEST_FIT_CHUNK):
+            chunk = cand[(cand_rank >= start) & (cand_rank < start + BEST_FIT_CHUNK)]
+            fit = self._feasible(point_tray[chunk], points[chunk], w, l, h)
+            if fit is not None:
+                return fit
+        return None
+
+    def _feasible(self, t, cand, w, l, h):
+        """Best non-overlapping, supported point among candidate (tray, point) pairs, or None."""
+        b = self.boxes[t, :self.n_boxes[t].max()]
+        x, y, z = cand[:, 0:1], cand[:, 1:2], cand[:, 2:3]
+        overlap = (
+            (x < b[:, :, 3] - EPS) & (x + w > b[:, :, 0] + EPS) &
+            (y < b[:, :, 4] - EPS) & (y + l > b[:, :, 1] + EPS) &
+            (z < b[:, :, 5] - EPS) & (z + h > b[:, :, 2] + EPS)
+        ).any(axis=1)
+        # Above the floor a box must sit completely on top of one placed box
+        supported = (cand[:, 2] <= EPS) | (
+            (np.abs(b[:, :, 5] - z) <= EPS) &
+            (b[:, :, 0] <= x + EPS) & (x + w <= b[:, :, 3] + EPS) &
+            (b[:, :, 1] <= y + EPS) & (y + l <= b[:, :, 4] + EPS)
+        ).any(axis=1)
+        ok = ~overlap & supported
+        if not ok.any():
+            return None
+        t, cand = t[ok], cand[ok]
+
+        headroom = self.D - (cand[:, 2] + h)
+        best = np.lexsort((cand[:, 0], cand[:, 1], headroom, t, self.free_volume[t]))[0]
+        return int(t[best]), cand[best]
+
+    def _project(self, t, point, axis):
+        """Slide a point towards 0 along one axis until it hits a placed box or the wall."""
+        b = self.boxes[t, :self.n_boxes[t]]
+        others = [a for a in range(3) if a != axis]
+        in_path = np.ones(len(b), dtype=bool)
+        for a in others:
+            in_path &= (b[:, a] <= point[a] + EPS) & (point[a] < b[:, a + 3] - EPS)
+        in_path &= b[:, axis + 3] <= point[axis] + EPS
+        projected = list(point)
+        projected[axis] = b[in_path, axis + 3].max() if in_path.any() else 0.0
+        return tuple(projected)
+
+    def place(self, t, block_index, pos, w, l, h, weight):
+        x, y, z = pos
+        if self.n_boxes[t] == self.boxes.shape[1]:
+            self.boxes = np.concatenate([self.boxes, np.tile(_EMPTY_BOX, self.boxes.shape[:2] + (1,))], axis=1)
+        self.boxes[t, self.n_boxes[t]] = (x, y, z, x + w, y + l, z + h)
+        self.n_boxes[t] += 1
+        self.items[t].append((block_index, x, y, z))
+        self.free_volume[t] -= w * l * h
+        self.weight[t] += weight
+
+        # Drop points now covered by the new box, add its three corner points
+        # plus their projections back onto the nearest box face or tray wall
+        mine = np.flatnonzero(self.point_tray[:self.n_points] == t)
+        p = self.points[mine]
+        covered = mine[
+            (p[:, 0] >= x - EPS) & (p[:, 0] < x + w - EPS) &
+            (p[:, 1] >= y - EPS) & (p[:, 1] < y + l - EPS) &
+            (p[:, 2] >= z - EPS) & (p[:, 2] < z + h - EPS)
+        ]
+        new_points = np.array([
+            (x + w, y, z), self._project(t, (x + w, y, z), 1), self._project(t, (x + w, y, z), 2),
+            (x, y + l, z), self._project(t, (x, y + l, z), 0), self._project(t, (x, y + l, z), 2),
+            (x, y, z + h), self._project(t, (x, y, z + h), 0), self._project(t, (x, y, z + h), 1),
+        ])
+        # Keep only points with room for the smallest block and not already known
+        new_points = new_points[(new_points + self.min_size <= self.limits).all(axis=1)]
+        new_points = np.unique(new_points, axis=0)
+        duplicate = (np.abs(new_points[:, None, :] - p[None, :, :]) <= EPS).all(axis=2).any(axis=1)
+        self._remove_points(covered)
+        self._add_points(new_points[~duplicate], t)
+
+def build_blocks(df_work, quantity_col, effective_tray_width, effective_tray_length, effective_tray_depth, weight_limit_lb=None):
+    """
+    Split every SKU into blocks: a cols x rows footprint grid stacked only as
+    high as its units need. Full blocks use every layer that fits the tray
+    depth; the last block of a SKU is shorter, leaving room above it.
+    Returns a DataFrame with one row per block.
+    """
+    quantity = df_work[quantity_col].fillna(1).clip(lower=1).to_numpy(dtype=float)
+    dim1 = df_work["grid_dim1"].to_numpy(dtype=float)
+    dim2 = df_work["grid_dim2"].to_numpy(dtype=float)
+    unit_height = df_work["unit_height"].to_numpy(dtype=float)
+    max_layers = df_work["layers"].to_numpy(dtype=float)
+    unit_weight = df_work["weight_lb"].fillna(0).clip(lower=0).to_numpy(dtype=float)
+
+    # Footprint grid sized for the units of one full-height block (same slot search as rectpack);
+    # SKUs too large for one footprint get the biggest grid the tray allows
+    units_per_layer = np.ceil(quantity / max_layers)
+    grid = slot_grid(units_per_layer, dim1, dim2, effective_tray_width, effective_tray_length)
+    max_cols = np.maximum(1, np.floor(effective_tray_width / dim1))
+    max_rows = np.maximum(1, np.floor(effective_tray_length / dim2))
+    cols = np.where(grid["found"], grid["cols"], max_cols)
+    rows = np.where(grid["found"], grid["rows"], np.minimum(np.ceil(units_per_layer / max_cols), max_rows))
+    per_layer = cols * rows
+
+    capacity = per_layer * max_layers
+    if weight_limit_lb:
+        by_weight = np.where(unit_weight > 0, np.floor(weight_limit_lb / np.where(unit_weight > 0, unit_weight, 1)), np.inf)
+        capacity = np.maximum(1, np.minimum(capacity, by_weight))
+    n_blocks = np.ceil(quantity / capacity).astype(int)
+
+    # One row per block; the last block of each SKU carries the remainder
+    sku_pos = np.repeat(np.arange(len(df_work)), n_blocks)
+    block_no = np.arange(len(sku_pos)) - np.repeat(np.cumsum(n_blocks) - n_blocks, n_blocks)
+    is_last = block_no == n_blocks[sku_pos] - 1
+    remainder = quantity - (n_blocks - 1) * capacity
+    units = np.where(is_last, remainder[sku_pos], capacity[sku_pos])
+
+    # The remainder of a multi-block SKU gets its own, smaller footprint grid
+    rem_grid = slot_grid(np.ceil(remainder / max_layers), dim1, dim2, effective_tray_width, effective_tray_length)
+    regrid = (n_blocks > 1) & rem_grid["found"]
+    rem_cols = np.where(regrid, rem_grid["cols"], cols)
+    rem_rows = np.where(regrid, rem_grid["rows"], rows)
+    block_cols = np.where(is_last, rem_cols[sku_pos], cols[sku_pos])
+    block_rows = np.where(is_last, rem_rows[sku_pos], rows[sku_pos])
+    layers = np.ceil(units / (block_cols * block_rows))
+
+    return pd.DataFrame({
+        "sku_pos": sku_pos,
+        "units": units.astype(int),
+        "layers": layers.astype(int),
+        # Snap up to whole inches but never past the (whole-inch) tray floor, like rectpack
+        "w": np.minimum(np.ceil(block_cols * dim1[sku_pos]), int(effective_tray_width)),
+        "l": np.minimum(np.ceil(block_rows * dim2[sku_pos]), int(effective_tray_length)),
+        "h": layers * unit_height[sku_pos],
+        "weight": units * unit_weight[sku_pos],
+    })
+
+
+def optimise_extreme_point(df: pd.DataFrame, tray_width_in: float = 36, tray_length_in: float = 156, tray_depth_in: float = 18, buffer_pct: float = 0.95, weight_limit_lb: float = None, max_open_trays: int = None, progress=None, cancel_token=None, **kw):
+    """
+    3D extreme-point packing that uses the tray depth directly.
+    Each SKU becomes one or more blocks (footprint grid x only the layers it
+    needs), and short blocks can be stacked on top of each other inside the
+    same footprint instead of each SKU getting its own full-height column.
+
+    Blocks are placed best fit (fullest tray with a feasible point). Passing
+    max_open_trays bounds the search for very large lists at some cost in trays.
+    Past cancel_token's deadline the blocks placed so far are returned as an
+    incomplete plan.
+    """
+    print(f"[EXTREME POINT 3D] Starting optimization with {len(df)} SKUs")
+    print(f"[EXTREME POINT 3D] Tray dimensions: {tray_width_in}x{tray_length_in}x{tray_depth_in}")
+    print(f"[EXTREME POINT 3D] Buffer: {buffer_pct*100}%")
+
+    quantity_col = quantity_column(df)
+    df_work = df.copy()
+
+    # Ensure required columns exist
+    required_columns = ['sku_id', 'width_in', 'length_in', 'height_in', 'weight_lb']
+    missing_columns = [col for col in required_columns if col not in df_work.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {missing_columns}")
+
+    # Check if individual SKUs fit in tray
+    effective_tray_width = tray_width_in * buffer_pct
+    effective_tray_length = tray_length_in * buffer_pct
+    effective_tray_depth = tray_depth_in * buffer_pct
+
+    oversized_skus = df_work[(df_work["width_in"] > effective_tray_width) | (df_work["length_in"] > effective_tray_length)]
+    if not oversized_skus.empty:
+        oversized_list = oversized_skus["sku_id"].tolist()
+        raise ValueError(f"SKUs {oversized_list} are too large for tray: individual dimensions exceed {effective_tray_width:.1f}x{effective_tray_length:.1f}")
+
+    # 1. Vertical orientation per SKU (never stand an item taller than the tray if it can lie down)
+    orientation = choose_vertical_orientation(df_work, effective_tray_depth, must_fit_depth=True)
+    for col, values in orientation.items():
+        df_work[col] = values
+    df_work["grid_dim1"] = df_work["grid_dim1"].clip(lower=0.1)
+    df_work["grid_dim2"] = df_work["grid_dim2"].clip(lower=0.1)
+
+    too_tall = df_work["unit_height"] > effective_tray_depth + EPS
+    if too_tall.any():
+        raise ValueError(f"SKUs {df_work.loc[too_tall, 'sku_id'].tolist()} are too large for tray: every dimension exceeds depth {effective_tray_depth:.1f}")
+
+    # 2. Blocks to place
+    blocks = build_blocks(df_work, quantity_col, effective_tray_width, effective_tray_length, effective_tray_depth, weight_limit_lb)
+    print(f"[EXTREME POINT 3D] Packing {len(blocks)} blocks")
+
+    # Largest footprint first, taller first within a footprint
+    order = np.lexsort((-blocks["h"].to_numpy(), -(blocks["w"] * blocks["l"]).to_numpy()))
+    w_arr, l_arr, h_arr = blocks["w"].to_numpy(), blocks["l"].to_numpy(), blocks["h"].to_numpy()
+    weight_arr = blocks["weight"].to_numpy()
+
+    # 3. Extreme-point placement, best fit over the open trays
+    W, L, D = float(int(effective_tray_width)), float(int(effective_tray_length)), effective_tray_depth
+    # Every block opens at most one tray
+    pool = _TrayPool(W, L, D, min_size=(w_arr.min(), l_arr.min(), h_arr.min()) if len(blocks) else (0.0, 0.0, 0.0), capacity=len(blocks))
+    open_order = []
+    if progress:
+        progress.stage("packing", rects_total=len(blocks), rects_placed=0, trays_open=0)
+    unplaced = []
+    for placed, i in enumerate(order, 1):
+        if cancel_token and placed % PROGRESS_EVERY == 0 and cancel_token.check():
+            unplaced = order[placed - 1:]
+            break
+        w, l, h, weight = w_arr[i], l_arr[i], h_arr[i], weight_arr[i]
+        fit = pool.best_fit(w, l, h, weight, weight_limit_lb)
+        if fit is None:
+            fit = (pool.open_tray(), (0.0, 0.0, 0.0))
+            open_order.append(fit[0])
+            if max_open_trays and len(open_order) > max_open_trays:
+                pool.close(open_order.pop(0))
+        pool.place(fit[0], i, fit[1], w, l, h, weight)
+        if progress and placed % PROGRESS_EVERY == 0:
+            progress.update(rects_placed=placed, trays_open=pool.n_trays)
+    if progress:
+        progress.update(rects_placed=len(order) - len(unplaced), trays_open=pool.n_trays)
+
+    print(f"[EXTREME POINT 3D] Packed into {pool.n_trays} trays")
+
+    # 4. Tray layouts
+    sku_ids = df_work["sku_id"].to_numpy()
+    block_sku = blocks["sku_pos"].to_numpy()
+    block_units = blocks["units"].to_numpy()
+    block_layers = blocks["layers"].to_numpy()
+    tray_layouts = []
+    trays_per_sku = [set() for _ in range(len(df_work))]
+    used_volume = 0.0
+    for tray_id in range(pool.n_trays):
+        slots = []
+        for i, x, y, z in pool.items[tray_id]:
+            sku_pos = block_sku[i]
+            trays_per_sku[sku_pos].add(tray_id)
+            used_volume += w_arr[i] * l_arr[i] * h_arr[i]
+            slots.append({
+                'sku_id': sku_ids[sku_pos],
+                'x_in': float(x),
+                'y_in': float(y),
+                'z_in': round(float(z), 3),
+                'width_in': float(w_arr[i]),
+                'length_in': float(l_arr[i]),
+                'height_in': round(float(h_arr[i]), 3),
+                'layers': int(block_layers[i]),
+                'units': int(block_units[i]),
+            })
+        tray_layouts.append({
+            'tray_id': tray_id,
+            'weight_lb': round(float(pool.weight[tray_id]), 2),
+            'slots': slots
+        })
+
+    # 5. Result DataFrame
+    first_block = np.searchsorted(block_sku, np.arange(len(df_work)))
+    result_df = df_work.drop(columns=["unit_height"])
+    result_df["units_per_layer"] = (blocks["units"].to_numpy() / np.maximum(block_layers, 1))[first_block].round().astype(int)
+    result_df["slot_w_in"] = w_arr[first_block].astype(int)
+    result_df["slot_l_in"] = l_arr[first_block].astype(int)
+    result_df["blocks"] = np.bincount(block_sku, minlength=len(df_work))
+    result_df["trays_needed"] = [len(t) for t in trays_per_sku]
+    result_df["on_shelf_units"] = result_df[quantity_col]
+
+    result_df.attrs['tray_layouts'] = tray_layouts
+    if len(unplaced):
+        unplaced_skus = sorted({str(sku_ids[block_sku[i]]) for i in unplaced})
+        result_df.attrs['incomplete'] = incomplete('deadline', unplaced_blocks=int(len(unplaced)), unplaced_skus=unplaced_skus)
+        print(f"[EXTREME POINT 3D] Deadline reached: {len(unplaced)} blocks of {len(unplaced_skus)} SKUs not placed")
+    result_df.attrs['engine_stats'] = {
+        'trays_used': pool.n_trays,
+        'blocks_packed': int(len(blocks)),
+        'volume_utilization_pct': round(100 * used_volume / (pool.n_trays * W * L * D), 1) if pool.n_trays else 0,
+    }
+
+    # Lower bounds: volume, floor area of blocks too tall to share a column, weight
+    tall = h_arr > D / 2
+    bounds = {
+        'volume': int(np.ceil((w_arr * l_arr * h_arr).sum() / (W * L * D) - EPS)),
+        'tall_block_area': area_bound(w_arr[tall], l_arr[tall], W, L),
+        'weight': weight_bound(weight_arr.sum(), weight_limit_lb),
+    }
+    bounds['lower_bound_trays'] = max(bounds.values())
+    result_df.attrs['lower_bounds'] = bounds
+    return result_df
@@ -0,0 +1,393 @@
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+import numpy as np
+
+# Per-SKU slot geometry entries kept across requests (least recently used are evicted)
+SLOT_CACHE_SIZE = int(os.getenv("SLOT_CACHE_SIZE", "200000"))
+
+def quantity_column(df: pd.DataFrame) -> str:
+    """
+    Pick the quantity column the optimizers pack for
+    """
+    if 'on_shelf_units' in df.columns:
+        return 'on_shelf_units'
+    elif 'on_hand_units' in df.columns:
+        return 'on_hand_units'
+    return 'annual_units_sold'
+
+def choose_vertical_orientation(df: pd.DataFrame, effective_tray_depth: float, must_fit_depth: bool = False):
+    """
+    Vectorized choice of which item dimension stands vertical.
+    Picks the dimension whose stacked layers use the most of the tray depth
+    (ties prefer height, then width, then length). NaN dimensions count as 1.
+
+    With must_fit_depth=True a dimension taller than the tray depth is only
+    chosen when no other dimension fits.
+
+    Returns a dict of arrays: height_orientation, layers, grid_dim1, grid_dim2, unit_height
+    """
+    height_dim = df["height_in"].to_numpy(dtype=float)
+    width_dim = df["width_in"].to_numpy(dtype=float)
+    length_dim = df["length_in"].to_numpy(dtype=float)
+    height_dim = np.where(np.isnan(height_dim), 1.0, height_dim)
+    width_dim = np.where(np.isnan(width_dim), 1.0, width_dim)
+    length_dim = np.where(np.isnan(length_dim), 1.0, length_dim)
+
+    # Layers per orientation (guard against zero / negative dimensions)
+    layers_height = np.maximum(1, effective_tray_depth // np.maximum(height_dim, 0.1))
+    layers_width = np.maximum(1, effective_tray_depth // np.maximum(width_dim, 0.1))
+    layers_length = np.maximum(1, effective_tray_depth // np.maximum(length_dim, 0.1))
+
+    # Height efficiency (how much of available height is used)
+    height_efficiency = np.nan_to_num(layers_height * height_dim / effective_tray_depth)
+    width_efficiency = np.nan_to_num(layers_width * width_dim / effective_tray_depth)
+    length_efficiency = np.nan_to_num(layers_length * length_dim / effective_tray_depth)
+
+    if must_fit_depth:
+        too_tall = np.stack([height_dim, width_dim, length_dim]) > effective_tray_depth
+        any_fits = ~too_tall.all(axis=0)
+        height_efficiency = np.where(too_tall[0] & any_fits, -np.inf, height_efficiency)
+        width_efficiency = np.where(too_tall[1] & any_fits, -np.inf, width_efficiency)
+        length_efficiency = np.where(too_tall[2] & any_fits, -np.inf, length_efficiency)
+
+    use_height = (height_efficiency >= width_efficiency) & (height_efficiency >= length_efficiency)
+    use_width = ~use_height & (width_efficiency >= length_efficiency)
+    conditions = [use_height, use_width]
+
+    return {
+        "height_orientation": np.select(conditions, ["height", "width"], default="length"),
+        "layers": np.select(conditions, [layers_height, layers_width], default=layers_length),
+        "grid_dim1": np.select(conditions, [width_dim, height_dim], default=height_dim),
+        "grid_dim2": np.select(conditions, [length_dim, length_dim], default=width_dim),
+        "unit_height": np.select(conditions, [height_dim, width_dim], default=length_dim),
+    }
+
+def slot_grid(units, dim1, dim2, effective_tray_width: float, effective_tray_length: float):
+    """
+    Vectorized slot search: for every SKU try cols = 1 .. min(floor(sqrt(units)) + 2, W // dim1),
+    rows = ceil(units / cols), and keep the first arrangement that fits the tray
+    with the fewest empty cells. SKUs where nothing fits get a single-unit slot.
+
+    Returns a dict of arrays: cols, rows, slot_w, slot_l, found
+    """
+    units = np.asarray(units, dtype=float)
+    dim1 = np.asarray(dim1, dtype=float)
+    dim2 = np.asarray(dim2, dtype=float)
+    if len(units) == 0:
+        empty = np.zeros(0)
+        return {"cols": empty, "rows": empty, "slot_w": empty, "slot_l": empty, "found": empty.astype(bool)}
+
+    col_bound = np.minimum(np.floor(np.sqrt(units)) + 2, np.floor(effective_tray_width / dim1))
+    max_cols = int(max(1, np.nanmax(col_bound)))
+    cols = np.arange(1, max_cols + 1, dtype=float)[None, :]
+
+    rows = np.ceil(units[:, None] / cols)
+    fits = (
+        (cols <= col_bound[:, None]) &
+        (cols * dim1[:, None] <= effective_tray_width) &
+        (rows * dim2[:, None] <= effective_tray_length)
+    )
+    waste = np.where(fits, cols * rows - units[:, None], np.inf)
+    best = np.argmin(waste, axis=1)  # first minimum, like a strict '<' scan
+    found = fits.any(axis=1)
+
+    idx = np.arange(len(units))
+    best_cols = np.where(found, cols[0, best], 1)
+    best_rows = np.where(found, rows[idx, best], 1)
+    return {
+        "cols": best_cols,
+        "rows": best_rows,
+        "slot_w": np.where(found, best_cols * dim1, np.minimum(dim1, effective_tray_width)),
+        "slot_l": np.where(found, best_rows * dim2, np.minimum(dim2, effective_tray_length)),
+        "found": found,
+    }
+
+def slot_grid_rotatable(units, dim1, dim2, effective_tray_width: float, effective_tray_length: float):
+    """
+    slot_grid() for both floor orientations of the item (dim1 across the tray
+    width, or dim2 across it). Keeps the orientation with fewer empty cells,
+    the unrotated one on ties. Adds a boolean "rotated" array.
+    """
+    units = np.asarray(units, dtype=float)
+    upright = slot_grid(units, dim1, dim2, effective_tray_width, effective_tray_length)
+    turned = slot_grid(units, dim2, dim1, effective_tray_width, effective_tray_length)
+    waste_upright = np.where(upright["found"], upright["cols"] * upright["rows"] - units, np.inf)
+    waste_turned = np.where(turned["found"], turned["cols"] * turned["rows"] - units, np.inf)
+    rotated = waste_turned < waste_upright
+    grid = {key: np.where(rotated, turned[key], upright[key]) for key in upright}
+    grid["rotated"] = rotated
+    return grid
+
+def standard_sizes(sizes, weights, k: int):
+    """
+    Exact 1D clustering of slot sizes into at most k standard sizes.
+    Each size is rounded up to the smallest standard size that holds it, so the
+    standard sizes are the largest members of contiguous groups of the sorted
+    sizes. A dynamic program over those groups minimizes the added waste
+    sum(weight * (standard - size)), e.g. slot widths weighted by slot length.
+
+    Returns (snapped sizes, sorted standard sizes, added waste)
+    """
+    sizes = np.asarray(sizes, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    values, inverse = np.unique(sizes, return_inverse=True)
+    m = len(values)
+    if m <= k or k < 1:
+        return sizes.copy(), values, 0.0
+
+    value_weight = np.bincount(inverse.ravel(), weights=weights, minlength=m)
+    cum_w = np.concatenate([[0.0], np.cumsum(value_weight)])
+    cum_wv = np.concatenate([[0.0], np.cumsum(value_weight * values)])
+    # cost[i, j]: waste of snapping values i..j up to values[j] (inf where i > j)
+    i, j = np.arange(m)[:, None], np.arange(m)[None, :]
+    cost = values[None, :] * (cum_w[j + 1] - cum_w[i]) - (cum_wv[j + 1] - cum_wv[i])
+    cost = np.where(i <= j, cost, np.inf)
+
+    # best[g, j]: least waste covering values 0..j with g + 1 groups; start[g, j]: first value of the last group
+    best = np.full((k, m), np.inf)
+    start = np.zeros((k, m), dtype=int)
+    best[0] = cost[0]
+    for g in range(1, k):
+        # last group i..j after an optimal (g)-group cover of 0..i-1
+        prev = np.concatenate([[np.inf], best[g - 1][:-1]])
+        total = prev[:, None] + cost
+        start[g] = np.argmin(total, axis=0)
+        best[g] = total[start[g], np.arange(m)]
+
+    # Walk back from the cover of all values with k groups
+    standards, j, g = [], m - 1, k - 1
+    while j >= 0:
+        standards.append(values[j])
+        j = (start[g, j] if g > 0 else 0) - 1
+        g -= 1
+    standards = np.array(standards[::-1])
+    snapped = standards[np.searchsorted(standards, sizes, side="left")]
+    return snapped, standards, float(best[k - 1, m - 1])
+
+def standardize_slots(slots: pd.DataFrame, k: int):
+    """
+    Snap slot widths and lengths each to at most k standard sizes (at most k*k
+    distinct slots). Widths go first (standard_sizes weighted by slot length);
+    a wider slot fits more units per row, so its length is cut to the rows it
+    still needs before the lengths are snapped (weighted by the new widths).
+    slots needs slot_w_in, slot_l_in, grid_dim1, grid_dim2, units_per_layer and
+    optionally slot_rotated (grid_dim2 then runs across the tray width).
+
+    Returns (widths, lengths, stats)
+    """
+    w0 = slots["slot_w_in"].to_numpy(dtype=float)
+    l0 = slots["slot_l_in"].to_numpy(dtype=float)
+    widths, standard_widths, _ = standard_sizes(w0, l0, k)
+
+    rotated = slots["slot_rotated"].to_numpy(dtype=bool) if "slot_rotated" in slots else np.zeros(len(slots), dtype=bool)
+    dim1, dim2 = slots["grid_dim1"].to_numpy(dtype=float), slots["grid_dim2"].to_numpy(dtype=float)
+    across, along = np.where(rotated, dim2, dim1), np.where(rotated, dim1, dim2)
+    cols = np.maximum(np.floor(widths / across + 1e-9), 1)
+    needed = np.ceil(np.ceil(slots["units_per_layer"].to_numpy(dtype=float) / cols) * along - 1e-9)
+    lengths, standard_lengths, _ = standard_sizes(np.minimum(l0, needed), widths, k)
+
+    stats = {
+        'max_sizes': int(k),
+        'standard_widths': [int(w) for w in standard_widths],
+        'standard_lengths': [int(l) for l in standard_lengths],
+        'distinct_slot_sizes_before': int(len(set(zip(w0, l0)))),
+        'distinct_slot_sizes': int(len(set(zip(widths, lengths)))),
+        'added_area_sq_in': round(float((widths * lengths - w0 * l0).sum()), 1),
+    }
+    return widths, lengths, stats
+
+# Per-SKU values slot_geometry() returns, in the column order optimise_rectpack adds them
+SLOT_GEOMETRY_COLUMNS = ("layers", "height_orientation", "grid_dim1", "grid_dim2", "units_per_layer", "slot_w_in", "slot_l_in", "slot_rotated")
+
+
+class _SlotGeometryCache:
+    """
+    Bounded LRU memo of per-SKU slot geometry, held as arrays so a whole list is
+    looked up at once: 64-bit row hashes go through a pandas hash index, the
+    stored key rows confirm each hit, and the least recently used entries are
+    evicted in bulk once max_size is exceeded.
+    A key row is (tray id, height, width, length, quantity); tray ids number the
+    distinct tray parameter tuples seen.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with getattr(self, "lock", threading.Lock()):
+            self.index = pd.Index(np.zeros(0, dtype=np.uint64))
+            self.key_rows = np.zeros((0, 5))
+            self.tray_ids = {}
+            self.values = {}
+            self.last_used = np.zeros(0, dtype=np.int64)
+            self.tick = 0
+            self.hits = 0
+            self.misses = 0
+
+    def tray_id(self, tray_key: tuple) -> int:
+        with self.lock:
+            return self.tray_ids.setdefault(tray_key, len(self.tray_ids))
+
+    def lookup(self, hashes, key_rows):
+        """Returns (hit mask, {column: cached values of the hit rows})."""
+        with self.lock:
+            self.tick += 1
+            if not len(self.index):
+                self.misses += len(hashes)
+                return np.zeros(len(hashes), dtype=bool), {}
+            found = self.index.get_indexer(hashes)
+            # A hash match only counts when the stored key row is really the same
+            hit = (found >= 0) & (self.key_rows[np.maximum(found, 0)] == key_rows).all(axis=1)
+            positions = found[hit]
+            self.last_used[positions] = self.tick
+            self.hits += len(positions)
+            self.misses += len(hashes) - len(positions)
+            return hit, ({c: v[positions] for c, v in self.values.items()} if len(positions) else {})
+
+    def insert(self, hashes, key_rows, values: dict):
+        with self.lock:
+            hashes, first = np.unique(hashes, return_index=True)
+            fresh = ~self.index.isin(hashes)
+            self.index = self.index[fresh].append(pd.Index(hashes))
+            self.key_rows = np.concatenate([self.key_rows[fresh], key_rows[first]])
+            self.values = {c: np.concatenate([self.values[c][fresh], v[first]]) if self.values else v[first] for c, v in values.items()}
+            self.last_used = np.concatenate([self.last_used[fresh], np.full(len(hashes), self.tick)])
+            if len(self.index) > self.max_size:
+                keep = np.sort(np.argsort(-self.last_used, kind="stable")[:self.max_size])
+                self.index = self.index[keep]
+                self.key_rows = self.key_rows[keep]
+                self.values = {c: v[keep] for c, v in self.values.items()}
+                self.last_used = self.last_used[keep]
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.index),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_slot_cache = _SlotGeometryCache(SLOT_CACHE_SIZE)
+
+
+def slot_cache_stats() -> dict:
+    """Process-wide hit/miss counters of the slot geometry memo."""
+    return _slot_cache.stats()
+
+
+def clear_slot_cache():
+    _slot_cache.clear()
+
+
+def _compute_slot_geometry(height, width, length, quantity, tray_width_in, tray_length_in, tray_depth_in, buffer_pct, rotation, known=None):
+    """
+    Orientation, layers and slot grid for arrays of items, as optimise_rectpack sizes its slots.
+    known: optional (mask, orientation dict) of rows whose orientation was precomputed.
+    """
+    W, L, D = tray_width_in * buffer_pct, tray_length_in * buffer_pct, tray_depth_in * buffer_pct
+    items = pd.DataFrame({"height_in": height, "width_in": width, "length_in": length})
+    if known is None or not known[0].any():
+        orientation = choose_vertical_orientation(items, D)
+    else:
+        mask, stored = known
+        orientation = {c: np.asarray(v).copy() for c, v in stored.items()}
+        if not mask.all():
+            fresh = choose_vertical_orientation(items[~mask], D)
+            for c, v in orientation.items():
+                orientation[c] = v.astype(object) if c == "height_orientation" else v
+                orientation[c][~mask] = fresh[c]
+    layers = np.where(np.isnan(orientation["layers"]) | (orientation["layers"] <= 0), 1, orientation["layers"])
+    quantity = np.where(np.isnan(quantity), 1, np.maximum(quantity, 1))
+    units_per_layer = np.maximum(np.ceil(quantity / np.maximum(layers, 1)), 1).astype(int)
+    dim1 = np.maximum(np.nan_to_num(orientation["grid_dim1"], nan=1.0), 1)
+    dim2 = np.maximum(np.nan_to_num(orientation["grid_dim2"], nan=1.0), 1)
+
+    grid = (slot_grid_rotatable if rotation else slot_grid)(units_per_layer, dim1, dim2, W, L)
+    return {
+        "height_orientation": orientation["height_orientation"],
+        "layers": layers,
+        "grid_dim1": dim1,
+        "grid_dim2": dim2,
+        "units_per_layer": units_per_layer,
+        # Clipped to the tray and rounded up to whole inches
+        "slot_w_in": np.ceil(np.minimum(np.nan_to_num(grid["slot_w"], nan=1.0), W)).astype(int),
+        "slot_l_in": np.ceil(np.minimum(np.nan_to_num(grid["slot_l"], nan=1.0), L)).astype(int),
+        "slot_rotated": grid.get("rotated", np.zeros(len(units_per_layer), dtype=bool)),
+    }
+
+
+def _row_hashes(rows: np.ndarray) -> np.ndarray:
+    """FNV-style 64-bit hash of every row of a float array, on the raw bits."""
+    bits = np.ascontiguousarray(rows, dtype=float).view(np.uint64).reshape(len(rows), -1)
+    h = np.full(len(rows), 0xcbf29ce484222325, dtype=np.uint64)
+    for j in range(bits.shape[1]):
+        h = (h ^ bits[:, j]) * np.uint64(0x100000001b3)
+        h ^= h >> np.uint64(29)
+    return h
+
+
+def _stored_orientation(df: pd.DataFrame, rows, stored: pd.DataFrame):
+    """
+    (mask, orientation arrays) for the given rows of df from persisted geometry
+    (indexed by sku_id), valid only where the SKU dimensions still match.
+    """
+    aligned = stored[~stored.index.duplicated(keep="last")].reindex(df["sku_id"].astype(str).to_numpy()[rows])
+    mask = aligned["layers"].notna().to_numpy()
+    for c in ("height_in", "width_in", "length_in"):
+        current = df[c].to_numpy(dtype=float)[rows]
+        saved = aligned[c].to_numpy(dtype=float)
+        mask &= (current == saved) | (np.isnan(current) & np.isnan(saved))
+    return mask, {
+        "height_orientation": aligned["height_orientation"].fillna("height").to_numpy(dtype=object),
+        "layers": aligned["layers"].to_numpy(dtype=float),
+        "grid_dim1": aligned["grid_dim1"].to_numpy(dtype=float),
+        "grid_dim2": aligned["grid_dim2"].to_numpy(dtype=float),
+    }
+
+
+def slot_geometry(df: pd.DataFrame, tray_width_in: float, tray_length_in: float, tray_depth_in: float, buffer_pct: float, rotation: bool = False, quantity_col: str = None, stored: pd.DataFrame = None) -> dict:
+    """
+    Per-SKU orientation, layers, grid dims and slot size (SLOT_GEOMETRY_COLUMNS),
+    memoized across requests on (tray parameters, height, width, length, quantity).
+    Only SKUs not seen with the same values are computed, as one vectorized batch;
+    for those, stored (persisted orientation per sku_id, see slot_geometry_store)
+    skips the orientation step where the SKU dimensions are unchanged.
+
+    Returns a dict of arrays plus "cache": the hits and misses of this call.
+    """
+    quantity_col = quantity_col or quantity_column(df)
+    columns = [df[c].to_numpy(dtype=float) for c in ("height_in", "width_in", "length_in")] + [df[quantity_col].to_numpy(dtype=float)]
+    # NaN never equals itself, so it is keyed as -1 (dimensions and quantities are never negative)
+    tray_id = _slot_cache.tray_id((float(tray_width_in), float(tray_length_in), float(tray_depth_in), float(buffer_pct), bool(rotation)))
+    key_rows = np.column_stack([np.full(len(df), float(tray_id))] + [np.nan_to_num(c, nan=-1.0) for c in columns])
+    hashes = _row_hashes(key_rows)
+
+    hit, cached = _slot_cache.lookup(hashes, key_rows)
+    missing = np.flatnonzero(~hit)
+    computed, known = {}, None
+    if len(missing):
+        known = _stored_orientation(df, missing, stored) if stored is not None and len(stored) else None
+        computed = _compute_slot_geometry(*(c[missing] for c in columns), tray_width_in, tray_length_in, tray_depth_in, buffer_pct, rotation, known=known)
+        computed = {c: np.asarray(computed[c]) for c in SLOT_GEOMETRY_COLUMNS}
+        if known is not None:
+            computed["height_orientation"] = computed["height_orientation"].astype(str)
+        _slot_cache.insert(hashes[missing], key_rows[missing], computed)
+
+    # Put cached and computed rows back in list order
+    order = np.concatenate([np.flatnonzero(hit), missing])
+    geometry = {}
+    for c in SLOT_GEOMETRY_COLUMNS:
+        parts = [part[c] for part in (cached, computed) if part]
+        combined = np.concatenate(parts) if parts else np.zeros(0)
+        geometry[c] = np.empty_like(combined)
+        geometry[c][order] = combined
+    geometry["cache"] = {"hits": int(hit.sum()), "misses": int(len(missing)), "stored": int(known[0].sum()) if known is not None else 0}
+    return geometry
@@ -0,0 +1,287 @@
+import time
+import pandas as pd
+import numpy as np
+import rectpack
+from rectpack import newPacker
+from .rectpack_algorithm import optimise_rectpack
+
+# Lists larger than this should use the heuristics; the model grows with distinct slot sizes
+EXACT_ILP_MAX_SKUS = 300
+
+# Share of the time budget the warm start spends in rectpack's local search
+WARM_START_BUDGET_SHARE = 0.3
+
+# Sort orders tried when checking that a pattern really fits on one tray
+PATTERN_SORTS = [rectpack.SORT_AREA, rectpack.SORT_LSIDE, rectpack.SORT_SSIDE, rectpack.SORT_PERI]
+
+TOL = 1e-6
+
+
+def pack_pattern(sizes, W, L):
+    """
+    Place the given (w, l) slots on one W x L tray with rectpack.
+    Returns a list of (index, x, y) or None if some order does not place them all.
+    """
+    for sort_algo in PATTERN_SORTS:
+        packer = newPacker(mode=rectpack.PackingMode.Offline, bin_algo=rectpack.PackingBin.BBF, sort_algo=sort_algo, rotation=False)
+        for idx, (w, l) in enumerate(sizes):
+            packer.add_rect(int(w), int(l), rid=idx)
+        packer.add_bin(int(W), int(L), 1)
+        packer.pack()
+        placed = packer.rect_list()
+        if len(placed) == len(sizes):
+            return [(rid, x, y) for _, x, y, _, _, rid in placed]
+    return None
+
+
+class _PatternPool:
+    """
+    Slot patterns for the set-partitioning model. A pattern is a count vector
+    over slot types. Relaxed patterns only respect area and the strip limits
+    (valid for any real tray, used for the lower bound); verified patterns were
+    actually placed by rectpack and carry their positions (used for plans).
+    """
+
+    def __init__(self, type_w, type_l, W, L):
+        self.type_w, self.type_l = type_w, type_l
+        self.W, self.L = W, L
+        self.relaxed = []
+        self.verified = {}      # counts tuple -> placements [(type, x, y)]
+
+    def add_relaxed(self, counts):
+        self.relaxed.append(np.asarray(counts, dtype=float))
+
+    def verify(self, counts, value=None):
+        """
+        Make counts packable: drop the slot with the least value per area until
+        rectpack places the rest. Stores and returns the verified counts (or None).
+        """
+        counts = np.asarray(counts, dtype=int).copy()
+        area = self.type_w * self.type_l
+        weight = value if value is not None else np.ones(len(counts))
+        while counts.sum() > 0:
+            key = tuple(counts)
+            if key in self.verified:
+                return key
+            types = np.repeat(np.arange(len(counts)), counts)
+            placement = pack_pattern(list(zip(self.type_w[types], self.type_l[types])), self.W, self.L)
+            if placement is not None:
+                self.verified[key] = [(types[idx], x, y) for idx, x, y in placement]
+                return key
+            present = np.flatnonzero(counts)
+            counts[present[np.argmin(weight[present] / area[present])]] -= 1
+        return None
+
+
+def _price(duals, type_w, type_l, demand, W, L, time_left):
+    """
+    Pricing problem: most valuable slot multiset for one tray under the area
+    limit and the two strip limits (slots longer than half the tray sit side by
+    side across its width, slots wider than half sit end to end along its length).
+    Returns (counts, price, price_bound): the best pattern found, its value, and
+    an upper bound on the best value (the value itself only when solved to
+    optimality, else the MILP dual bound; None when there is no bound).
+    """
+    from scipy.optimize import milp, LinearConstraint, Bounds
+
+    area = type_w * type_l
+    upper = np.minimum(demand, np.floor(W * L / area))
+    rows = [area, np.where(type_l > L / 2, type_w, 0), np.where(type_w > W / 2, type_l, 0)]
+    constraints = LinearConstraint(np.vstack(rows), -np.inf, [W * L, W, L])
+    res = milp(
+        c=-duals, constraints=constraints, integrality=np.ones(len(duals)),
+        bounds=Bounds(0, upper), options={"time_limit": max(time_left, 0.1)},
+    )
+    if res.x is None:
+        return None, 0.0, None
+    counts = np.round(res.x)
+    price = float(duals @ counts)
+    if res.status == 0:
+        return counts, price, price
+    # Stopped on the time limit: the dual bound (of the minimization) still caps the best price
+    dual_bound = getattr(res, "mip_dual_bound", None)
+    if dual_bound is None or not np.isfinite(dual_bound):
+        return counts, price, None
+    return counts, price, max(price, -float(dual_bound))
+
+
+def _solve_master_lp(patterns, demand):
+    from scipy.optimize import linprog
+
+    A = np.column_stack(patterns)
+    res = linprog(np.ones(A.shape[1]), A_ub=-A, b_ub=-demand, bounds=(0, None), method="highs")
+    return res.fun, -res.ineqlin.marginals, res.x
+
+
+def _solve_master_ip(pool, demand, time_left):
+    """Integer set-covering over verified patterns. Returns (trays, [(counts, copies)]) or (None, None)."""
+    from scipy.optimize import milp, LinearConstraint, Bounds
+
+    keys = list(pool.verified)
+    A = np.column_stack([np.asarray(k, dtype=float) for k in keys])
+    res = milp(
+        c=np.ones(len(keys)), constraints=LinearConstraint(A, demand, np.inf),
+        integrality=np.ones(len(keys)), bounds=Bounds(0, np.inf),
+        options={"time_limit": max(time_left, 0.5)},
+    )
+    if res.x is None:
+        return None, None
+    copies = np.round(res.x).astype(int)
+    chosen = [(keys[j], copies[j]) for j in np.flatnonzero(copies)]
+    return int(copies.sum()), chosen
+
+
+def optimise_exact_ilp(df: pd.DataFrame, tray_width_in: float = 36, tray_length_in: float = 156, tray_depth_in: float = 18, buffer_pct: float = 0.95, time_budget_ms: int = None, max_skus: int = EXACT_ILP_MAX_SKUS, cancel_token=None, **kw):
+    """
+    Tray minimization for small lists by column generation over slot patterns,
+    with a proven gap.
+
+    The slots are the ones rectpack builds, and the rectpack plan after local
+    search (WARM_START_BUDGET_SHARE of the budget) is the warm start: its trays
+    are the first verified patterns. Column generation on the relaxed pattern
+    set gives a proven lower bound (Farley bound while it runs, the LP bound
+    once converged); an integer master over rectpack-verified patterns gives the
+    plan, so it is only known optimal when it meets that bound (status
+    'optimal'). Stops at time_budget_ms (default 10 s) and reports the gap.
+    """
+    print(f"[EXACT ILP] Starting optimization with {len(df)} SKUs")
+    if len(df) > max_skus:
+        raise ValueError(f"Exact ILP mode supports up to {max_skus} SKUs (got {len(df)}). Use the rectpack model for larger lists.")
+
+    started = time.perf_counter()
+    budget_s = (time_budget_ms if time_budget_ms else 10000) / 1000
+    if cancel_token and cancel_token.deadline is not None:
+        budget_s = min(budget_s, cancel_token.remaining_s())
+    deadline = started + budget_s
+
+    # 1. Warm start: rectpack slots and its plan after local search (stops early at the lower bound)
+    warm_budget_ms = int(WARM_START_BUDGET_SHARE * budget_s * 1000)
+    warm = optimise_rectpack(df, tray_width_in=tray_width_in, tray_length_in=tray_length_in, tray_depth_in=tray_depth_in, buffer_pct=buffer_pct, time_budget_ms=warm_budget_ms, cancel_token=cancel_token, **kw)
+    if warm.attrs.get('incomplete'):
+        print(f"[EXACT ILP] Deadline reached during the warm start, returning it")
+        return warm
+    W, L = int(tray_width_in * buffer_pct), int(tray_length_in * buffer_pct)
+    slots = [(tray['tray_id'], slot) for tray in warm.attrs['tray_layouts'] for slot in tray['slots']]
+    warm_trays = len(warm.attrs['tray_layouts'])
+    # Area / L2 / projection bounds: when the warm start already meets them there is nothing to prove
+    quick_bound = warm.attrs['lower_bounds']['lower_bound_trays']
+    if warm_trays <= quick_bound:
+        print(f"[EXACT ILP] Warm start ({warm_trays} trays) meets the lower bound, skipping the model")
+        warm.attrs['engine_stats'] = {
+            'trays_used': warm_trays, 'warm_start_trays': warm_trays, 'lower_bound_trays': quick_bound,
+            'gap_pct': 0.0, 'status': 'optimal', 'solve_s': round(time.perf_counter() - started, 2),
+        }
+        return warm
+
+    # 2. Slot types (distinct w x l) with demand
+    sizes = np.array([(slot['width_in'], slot['length_in']) for _, slot in slots], dtype=float)
+    type_sizes, slot_type, demand = np.unique(sizes, axis=0, return_inverse=True, return_counts=True)
+    slot_type = slot_type.ravel()
+    type_w, type_l = type_sizes[:, 0], type_sizes[:, 1]
+    demand = demand.astype(float)
+    n_types = len(type_sizes)
+    print(f"[EXACT ILP] {len(slots)} slots in {n_types} distinct sizes, warm start {warm_trays} trays")
+
+    pool = _PatternPool(type_w, type_l, W, L)
+    warm_tray_ids = sorted({tray_id for tray_id, _ in slots})
+    for tray_id in warm_tray_ids:
+        counts = np.bincount(slot_type[[i for i, (t, _) in enumerate(slots) if t == tray_id]], minlength=n_types)
+        pool.add_relaxed(counts)
+        pool.verify(counts)
+    # Single-slot patterns keep the master feasible whatever gets generated
+    for t in range(n_types):
+        single = np.eye(n_types, dtype=int)[t]
+        pool.add_relaxed(single)
+        pool.verify(single)
+
+    # 3. Column generation for the lower bound, collecting verified columns on the way
+    lower_bound = quick_bound
+    lp_value, converged, iterations = None, False, 0
+    ip_reserve = 0.4 * budget_s
+    while lower_bound < warm_trays and time.perf_counter() < deadline - ip_reserve:
+        iterations += 1
+        if cancel_token:
+            cancel_token.check()
+        lp_value, duals, lp_x = _solve_master_lp(pool.relaxed, demand)
+        counts, price, price_bound = _price(duals, type_w, type_l, demand, W, L, deadline - ip_reserve - time.perf_counter())
+        if counts is None:
+            break
+        if price_bound is not None:
+            # Farley: LP / (upper bound on the best reduced price) is a valid bound at every iteration
+            lower_bound = max(lower_bound, int(np.ceil(lp_value / max(price_bound, 1.0) - TOL)))
+            if price_bound <= 1 + TOL:
+                converged = True
+                break
+        if price <= 1 + TOL:
+            # Pricing ran out of time without finding an improving column nor a bound proving there is none
+            break
+        pool.add_relaxed(counts)
+    if converged:
+        lower_bound = max(lower_bound, int(np.ceil(lp_value - TOL)))
+    # Packable versions of the patterns the LP actually uses become plan candidates
+    if lp_value is not None:
+        for j in np.flatnonzero(lp_x[:len(pool.relaxed)] > TOL):
+            pool.verify(pool.relaxed[j], value=duals)
+    print(f"[EXACT ILP] Column generation: {iterations} iterations, {len(pool.relaxed)} relaxed / {len(pool.verified)} verified patterns, lower bound {lower_bound}")
+
+    # 4. Integer master over verified patterns (never worse than the warm start)
+    if cancel_token:
+        cancel_token.check()
+    best_trays, chosen = _solve_master_ip(pool, demand, deadline - time.perf_counter())
+    if best_trays is None or best_trays >= warm_trays:
+        print(f"[EXACT ILP] Keeping warm start ({warm_trays} trays)")
+        best_trays, result_df = warm_trays, warm
+    else:
+        result_df = _plan_from_patterns(warm, pool, chosen, slots, slot_type)
+        best_trays = len(result_df.attrs['tray_layouts'])
+
+    if lower_bound > best_trays:
+        # Cannot happen with sound bounds; report it rather than claim optimality
+        print(f"[EXACT ILP] Lower bound {lower_bound} exceeds the plan ({best_trays} trays), dropping it to the quick bound")
+        lower_bound = min(quick_bound, best_trays)
+        converged = False
+    result_df.attrs['lower_bounds'] = dict(warm.attrs['lower_bounds'], column_generation=lower_bound, lower_bound_trays=lower_bound)
+    elapsed = time.perf_counter() - started
+    gap_pct = round(100 * (best_trays - lower_bound) / best_trays, 2) if best_trays else 0.0
+    result_df.attrs['engine_stats'] = {
+        'trays_used': best_trays,
+        'warm_start_trays': warm_trays,
+        'lower_bound_trays': lower_bound,
+        'quick_bound_trays': quick_bound,
+        'gap_pct': gap_pct,
+        # optimal: plan meets the bound; bound_gap: bound converged but a gap remains; time_limit: stopped early
+        'status': 'optimal' if best_trays == lower_bound else ('bound_gap' if converged else 'time_limit'),
+        'lp_bound': round(float(lp_value), 2) if lp_value is not None else None,
+        'patterns': len(pool.verified),
+        'solve_s': round(elapsed, 2),
+    }
+    print(f"[EXACT ILP] {best_trays} trays, lower bound {lower_bound}, gap {gap_pct}% in {elapsed:.2f}s")
+    return result_df
+
+
+def _plan_from_patterns(warm, pool, chosen, slots, slot_type):
+    """Turn chosen pattern copies into tray layouts, handing out each type's slots in order."""
+    queues = {}
+    for i, (_, slot) in enumerate(slots):
+        queues.setdefault(slot_type[i], []).append(slot)
+
+    tray_layouts = []
+    for counts, copies in chosen:
+        for _ in range(copies):
+            tray_slots = []
+            for t, x, y in pool.verified[counts]:
+                if queues.get(t):
+                    slot = queues[t].pop()
+                    tray_slots.append(dict(slot, x_in=x, y_in=y))
+            if tray_slots:
+                tray_layouts.append({'tray_id': len(tray_layouts), 'slots': tray_slots})
+
+    sku_trays = {}
+    for tray in tray_layouts:
+        for slot in tray['slots']:
+            sku_trays.setdefault(slot['sku_id'], set()).add(tray['tray_id'])
+
+    result_df = warm.copy()
+    result_df['trays_needed'] = result_df['sku_id'].map(lambda x: len(sku_trays.get(x, set())))
+    result_df.attrs['tray_layouts'] = tray_layouts
+    return result_df
@@ -0,0 +1,165 @@
+import random
+import time
+import numpy as np
+
+
+class _FreeSpace:
+    """
+    Maximal free rectangles of every tray in one flat array (x, y, w, l) tagged
+    with the tray they belong to. Inserting a slot picks the best short-side fit
+    over all trays at once; copies are cheap, so a move works on a copy and is
+    simply dropped when it fails.
+    """
+
+    def __init__(self, W, L):
+        self.W, self.L = W, L
+        self.free = np.zeros((0, 4))
+        self.tray = np.zeros(0, dtype=int)
+
+    def copy(self):
+        other = _FreeSpace(self.W, self.L)
+        other.free, other.tray = self.free.copy(), self.tray.copy()
+        return other
+
+    def add_empty_tray(self, t):
+        self.free = np.concatenate([self.free, [[0.0, 0.0, self.W, self.L]]])
+        self.tray = np.append(self.tray, t)
+
+    def drop_tray(self, t):
+        keep = self.tray != t
+        self.free, self.tray = self.free[keep], self.tray[keep]
+
+    def insert(self, w, l):
+        """Place a w x l slot in the best-fitting free rectangle. Returns (tray, x, y) or None."""
+        f = self.free
+        fits = (f[:, 2] >= w) & (f[:, 3] >= l)
+        if not fits.any():
+            return None
+        idx = np.flatnonzero(fits)
+        short_side = np.minimum(f[idx, 2] - w, f[idx, 3] - l)
+        long_side = np.maximum(f[idx, 2] - w, f[idx, 3] - l)
+        best = idx[np.lexsort((long_side, short_side))[0]]
+        t, x, y = int(self.tray[best]), f[best, 0], f[best, 1]
+        self.occupy(t, x, y, w, l)
+        return t, x, y
+
+    def occupy(self, t, x, y, w, l):
+        """Split the free rectangles of tray t around a slot placed at (x, y)."""
+        f = self.free
+        hit = (self.tray == t) & (f[:, 0] < x + w) & (x < f[:, 0] + f[:, 2]) & (f[:, 1] < y + l) & (y < f[:, 1] + f[:, 3])
+        h = f[hit]
+        fx, fy, fw, fl = h[:, 0], h[:, 1], h[:, 2], h[:, 3]
+        pieces = np.concatenate([
+            np.stack([fx, fy, x - fx, fl], axis=1),                       # left
+            np.stack([np.full_like(fx, x + w), fy, fx + fw - (x + w), fl], axis=1),  # right
+            np.stack([fx, fy, fw, y - fy], axis=1),                       # below
+            np.stack([fx, np.full_like(fy, y + l), fw, fy + fl - (y + l)], axis=1),  # above
+        ])
+        pieces = pieces[(pieces[:, 2] > 0) & (pieces[:, 3] > 0)]
+
+        # Keep only maximal rectangles of this tray
+        mine = np.concatenate([f[(self.tray == t) & ~hit], pieces])
+        mine = np.unique(mine, axis=0)
+        a, b = mine[:, None, :], mine[None, :, :]
+        contained = (
+            (a[..., 0] >= b[..., 0]) & (a[..., 1] >= b[..., 1]) &
+            (a[..., 0] + a[..., 2] <= b[..., 0] + b[..., 2]) &
+            (a[..., 1] + a[..., 3] <= b[..., 1] + b[..., 3])
+        )
+        np.fill_diagonal(contained, False)
+        mine = mine[~contained.any(axis=1)]
+
+        others = self.tray != t
+        self.free = np.concatenate([f[others], mine])
+        self.tray = np.concatenate([self.tray[others], np.full(len(mine), t)])
+
+
+def improve_bins(bins, W, L, time_budget_ms, lower_bound=0, seed=0, progress=None, cancel_token=None):
+    """
+    Ruin-and-recreate improvement of a packed plan within time_budget_ms.
+
+    Each move empties the least-filled tray (sometimes together with a random
+    partner tray, to escape when no tray can be emptied on its own) and
+    re-inserts its slots best-fit into the remaining free space. A move that
+    places every slot eliminates a tray and is kept; otherwise it is dropped.
+
+    Stops early once the plan reaches lower_bound trays.
+
+    bins: {tray_id: [slot dicts with x_in, y_in, width_in, length_in]}.
+    Returns (new bins renumbered from 0, stats).
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget_ms / 1000
+    rng = random.Random(seed)
+
+    trays = {t: [dict(s) for s in slots] for t, slots in bins.items()}
+    space = _FreeSpace(W, L)
+    for t, slots in trays.items():
+        space.add_empty_tray(t)
+        for s in slots:
+            space.occupy(t, s['x_in'], s['y_in'], s['width_in'], s['length_in'])
+    used = {t: sum(s['width_in'] * s['length_in'] for s in slots) for t, slots in trays.items()}
+
+    trays_before = len(trays)
+    iterations = 0
+    stuck = set()       # trays that could not be emptied on their own since the last improvement
+    while len(trays) > max(1, lower_bound) and time.perf_counter() < deadline:
+        iterations += 1
+        if cancel_token and iterations % 16 == 0 and cancel_token.check():
+            break
+        by_fill = sorted(trays, key=lambda t: used[t])
+        target = next((t for t in by_fill if t not in stuck), None)
+        partner = None
+        if target is None:
+            # Every tray resisted alone: ruin one of the emptiest with a random partner
+            target = rng.choice(by_fill[:max(2, len(by_fill) // 4)])
+            partner = rng.choice([t for t in by_fill if t != target])
+
+        trial = space.copy()
+        trial.drop_tray(target)
+        removed = list(trays[target])
+        if partner is not None:
+            trial.drop_tray(partner)
+            trial.add_empty_tray(partner)
+            removed += trays[partner]
+        removed.sort(key=lambda s: (-s['width_in'] * s['length_in'], rng.random()))
+
+        placed = []
+        for s in removed:
+            spot = trial.insert(s['width_in'], s['length_in'])
+            if spot is None:
+                break
+            placed.append((spot, s))
+        if len(placed) < len(removed):
+            stuck.add(target)
+            continue
+
+        # Commit: the target tray is gone, its (and the partner's) slots moved
+        space = trial
+        del trays[target], used[target]
+        if partner is not None:
+            trays[partner], used[partner] = [], 0.0
+        for (t, x, y), s in placed:
+            trays[t].append(dict(s, x_in=x, y_in=y))
+            used[t] += s['width_in'] * s['length_in']
+        if partner is not None and not trays[partner]:
+            space.drop_tray(partner)
+            del trays[partner], used[partner]
+        stuck.clear()
+        if progress:
+            progress.best(len(trays))
+
+    elapsed = time.perf_counter() - started
+    eliminated = trays_before - len(trays)
+    stats = {
+        'trays_before': trays_before,
+        'trays_after': len(trays),
+        'trays_eliminated': eliminated,
+        'iterations': iterations,
+        'search_ms': round(elapsed * 1000, 1),
+        'trays_eliminated_per_s': round(eliminated / elapsed, 2) if elapsed > 0 else 0.0,
+        'reached_lower_bound': len(trays) <= lower_bound,
+    }
+    print(f"[LOCAL SEARCH] {trays_before} -> {len(trays)} trays in {iterations} moves, {stats['search_ms']}ms")
+    new_bins = {i: [dict(s, x_in=int(s['x_in']), y_in=int(s['y_in'])) for s in trays[t]] for i, t in enumerate(sorted(trays))}
+    return new_bins, stats
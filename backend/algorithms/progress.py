@@ -0,0 +1,88 @@
+"""
+Progress events from inside the engines.
+
+Engines take progress=None (nothing is reported) or a ProgressReporter.
+Hot loops only call update() every PROGRESS_EVERY items, and the reporter
+drops updates that come within PROGRESS_MIN_INTERVAL_S of the last event,
+so a run nobody watches pays a None check per stage and nothing per item.
+"""
+import os
+import time
+from rectpack.packer import Packer
+
+PROGRESS_MIN_INTERVAL_S = float(os.getenv("PROGRESS_MIN_INTERVAL_S", "0.25"))
+# Rectangles placed between progress checks in the packing loop
+PROGRESS_EVERY = 256
+
+
+class ProgressReporter:
+    """
+    Accumulates the run state (stage, rects_placed, trays_open, best_trays, ...)
+    and hands snapshots to sink.put(event). The sink is anything with put():
+    a loop-bound sink in thread mode, a Manager queue proxy in process mode.
+    """
+
+    def __init__(self, sink, min_interval_s: float = PROGRESS_MIN_INTERVAL_S):
+        self.sink = sink
+        self.min_interval_s = min_interval_s
+        self.started = time.perf_counter()
+        self.state = {}
+        self._last = 0.0
+
+    def stage(self, stage: str, **fields):
+        """Enter a new stage; always emitted."""
+        self.state.update(fields, stage=stage)
+        self._emit(time.perf_counter())
+
+    def update(self, **fields):
+        """Update counters; emitted only if the last event is old enough."""
+        self.state.update(fields)
+        now = time.perf_counter()
+        if now - self._last >= self.min_interval_s:
+            self._emit(now)
+
+    def best(self, trays: int):
+        """Record a new best-so-far tray count."""
+        if self.state.get("best_trays") is None or trays < self.state["best_trays"]:
+            self.update(best_trays=trays)
+
+    def _emit(self, now):
+        self._last = now
+        try:
+            self.sink.put(dict(self.state, elapsed_s=round(now - self.started, 2)))
+        except Exception as e:
+            # Progress must never fail the run (e.g. the job was torn down)
+            print(f"[PROGRESS] Dropped event: {e}")
+
+
+def pack(packer: Packer, progress: ProgressReporter = None, cancel_token=None) -> list:
+    """
+    packer.pack(), or with a reporter or cancel token the same packing
+    (rectpack's offline pack: sort with the packer's sort_algo, then place one
+    by one online) with a progress update and cancel/deadline check every
+    PROGRESS_EVERY rectangles. Returns the rectangles left unplaced because
+    the deadline passed (empty when packing finished).
+    """
+    if progress is None and cancel_token is None:
+        packer.pack()
+        return []
+    packer.reset()
+    if not packer._is_everything_ready():
+        return []
+    online = super(Packer, packer)
+    for width, height, count, extra_kwargs in packer._avail_bins:
+        online.add_bin(width, height, count, **extra_kwargs)
+    packer._sorted_rect = packer._sort_algo(packer._avail_rect)
+    total = len(packer._sorted_rect)
+    if progress:
+        progress.update(rects_placed=0, rects_total=total, trays_open=0)
+    for placed, rect in enumerate(packer._sorted_rect):
+        if placed % PROGRESS_EVERY == 0 and placed:
+            if progress:
+                progress.update(rects_placed=placed, trays_open=len(packer))
+            if cancel_token and cancel_token.check():
+                return list(packer._sorted_rect[placed:])
+        online.add_rect(*rect)
+    if progress:
+        progress.update(rects_placed=total, trays_open=len(packer))
+    return []
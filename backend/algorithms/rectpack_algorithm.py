@@ -1,3 +1,4 @@
+import time
 import pandas as pd
 import numpy as np
 import rectpack
@@ -5,11 +6,37 @@ from rectpack import newPacker
 from typing import Dict, List, Tuple, Optional, Union
 import json
 from datetime import datetime
+from .geometry import slot_geometry, SLOT_GEOMETRY_COLUMNS, standardize_slots
+from .local_search import improve_bins
+from .bounds import lower_bounds
+from .progress import pack
+from .cancellation import incomplete
 
-def optimise_rectpack(df: pd.DataFrame, tray_width_in: float = 36, tray_length_in: float = 156, tray_depth_in: float = 18, buffer_pct: float = 0.95, inventory_list_id: str = None, **kw):
+# Sort orders tried by the portfolio mode (rectpack's default SORT_AREA first)
+PORTFOLIO_SORTS = [
+    ("area", rectpack.SORT_AREA),
+    ("long_side", rectpack.SORT_LSIDE),
+    ("short_side", rectpack.SORT_SSIDE),
+    ("perimeter", rectpack.SORT_PERI),
+    ("difference", rectpack.SORT_DIFF),
+    ("ratio", rectpack.SORT_RATIO),
+]
+
+def optimise_rectpack(df: pd.DataFrame, tray_width_in: float = 36, tray_length_in: float = 156, tray_depth_in: float = 18, buffer_pct: float = 0.95, inventory_list_id: str = None, time_budget_ms: int = None, portfolio: bool = False, rotation: bool = False, divider_sizes: int = None, stored_geometry: pd.DataFrame = None, progress=None, cancel_token=None, **kw):
     """
     Maximal-Rectangles Algorithm using rectpack library with Prisma database storage.
     This version properly maps rectpack attributes and stores results in the database.
+    With time_budget_ms set, a local-search phase then tries to empty trays within that budget.
+    With portfolio=True several rectpack sort orders are tried and the best plan is kept.
+    With rotation=True slot grids and tray placements consider both floor orientations,
+    and the same packing without rotation runs as a baseline (its time counts
+    against time_budget_ms). The two are compared before local search, the better
+    one gets the local search, and engine_stats reports the trays saved by rotation.
+    With divider_sizes=K slot widths and lengths are each snapped to at most K standard sizes.
+    stored_geometry (persisted orientation per sku_id) skips the orientation step.
+    progress (a ProgressReporter) receives stage and packing-loop events.
+    cancel_token (a CancelToken) is checked between stages and in the packing loop;
+    past its deadline the placed slots are returned with attrs['incomplete'] set.
     """
     print(f"[RECTPACK ALGORITHM] Starting optimization with {len(df)} SKUs")
     print(f"[RECTPACK ALGORITHM] Tray dimensions: {tray_width_in}x{tray_length_in}x{tray_depth_in}")
@@ -45,168 +72,28 @@ def optimise_rectpack(df: pd.DataFrame, tray_width_in: float = 36, tray_length_i
         oversized_list = oversized_skus["sku_id"].tolist()
         raise ValueError(f"SKUs {oversized_list} are too large for tray: individual dimensions exceed {effective_tray_width:.1f}x{effective_tray_length:.1f}")
     
-    # 1. Analyze all three dimensions to determine optimal height orientation
-    effective_tray_depth = tray_depth_in * buffer_pct
-    
-    # Calculate layers for each possible height orientation with NaN handling
-    # Handle division by zero or NaN values
-    height_in_safe = df_work.height_in.fillna(1).clip(lower=0.1)
-    width_in_safe = df_work.width_in.fillna(1).clip(lower=0.1)
-    length_in_safe = df_work.length_in.fillna(1).clip(lower=0.1)
-    
-    layers_height = np.maximum(1, effective_tray_depth // height_in_safe)
-    layers_width = np.maximum(1, effective_tray_depth // width_in_safe)
-    layers_length = np.maximum(1, effective_tray_depth // length_in_safe)
-    
-    # Determine which dimension should be used for height (vertical stacking)
-    height_orientation = []
-    layers_list = []
-    grid_dim1_list = []
-    grid_dim2_list = []
-    
-    for i in range(len(df_work)):
-        height_layers = layers_height.iloc[i]
-        width_layers = layers_width.iloc[i]
-        length_layers = layers_length.iloc[i]
-        
-        # Calculate height efficiency for all dimensions
-        height_dim = df_work.iloc[i]["height_in"]
-        width_dim = df_work.iloc[i]["width_in"]
-        length_dim = df_work.iloc[i]["length_in"]
-        
-        # Calculate height efficiency (how much of available height is used)
-        # Handle potential NaN values in dimensions
-        height_dim = height_dim if not pd.isna(height_dim) else 1
-        width_dim = width_dim if not pd.isna(width_dim) else 1
-        length_dim = length_dim if not pd.isna(length_dim) else 1
-        
-        height_efficiency = (height_layers * height_dim) / effective_tray_depth
-        width_efficiency = (width_layers * width_dim) / effective_tray_depth
-        length_efficiency = (length_layers * length_dim) / effective_tray_depth
-        
-        # Handle any NaN efficiencies
-        height_efficiency = height_efficiency if not pd.isna(height_efficiency) else 0
-        width_efficiency = width_efficiency if not pd.isna(width_efficiency) else 0
-        length_efficiency = length_efficiency if not pd.isna(length_efficiency) else 0
-        
-        # Choose the dimension with highest height efficiency
-        if height_efficiency >= width_efficiency and height_efficiency >= length_efficiency:
-            # Height gives highest efficiency
-            height_orientation.append("height")
-            layers_list.append(height_layers)
-            grid_dim1_list.append(width_dim)
-            grid_dim2_list.append(length_dim)
-        elif width_efficiency >= height_efficiency and width_efficiency >= length_efficiency:
-            # Width gives highest efficiency
-            height_orientation.append("width")
-            layers_list.append(width_layers)
-            grid_dim1_list.append(height_dim)
-            grid_dim2_list.append(length_dim)
-        else:
-            # Length gives highest efficiency
-            height_orientation.append("length")
-            layers_list.append(length_layers)
-            grid_dim1_list.append(height_dim)
-            grid_dim2_list.append(width_dim)
-    
-    df_work["layers"] = layers_list
-    df_work["height_orientation"] = height_orientation
-    df_work["grid_dim1"] = grid_dim1_list
-    df_work["grid_dim2"] = grid_dim2_list
-    
-    # Check for invalid values and fix them BEFORE calculating units_per_layer
-    invalid_layers = df_work["layers"].isna() | (df_work["layers"] <= 0)
-    if invalid_layers.any():
-        df_work.loc[invalid_layers, "layers"] = 1
-    
-    # Calculate units per layer AFTER fixing NaN values
-    # Handle division by zero or NaN
-    quantity_safe = df_work[quantity_col].fillna(1).clip(lower=1)
-    layers_safe = df_work.layers.fillna(1).clip(lower=1)
-    df_work["units_per_layer"] = np.ceil(quantity_safe / layers_safe).astype(int)
-    
-    # Check for invalid units and fix them
-    invalid_units = df_work["units_per_layer"].isna() | (df_work["units_per_layer"] <= 0)
-    if invalid_units.any():
-        df_work.loc[invalid_units, "units_per_layer"] = 1
-    
-    # Layer calculations complete
-    
-    # 2. Calculate slot dimensions with 1-inch snap and bounds checking
-    effective_tray_width = tray_width_in * buffer_pct
-    effective_tray_length = tray_length_in * buffer_pct
-    
-    # Calculate slot dimensions using the optimal 2D grid dimensions
-    try:
-        # Check for NaN values in units_per_layer and grid dimensions
-        df_work["units_per_layer"] = df_work["units_per_layer"].fillna(1)
-        df_work["grid_dim1"] = df_work["grid_dim1"].fillna(1)
-        df_work["grid_dim2"] = df_work["grid_dim2"].fillna(1)
-        
-        # Ensure positive values
-        df_work["units_per_layer"] = df_work["units_per_layer"].clip(lower=1)
-        df_work["grid_dim1"] = df_work["grid_dim1"].clip(lower=1)
-        df_work["grid_dim2"] = df_work["grid_dim2"].clip(lower=1)
-        
-        # Calculate slot dimensions with improved algorithm
-        # Use a more conservative approach to prevent overlapping
-        for idx, row in df_work.iterrows():
-            units = row.units_per_layer
-            dim1 = row.grid_dim1
-            dim2 = row.grid_dim2
-            
-            # Calculate optimal grid arrangement
-            # Try to find the best rectangular arrangement
-            best_width = dim1
-            best_length = dim2
-            min_waste = float('inf')
-            
-            # Try different grid arrangements
-            for cols in range(1, min(int(np.sqrt(units)) + 3, int(effective_tray_width / dim1) + 1)):
-                rows = int(np.ceil(units / cols))
-                if rows <= 0:
-                    continue
-                    
-                slot_w = cols * dim1
-                slot_l = rows * dim2
-                
-                # Check if this arrangement fits in the tray
-                if slot_w <= effective_tray_width and slot_l <= effective_tray_length:
-                    waste = (cols * rows) - units  # How many extra slots we need
-                    if waste < min_waste:
-                        min_waste = waste
-                        best_width = slot_w
-                        best_length = slot_l
-            
-            # If no arrangement fits, use the original dimensions
-            if best_width > effective_tray_width or best_length > effective_tray_length:
-                best_width = min(dim1, effective_tray_width)
-                best_length = min(dim2, effective_tray_length)
-            
-            df_work.loc[idx, "slot_w_in"] = best_width
-            df_work.loc[idx, "slot_l_in"] = best_length
-        
-        # Slot dimensions calculated successfully
-        
-    except Exception as e:
-        print(f"[RECTPACK V2 ALGORITHM] Error calculating slot dimensions: {e}")
-        print(f"[RECTPACK V2 ALGORITHM] Using fallback calculation")
-        # Fallback to simple calculation
-        df_work["slot_w_in"] = df_work.grid_dim1.fillna(1)
-        df_work["slot_l_in"] = df_work.grid_dim2.fillna(1)
-    
-    # Ensure slot dimensions don't exceed tray bounds and handle any remaining NaN values
-    df_work["slot_w_in"] = np.minimum(df_work["slot_w_in"].fillna(1), effective_tray_width)
-    df_work["slot_l_in"] = np.minimum(df_work["slot_l_in"].fillna(1), effective_tray_length)
-    
-    # Round up to nearest inch and ensure integers
-    df_work["slot_w_in"] = np.ceil(df_work["slot_w_in"]).astype(int)
-    df_work["slot_l_in"] = np.ceil(df_work["slot_l_in"]).astype(int)
-    
-    # Final safety check - ensure no NaN values remain
-    df_work["slot_w_in"] = df_work["slot_w_in"].fillna(1).astype(int)
-    df_work["slot_l_in"] = df_work["slot_l_in"].fillna(1).astype(int)
-    
+    if progress:
+        progress.stage("slot_geometry", skus=len(df_work))
+    # 1-2. Vertical orientation, layers and best slot grid per SKU. These depend only on the
+    # SKU's dimensions, quantity and the tray parameters, so they are memoized across requests.
+    # With rotation the grid is also searched with the item turned 90 degrees on the floor
+    geometry = slot_geometry(df_work, tray_width_in, tray_length_in, tray_depth_in, buffer_pct, rotation=rotation, quantity_col=quantity_col, stored=stored_geometry)
+    for column in SLOT_GEOMETRY_COLUMNS:
+        if column != "slot_rotated" or rotation:
+            df_work[column] = geometry[column]
+    print(f"[RECTPACK ALGORITHM] Slot geometry: {geometry['cache']['hits']} cached, {geometry['cache']['misses']} computed ({geometry['cache']['stored']} from stored orientation)")
+    
+    # Optional: snap slot widths and lengths to at most divider_sizes standard sizes each
+    standard_stats = None
+    if divider_sizes:
+        widths, lengths, standard_stats = standardize_slots(df_work, int(divider_sizes))
+        df_work["slot_w_in"] = widths.astype(int)
+        df_work["slot_l_in"] = lengths.astype(int)
+        print(f"[RECTPACK ALGORITHM] Standardized {standard_stats['distinct_slot_sizes_before']} slot sizes to {standard_stats['distinct_slot_sizes']} "
+              f"(widths {standard_stats['standard_widths']}, lengths {standard_stats['standard_lengths']})")
+    
+    if cancel_token:
+        cancel_token.check()
     # Slot dimensions calculated
     
     # 3. Use rectpack for optimal 2D bin packing
@@ -274,29 +161,56 @@ def optimise_rectpack(df: pd.DataFrame, tray_width_in: float = 36, tray_length_i
             print(f"[RECTPACK V2 ALGORITHM] Error processing row {idx} ({row.sku_id}): {e}")
             continue
     
-    # Build packer with Maximal-Rectangles algorithm
-    packer = newPacker(
-        mode=rectpack.PackingMode.Offline,
-        bin_algo=rectpack.PackingBin.BBF,  # Best-Area-Fit
-        sort_algo=rectpack.SORT_AREA,
-        rotation=False
-    )
-    
-    # Add rectangles to packer
-    for w, h, tag in rects:
-        packer.add_rect(w, h, rid=tag)
-    
-    # Allow unlimited identical trays
-    packer.add_bin(int(effective_tray_width), int(effective_tray_length), float("inf"))
-    
-    # Pack!
-    packer.pack()
+    # Lower bounds on trays for these slots (no packing can beat them)
+    bounds = lower_bounds([w for w, _, _ in rects], [h for _, h, _ in rects], int(effective_tray_width), int(effective_tray_length), rotation=rotation)
+    lower_bound = bounds['lower_bound_trays']
+    if progress:
+        progress.stage("packing", rects_total=len(rects), rects_placed=0, trays_open=0, lower_bound_trays=lower_bound)
+    
+    # Build packer with Maximal-Rectangles algorithm; the portfolio tries several
+    # sort orders and keeps the fewest trays, stopping early once one reaches the bound
+    sort_algos = PORTFOLIO_SORTS if portfolio else [("area", rectpack.SORT_AREA)]
+    packer, best_sort, tried, unplaced = None, None, 0, []
+    for sort_name, sort_algo in sort_algos:
+        if packer is not None and cancel_token and cancel_token.check():
+            break
+        candidate = newPacker(
+            mode=rectpack.PackingMode.Offline,
+            bin_algo=rectpack.PackingBin.BBF,  # Best-Area-Fit
+            sort_algo=sort_algo,
+            rotation=rotation
+        )
+        
+        # Add rectangles to packer
+        for w, h, tag in rects:
+            candidate.add_rect(w, h, rid=tag)
+        
+        # Allow unlimited identical trays
+        candidate.add_bin(int(effective_tray_width), int(effective_tray_length), float("inf"))
+        
+        # Pack!
+        left = pack(candidate, progress, cancel_token)
+        tried += 1
+        if left:
+            # Deadline hit mid-pack: a partial plan only counts if there is nothing complete
+            if packer is None:
+                packer, best_sort, unplaced = candidate, sort_name, left
+            break
+        if packer is None or len(candidate) < len(packer):
+            packer, best_sort = candidate, sort_name
+        if progress:
+            progress.best(len(packer))
+        if len(packer) <= lower_bound:
+            break
+    if portfolio:
+        print(f"[RECTPACK ALGORITHM] Portfolio: best '{best_sort}' with {len(packer)} trays after {tried}/{len(sort_algos)} orders (lower bound {lower_bound})")
     
     # 4. Store results in Prisma database (with improved fallback)
     tray_layouts = []
     
     # Get the packed rectangles from rectpack
     rect_list = packer.rect_list()
+    rect_sizes = {tag: (w, h) for w, h, tag in rects}
     
     # Group rectangles by bin_id
     bins = {}
@@ -309,13 +223,60 @@ def optimise_rectpack(df: pd.DataFrame, tray_width_in: float = 36, tray_length_i
         # Format: "SKU0001_T1" -> "SKU0001"
         original_sku_id = rid.split('_T')[0] if '_T' in rid else rid
         
-        bins[bin_id].append({
+        slot = {
             'sku_id': original_sku_id,
             'x_in': x,
             'y_in': y,
             'width_in': width,
             'length_in': height
-        })
+        }
+        if rotation:
+            # rectpack turned the slot 90 degrees if its width no longer matches
+            slot['rotated'] = width != rect_sizes[rid][0]
+        bins[bin_id].append(slot)
+    
+    # Rotation baseline: the same packing with both orientations switched off, compared
+    # before local search so the local search below is spent once, on the better plan
+    rotation_stats = None
+    if rotation and not unplaced and not (cancel_token and cancel_token.check()):
+        if progress:
+            progress.stage("rotation_baseline")
+        baseline_started = time.perf_counter()
+        baseline = optimise_rectpack(df, tray_width_in=tray_width_in, tray_length_in=tray_length_in, tray_depth_in=tray_depth_in, buffer_pct=buffer_pct, inventory_list_id=inventory_list_id, time_budget_ms=None, portfolio=portfolio, rotation=False, divider_sizes=divider_sizes, stored_geometry=stored_geometry, progress=progress, cancel_token=cancel_token, **kw)
+        baseline_ms = (time.perf_counter() - baseline_started) * 1000
+        if time_budget_ms:
+            time_budget_ms = max(time_budget_ms - baseline_ms, 0)
+        baseline_trays = len(baseline.attrs['tray_layouts'])
+        rotation_stats = {
+            'baseline_trays': baseline_trays,
+            'rotated_trays': len(bins),
+            'rotated_slot_grids': int(df_work.get('slot_rotated', pd.Series(dtype=bool)).sum()),
+            'used_rotation': True,
+            'trays_saved_by_rotation': max(baseline_trays - len(bins), 0),
+            'baseline_ms': round(baseline_ms, 1),
+        }
+        print(f"[RECTPACK ALGORITHM] Rotation: {len(bins)} trays vs {baseline_trays} without rotation (baseline took {baseline_ms:.0f} ms)")
+        if baseline_trays < len(bins) and not baseline.attrs.get('incomplete'):
+            # Greedy packing is not monotone: continue with the unrotated plan when it is better
+            rotation_stats['used_rotation'] = False
+            bins = {tray['tray_id']: tray['slots'] for tray in baseline.attrs['tray_layouts']}
+            df_work = baseline.drop(columns=['trays_needed'])
+            df_work.attrs = {}
+            bounds = baseline.attrs['lower_bounds']
+            lower_bound = bounds['lower_bound_trays']
+            geometry = dict(geometry, cache=baseline.attrs['slot_cache'])
+            best_sort = baseline.attrs.get('engine_stats', {}).get('portfolio', {}).get('best_sort', best_sort)
+
+    # Optional improvement phase: ruin-and-recreate the emptiest trays within the time budget
+    local_search_stats = None
+    if cancel_token and cancel_token.check():
+        time_budget_ms = None
+    elif cancel_token and cancel_token.deadline is not None and time_budget_ms:
+        time_budget_ms = min(time_budget_ms, cancel_token.remaining_s() * 1000)
+    if time_budget_ms:
+        if progress:
+            progress.stage("local_search")
+        bins, local_search_stats = improve_bins(bins, int(effective_tray_width), int(effective_tray_length), time_budget_ms, lower_bound=lower_bound, progress=progress, cancel_token=cancel_token)
     
     # Use in-memory storage for tray layouts (Prisma is not available in Python environment)
     tray_layouts = []
@@ -351,5 +312,30 @@ def optimise_rectpack(df: pd.DataFrame, tray_width_in: float = 36, tray_length_i
     
     # Add tray layout data to result DataFrame
     result_df.attrs['tray_layouts'] = tray_layouts
-    
-    return result_df 
\ No newline at end of file
+    result_df.attrs['lower_bounds'] = bounds
+    result_df.attrs['slot_cache'] = geometry['cache']
+    if unplaced:
+        unplaced_skus = sorted({rid.split('_T')[0] for _, _, rid in unplaced})
+        result_df.attrs['incomplete'] = incomplete('deadline', unplaced_slots=len(unplaced), unplaced_skus=unplaced_skus)
+        print(f"[RECTPACK ALGORITHM] Deadline reached: {len(unplaced)} slots of {len(unplaced_skus)} SKUs not placed")
+    if local_search_stats or portfolio or rotation or standard_stats:
+        engine_stats = {'trays_used': len(tray_layouts)}
+        if standard_stats:
+            engine_stats['standard_sizes'] = standard_stats
+        if portfolio:
+            engine_stats['portfolio'] = {'best_sort': best_sort, 'orders_tried': tried, 'orders_available': len(sort_algos)}
+        if local_search_stats:
+            engine_stats['local_search'] = local_search_stats
+        if rotation_stats:
+            rotation_stats['rotated_placements'] = sum(slot.get('rotated', False) for tray in tray_layouts for slot in tray['slots'])
+            engine_stats['rotation'] = rotation_stats
+        elif rotation:
+            engine_stats['rotation'] = {'rotated_trays': len(tray_layouts), 'used_rotation': True, 'baseline_skipped': 'deadline', 'trays_saved_by_rotation': None}
+        result_df.attrs['engine_stats'] = engine_stats
+    
+    return result_df
+
+
+def optimise_rectpack_portfolio(df: pd.DataFrame, **kw):
+    """rectpack with a portfolio of sort orders, stopping at the lower bound."""
+    return optimise_rectpack(df, portfolio=True, **kw)
@@ -0,0 +1,136 @@
+"""
+Registry of tray optimization engines.
+
+Each engine declares a name, an import path ("module:function") and its
+capabilities. The engine module is only imported the first time the engine
+is used, so workers that never run a heavy engine never pay for its imports.
+"""
+import importlib
+import threading
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Tuple
+
+
+@dataclass(frozen=True)
+class EngineSpec:
+    name: str
+    import_path: str
+    description: str = ""
+    aliases: Tuple[str, ...] = ()
+    weight_aware: bool = False   # respects weight_limit_lb per tray
+    rotation: bool = False       # may rotate slots on the tray floor
+    three_d: bool = False        # packs in 3D using tray_depth_in directly
+    time_budget: bool = False    # accepts a time budget and stops on it
+    layouts: bool = False        # returns per-tray slot layouts (needed for dividers)
+
+
+_ENGINES: Dict[str, EngineSpec] = {}
+_ALIASES: Dict[str, str] = {}
+_LOADED: Dict[str, Callable] = {}
+_LOAD_LOCK = threading.Lock()
+
+
+def register_engine(name: str, import_path: str, aliases: Tuple[str, ...] = (), **capabilities) -> EngineSpec:
+    """Register (or replace) an engine. Nothing is imported until load_engine is called."""
+    spec = EngineSpec(name=name, import_path=import_path, aliases=tuple(aliases), **capabilities)
+    _ENGINES[name] = spec
+    _LOADED.pop(name, None)
+    for alias in spec.aliases:
+        _ALIASES[alias] = name
+    return spec
+
+
+def resolve_engine(name: str) -> EngineSpec:
+    """Return the spec for an engine name or alias. Raises KeyError if unknown."""
+    canonical = _ALIASES.get(name, name)
+    if canonical not in _ENGINES:
+        raise KeyError(f"Unknown model: {name}. Available models: {engine_names()}")
+    return _ENGINES[canonical]
+
+
+def is_registered(name: str) -> bool:
+    return _ALIASES.get(name, name) in _ENGINES
+
+
+def load_engine(name: str) -> Callable:
+    """Import (once) and return the optimise function for an engine name or alias."""
+    spec = resolve_engine(name)
+    func = _LOADED.get(spec.name)
+    if func is None:
+        with _LOAD_LOCK:
+            func = _LOADED.get(spec.name)
+            if func is None:
+                module_name, attr = spec.import_path.split(":")
+                func = getattr(importlib.import_module(module_name), attr)
+                _LOADED[spec.name] = func
+                print(f"[REGISTRY] Loaded engine '{spec.name}' from {spec.import_path}")
+    return func
+
+
+def is_loaded(name: str) -> bool:
+    return resolve_engine(name).name in _LOADED
+
+
+def engine_names(include_aliases: bool = True) -> List[str]:
+    names = list(_ENGINES)
+    if include_aliases:
+        names += list(_ALIASES)
+    return names
+
+
+def list_engines() -> List[dict]:
+    """JSON-friendly description of every registered engine."""
+    return [dict(asdict(spec), loaded=spec.name in _LOADED) for spec in _ENGINES.values()]
+
+
+# Built-in engines
+register_engine(
+    "rectpack",
+    "algorithms.rectpack_algorithm:optimise_rectpack",
+    aliases=("maximal-rectangles",),
+    description="Maximal-Rectangles 2D bin packing of per-SKU slots (rectpack)",
+    rotation=True,
+    time_budget=True,
+    layouts=True,
+)
+register_engine(
+    "rectpack-portfolio",
+    "algorithms.rectpack_algorithm:optimise_rectpack_portfolio",
+    aliases=("portfolio",),
+    description="rectpack over several sort orders, keeping the best and stopping at the lower bound",
+    rotation=True,
+    time_budget=True,
+    layouts=True,
+)
+register_engine(
+    "rectpack-sharded",
+    "algorithms.sharded_algorithm:optimise_sharded",
+    aliases=("sharded",),
+    description="rectpack on tier/footprint partitions in parallel processes, then consolidation (very large lists)",
+    rotation=True,
+    time_budget=True,
+    layouts=True,
+)
+register_engine(
+    "simple",
+    "algorithms.simple_algorithm:optimise_simple",
+    aliases=("greedy",),
+    description="Per-SKU slot sizing with greedy tray counts, no layouts",
+)
+register_engine(
+    "extreme-point-3d",
+    "algorithms.extreme_point_algorithm:optimise_extreme_point",
+    aliases=("3d",),
+    description="3D extreme-point packing on tray depth; short SKUs share footprints",
+    weight_aware=True,
+    three_d=True,
+    layouts=True,
+)
+register_engine(
+    "exact-ilp",
+    "algorithms.ilp_algorithm:optimise_exact_ilp",
+    aliases=("ilp",),
+    description="Column generation over rectpack slot patterns with a proven gap (small lists)",
+    time_budget=True,
+    layouts=True,
+)
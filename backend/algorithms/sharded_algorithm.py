@@ -0,0 +1,232 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import pandas as pd
+import rectpack
+from rectpack import newPacker
+from .rectpack_algorithm import optimise_rectpack
+from .bounds import layout_lower_bounds
+from .cancellation import incomplete
+from .geometry import quantity_column
+from .tiers import sku_tier_labels
+
+# Target SKUs per partition; rectpack cost grows faster than linearly with the number of slots
+SHARD_TARGET_SKUS = int(os.getenv("SHARD_TARGET_SKUS", "1000"))
+# Worker processes for the partitions (default: one per core)
+SHARD_MAX_WORKERS = int(os.getenv("SHARD_MAX_WORKERS", "0")) or None
+# Trays filled below this fraction are handed to the consolidation pass
+CONSOLIDATE_FILL = 0.85
+# How often the parent looks at the cancel flag while partitions are packing
+CANCEL_POLL_S = 0.5
+
+# Partition workers, kept between runs so each request does not pay for
+# spawning interpreters and importing numpy/pandas/rectpack again
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def partition_skus(df: pd.DataFrame, tray_width_in: float, tray_length_in: float, buffer_pct: float, target_skus: int = SHARD_TARGET_SKUS):
+    """
+    Split SKUs into about len(df) / target_skus partitions: first by tier
+    (sku_tier_labels), then each tier sorted by footprint and cut into
+    contiguous runs, so every partition holds items of similar size.
+    Partitions are balanced on footprint x quantity (the slot area to pack),
+    which tracks packing time much better than the SKU count.
+    Returns a list of index arrays into df.
+    """
+    tiers = sku_tier_labels(df, tray_width_in * buffer_pct, tray_length_in * buffer_pct)
+    footprint = (df['width_in'].fillna(1) * df['length_in'].fillna(1)).to_numpy(dtype=float)
+    load = footprint * df[quantity_column(df)].fillna(1).clip(lower=1).to_numpy(dtype=float)
+    n_parts_total = max(1, int(np.ceil(len(df) / target_skus)))
+
+    partitions = []
+    for tier in np.unique(tiers):
+        members = np.flatnonzero(tiers == tier)
+        members = members[np.argsort(-footprint[members], kind="stable")]
+        n_parts = max(1, int(round(n_parts_total * load[members].sum() / max(load.sum(), 1e-9))))
+        # Cut where the cumulative load crosses each 1/n_parts mark
+        cumulative = np.cumsum(load[members])
+        cuts = np.searchsorted(cumulative, cumulative[-1] * np.arange(1, n_parts) / n_parts)
+        partitions.extend(part for part in np.split(members, cuts) if len(part))
+    return partitions
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    The shared spawn pool, replaced when it broke or has fewer than workers
+    processes (the old one finishes the partitions already queued on it).
+    """
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None or _pool._broken or _pool_size < workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: safe when called from a threaded server or from another pool worker
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_size = workers
+            print(f"[SHARDED] Started partition pool with {workers} workers")
+        return _pool
+
+
+def shutdown_pool():
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool, _pool_size = None, 0
+
+
+def _pack_partition(df_part: pd.DataFrame, kw: dict):
+    """Worker entry point: rectpack one partition, returning only what the merge needs."""
+    import contextlib
+    import io
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = optimise_rectpack(df_part, **kw)
+    return result, round(time.perf_counter() - started, 2)
+
+
+def consolidate_trays(tray_layouts, W, L, rotation=False, fill_threshold=CONSOLIDATE_FILL):
+    """
+    Re-pack the slots of all trays filled below fill_threshold together.
+    Each partition typically ends with a few partly filled trays; packed as one
+    set they usually need fewer trays. Returns (tray layouts, trays merged away).
+    """
+    fill = [sum(s['width_in'] * s['length_in'] for s in tray['slots']) / (W * L) for tray in tray_layouts]
+    loose = [i for i, f in enumerate(fill) if f < fill_threshold]
+    if len(loose) < 2:
+        return tray_layouts, 0
+
+    slots = [slot for i in loose for slot in tray_layouts[i]['slots']]
+    packer = newPacker(mode=rectpack.PackingMode.Offline, bin_algo=rectpack.PackingBin.BBF, sort_algo=rectpack.SORT_AREA, rotation=rotation)
+    for idx, slot in enumerate(slots):
+        packer.add_rect(slot['width_in'], slot['length_in'], rid=idx)
+    packer.add_bin(W, L, float("inf"))
+    packer.pack()
+    if len(packer.rect_list()) < len(slots) or len(packer) >= len(loose):
+        return tray_layouts, 0
+
+    repacked = {}
+    for bin_id, x, y, w, l, idx in packer.rect_list():
+        slot = dict(slots[idx], x_in=x, y_in=y, width_in=w, length_in=l)
+        if rotation:
+            slot['rotated'] = slots[idx].get('rotated', False) != (w != slots[idx]['width_in'])
+        repacked.setdefault(bin_id, []).append(slot)
+    loose_set = set(loose)
+    kept = [tray['slots'] for i, tray in enumerate(tray_layouts) if i not in loose_set]
+    merged = kept + [repacked[b] for b in sorted(repacked)]
+    return [{'tray_id': i, 'slots': s} for i, s in enumerate(merged)], len(loose) - len(repacked)
+
+
+def optimise_sharded(df: pd.DataFrame, tray_width_in: float = 36, tray_length_in: float = 156, tray_depth_in: float = 18, buffer_pct: float = 0.95, max_workers: int = None, target_skus: int = SHARD_TARGET_SKUS, progress=None, **kw):
+    """
+    Partitioned rectpack for very large inventories.
+
+    SKUs are partitioned by tier and footprint (partition_skus), every
+    partition is packed by optimise_rectpack in its own worker process, and a
+    consolidation pass re-packs the partly filled trays of all partitions
+    together. Lists that fit in one partition are packed in-process.
+    progress reports partitions as they finish (the workers themselves report nothing).
+    A cancel_token in kw reaches every partition. Past its deadline partitions
+    return what they placed and partitions not started yet are skipped; the
+    merged plan is then marked incomplete.
+    """
+    print(f"[SHARDED] Starting optimization with {len(df)} SKUs")
+    started = time.perf_counter()
+    W, L = int(tray_width_in * buffer_pct), int(tray_length_in * buffer_pct)
+    kw = dict(kw, tray_width_in=tray_width_in, tray_length_in=tray_length_in, tray_depth_in=tray_depth_in, buffer_pct=buffer_pct)
+    # Each partition's slots are independent; the merged plan gets its own bounds and stats
+    kw.pop('inventory_list_id', None)
+
+    partitions = partition_skus(df, tray_width_in, tray_length_in, buffer_pct, target_skus)
+    parts = [df.iloc[idx] for idx in partitions]
+    workers = min(len(parts), max_workers or SHARD_MAX_WORKERS or os.cpu_count() or 1)
+    print(f"[SHARDED] {len(parts)} partitions ({[len(p) for p in parts]}) on {workers} workers")
+
+    # Ship each worker only the stored geometry of its own SKUs
+    stored = kw.pop('stored_geometry', None)
+    part_kws = [kw if stored is None else dict(kw, stored_geometry=stored[stored.index.isin(part['sku_id'].astype(str))]) for part in parts]
+    if progress:
+        progress.stage("partitions", partitions=len(parts), partitions_done=0)
+    cancel_token = kw.get('cancel_token')
+    skipped = []
+    if len(parts) == 1 or workers == 1:
+        results = []
+        for part, part_kw in zip(parts, part_kws):
+            if results and cancel_token and cancel_token.check():
+                skipped.append(part)
+                continue
+            results.append(_pack_partition(part, part_kw))
+            if progress:
+                progress.update(partitions_done=len(results), trays_open=sum(len(r.attrs['tray_layouts']) for r, _ in results))
+    else:
+        pool = _get_pool(max(workers, SHARD_MAX_WORKERS or os.cpu_count() or 1))
+        futures = []
+        try:
+            pending = set()
+            while len(futures) + len(skipped) < len(parts) or pending:
+                # At most workers partitions of this run in flight on the shared pool
+                while len(futures) + len(skipped) < len(parts) and len(pending) < workers:
+                    if futures and cancel_token and cancel_token.check():
+                        skipped = parts[len(futures):]
+                        break
+                    futures.append(pool.submit(_pack_partition, parts[len(futures)], part_kws[len(futures)]))
+                    pending.add(futures[-1])
+                # Wake up now and then to notice a cancel (thread-mode tokens reach workers with the deadline only)
+                _, pending = wait(pending, timeout=CANCEL_POLL_S if cancel_token else None, return_when=FIRST_COMPLETED)
+                if progress:
+                    progress.update(partitions_done=len(futures) - len(pending))
+                if cancel_token and cancel_token.cancelled:
+                    cancel_token.check()
+            results = [future.result() for future in futures]
+        finally:
+            # A cancelled or failed run drops its partitions that have not started
+            for future in futures:
+                future.cancel()
+    pack_s = round(time.perf_counter() - started, 2)
+
+    # Merge: renumber trays across partitions, then consolidate the partly filled ones
+    tray_layouts = []
+    for result, _ in results:
+        for tray in result.attrs['tray_layouts']:
+            tray_layouts.append({'tray_id': len(tray_layouts), 'slots': tray['slots']})
+    trays_before = len(tray_layouts)
+    if progress:
+        progress.stage("consolidation", trays_open=trays_before)
+    tray_layouts, merged = consolidate_trays(tray_layouts, W, L, rotation=kw.get('rotation', False))
+    if progress:
+        progress.best(len(tray_layouts))
+    print(f"[SHARDED] {trays_before} trays from partitions, {merged} merged away by consolidation")
+
+    sku_trays = {}
+    for tray in tray_layouts:
+        for slot in tray['slots']:
+            sku_trays.setdefault(slot['sku_id'], set()).add(tray['tray_id'])
+    result_df = pd.concat([result for result, _ in results] + skipped).loc[df.index]
+    result_df['trays_needed'] = result_df['sku_id'].map(lambda x: len(sku_trays.get(x, set())))
+    result_df.attrs = {}
+    result_df.attrs['tray_layouts'] = tray_layouts
+    result_df.attrs['lower_bounds'] = layout_lower_bounds(tray_layouts, W, L)
+    partial = [result.attrs['incomplete'] for result, _ in results if result.attrs.get('incomplete')]
+    if partial or skipped:
+        unplaced_skus = sorted({sku for p in partial for sku in p['unplaced_skus']} | {str(sku) for part in skipped for sku in part['sku_id']})
+        result_df.attrs['incomplete'] = incomplete('deadline', unplaced_slots=sum(p['unplaced_slots'] for p in partial), partitions_skipped=len(skipped), unplaced_skus=unplaced_skus)
+    result_df.attrs['engine_stats'] = {
+        'trays_used': len(tray_layouts),
+        'partitions': len(parts),
+        'partition_skus': [len(p) for p in parts],
+        'partition_trays': [len(result.attrs['tray_layouts']) for result, _ in results],
+        'partition_s': [elapsed for _, elapsed in results],
+        'workers': workers,
+        'trays_before_consolidation': trays_before,
+        'trays_merged': merged,
+        'pack_s': pack_s,
+        'total_s': round(time.perf_counter() - started, 2),
+    }
+    print(f"[SHARDED] {len(tray_layouts)} trays in {result_df.attrs['engine_stats']['total_s']}s")
+    return result_df
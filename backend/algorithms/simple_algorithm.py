@@ -1,14 +1,18 @@
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple, Optional
+from .progress import PROGRESS_EVERY
+from .cancellation import incomplete
 
-def optimise_simple(df: pd.DataFrame, tray_width_in: float = 36, tray_length_in: float = 156, tray_depth_in: float = 18, buffer_pct: float = 0.95, **kw):
+def optimise_simple(df: pd.DataFrame, tray_width_in: float = 36, tray_length_in: float = 156, tray_depth_in: float = 18, buffer_pct: float = 0.95, cancel_token=None, **kw):
     """
     Simple optimizer following the straightforward approach:
     1. Calculate vertical layers
     2. Calculate slot dimensions with 1-inch snap
     3. Greedy row packing
     4. Summarize results
+    cancel_token (a CancelToken) is checked in the per-SKU loops; past its deadline
+    the remaining SKUs get no trays and attrs['incomplete'] lists them.
     """
     # Determine quantity column
     if 'on_shelf_units' in df.columns:
@@ -52,6 +56,8 @@ def optimise_simple(df: pd.DataFrame, tray_width_in: float = 36, tray_length_in:
     grid_dim2_list = []
     
     for i in range(len(df_work)):
+        if cancel_token and i and i % PROGRESS_EVERY == 0 and cancel_token.check():
+            break
         height_layers = layers_height.iloc[i]
         width_layers = layers_width.iloc[i]
         length_layers = layers_length.iloc[i]
@@ -86,6 +92,9 @@ def optimise_simple(df: pd.DataFrame, tray_width_in: float = 36, tray_length_in:
             grid_dim1_list.append(height_dim)
             grid_dim2_list.append(width_dim)
     
+    # Past the deadline the SKUs not reached are set aside and returned without trays
+    pending = df_work.iloc[len(layers_list):]
+    df_work = df_work.iloc[:len(layers_list)].copy()
     df_work["layers"] = layers_list
     df_work["height_orientation"] = height_orientation
     df_work["grid_dim1"] = grid_dim1_list
@@ -129,7 +138,9 @@ def optimise_simple(df: pd.DataFrame, tray_width_in: float = 36, tray_length_in:
     
     # Calculate trays needed for each SKU
     trays_needed_list = []
-    for _, row in df_work.iterrows():
+    for i, (_, row) in enumerate(df_work.iterrows()):
+        if cancel_token and i and i % PROGRESS_EVERY == 0 and cancel_token.check():
+            break
         units = row[quantity_col]
         layers = row.layers
         units_per_layer = row.units_per_layer
@@ -138,6 +149,8 @@ def optimise_simple(df: pd.DataFrame, tray_width_in: float = 36, tray_length_in:
         trays_needed = int(np.ceil(units / (layers * units_per_layer)))
         trays_needed_list.append(trays_needed)
     
+    pending = pd.concat([df_work.iloc[len(trays_needed_list):], pending])
+    df_work = df_work.iloc[:len(trays_needed_list)].copy()
     df_work["trays_needed"] = trays_needed_list
     
     # Calculate on-shelf units
@@ -147,4 +160,9 @@ def optimise_simple(df: pd.DataFrame, tray_width_in: float = 36, tray_length_in:
         df_work["units_per_layer"]
     )
     
+    if len(pending):
+        unplaced = pending.assign(layers=0, units_per_layer=0, slot_w_in=0, slot_l_in=0, trays_needed=0, on_shelf_units=0)
+        df_work = pd.concat([df_work, unplaced])
+        df_work.attrs['incomplete'] = incomplete('deadline', unplaced_skus=pending['sku_id'].tolist())
+        print(f"[SIMPLE ALGORITHM] Deadline reached: {len(pending)} SKUs not sized")
     return df_work 
\ No newline at end of file
@@ -0,0 +1,27 @@
+"""
+Size tiers of SKUs (oversized / small / medium / large).
+
+Used by optimiser.classify_skus for the tier column and by the sharded engine
+to keep items of similar size in the same partition.
+"""
+import numpy as np
+import pandas as pd
+
+
+def sku_tier_labels(df: pd.DataFrame, W_eff: float, L_eff: float) -> np.ndarray:
+    """
+    Vectorized tier labels: oversized / small / medium / large
+    """
+    width = df['width_in'].to_numpy(dtype=float)
+    length = df['length_in'].to_numpy(dtype=float)
+    height = df['height_in'].to_numpy(dtype=float)
+
+    return np.select(
+        [
+            (width > W_eff) | (length > L_eff),
+            (width < 6) & (length < 6) & (height < 6),
+            (width < 12) & (length < 12) & (height < 12),
+        ],
+        ['oversized', 'small', 'medium'],
+        default='large'
+    )
@@ -1,43 +1,143 @@
+import time
+APP_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import functools
 import os
-from fastapi import FastAPI, UploadFile, Form, Depends, HTTPException, status, Path, Query
+import io, json
+import threading
+from fastapi import FastAPI, UploadFile, Form, Depends, HTTPException, status, Path, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd, optimiser, io, json
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
-from models import Base, TrayConfig, Inventory
-from dotenv import load_dotenv
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
+from sqlalchemy import text, select, delete, insert, update, bindparam
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import TrayConfig, Inventory
+from database import DATABASE_URL, get_engine, get_db, get_async_engine, get_async_db, ensure_async_tables
+from algorithms.registry import is_registered, resolve_engine, engine_names, list_engines
+from execution import optimization_slot, run_cpu_bound, run_cpu_bound_batch, run_single_flight, single_flight_stats, get_executor, shutdown_executor, optimizations_running
+from plan_cache import plan_key, load_result, run_and_store
+import result_store
+from profiling import PROFILING_ENABLED, PROFILE_ADMIN_TOKEN, ProfilingMiddleware, list_profiles, profile_path
+from jobs import job_run, check_job_available, cancel_job, watch_job, stream_job_events, get_job, shutdown_jobs
+from algorithms.cancellation import RunCancelled
+from slot_geometry_store import refresh_slot_geometry, load_stored_geometry, load_config_geometry
+from sku_master import INVENTORY_FIELDS, select_inventory, select_daily_sales, upsert_skus, sku_ids
 import traceback
-import numpy as np
 
-load_dotenv()  # Loads .env file from project root
+# pandas, numpy, openpyxl and optimiser are imported inside the handlers that
+# need them (and by the startup warm-up) so the worker can bind its port fast.
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") != "0"
+WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", "2"))
+# Database warm-up steps are retried with exponential backoff from/up to these delays
+WARMUP_RETRY_S = float(os.getenv("WARMUP_RETRY_S", "1"))
+WARMUP_RETRY_MAX_S = float(os.getenv("WARMUP_RETRY_MAX_S", "30"))
+# Largest design-search grid accepted (points before refinement)
+DESIGN_MAX_GRID_POINTS = int(os.getenv("DESIGN_MAX_GRID_POINTS", "2000"))
+# Rows per executemany INSERT when importing / copying inventory and daily sales
+IMPORT_BATCH_ROWS = int(os.getenv("IMPORT_BATCH_ROWS", "5000"))
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Warm-up state reported by /ready
+warmup_state = {
+    "ready": False,
+    "started": False,
+    "error": None,
+    "failed": False,      # a step that is not retried raised; only a restart helps
+    "retries": {},        # failed attempts per retried (database) step
+    "app_import_ms": None,
+    "timings_ms": {},
+}
 
-# Initialize database connection lazily
-engine = None
-SessionLocal = None
+def _timed_step(name, func):
+    start = time.perf_counter()
+    func()
+    warmup_state["timings_ms"][name] = round((time.perf_counter() - start) * 1000, 1)
 
-def get_engine():
-    global engine
-    if engine is None:
-        if not DATABASE_URL:
-            raise ValueError("DATABASE_URL environment variable is not set")
-        engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-        Base.metadata.create_all(bind=engine)
-    return engine
+def _retried_step(name, func):
+    """
+    _timed_step until it succeeds, backing off between attempts, so a database
+    that is briefly unreachable at boot delays readiness instead of failing it.
+    """
+    delay = WARMUP_RETRY_S
+    while True:
+        try:
+            _timed_step(name, func)
+            warmup_state["error"] = None
+            return
+        except Exception as e:
+            warmup_state["error"] = f"{name}: {e}"
+            warmup_state["retries"][name] = warmup_state["retries"].get(name, 0) + 1
+            print(f"[WARMUP] {name} failed ({e}), retrying in {delay:.0f}s")
+            time.sleep(delay)
+            delay = min(delay * 2, WARMUP_RETRY_MAX_S)
 
-def get_session_local():
-    global SessionLocal
-    if SessionLocal is None:
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
-    return SessionLocal
+def _warm_imports():
+    import pandas, numpy, openpyxl, optimiser  # noqa: F401
 
-def get_db():
-    db = get_session_local()()
+def _warm_database():
+    """Create tables and fill the connection pool so the first request doesn't connect."""
+    eng = get_engine()
+    connections = []
     try:
-        yield db
+        for _ in range(max(1, WARMUP_DB_CONNECTIONS)):
+            conn = eng.connect()
+            conn.execute(text("SELECT 1"))
+            connections.append(conn)
     finally:
-        db.close()
+        for conn in connections:
+            conn.close()  # returned to the pool, not closed
+
+async def _warm_async_database():
+    """Same as _warm_database for the asyncio engine (must run on the server's event loop)."""
+    await ensure_async_tables()
+    eng = get_async_engine()
+    connections = []
+    try:
+        for _ in range(max(1, WARMUP_DB_CONNECTIONS)):
+            conn = await eng.connect()
+            await conn.execute(text("SELECT 1"))
+            connections.append(conn)
+    finally:
+        for conn in connections:
+            await conn.close()
+
+def _warm_optimization():
+    """Run a tiny optimization so engine imports and first-call paths are hot."""
+    import pandas as pd
+    import optimiser
+    df = pd.DataFrame({
+        'sku_id': ['WARM1', 'WARM2', 'WARM3'],
+        'description': ['warm-up', 'warm-up', 'warm-up'],
+        'length_in': [6.0, 10.0, 4.0],
+        'width_in': [4.0, 8.0, 3.0],
+        'height_in': [3.0, 5.0, 2.0],
+        'weight_lb': [1.0, 4.0, 0.5],
+        'on_shelf_units': [10, 4, 25],
+    })
+    # Through the optimizer pool so process workers are spawned and warm too
+    get_executor().submit(optimiser.optimise_plan, df, model="rectpack", classify=True).result()
+
+def warm_up(loop=None):
+    """Import heavy modules, warm the DB pools and run a tiny optimization."""
+    warmup_state["started"] = True
+    print("[WARMUP] Starting warm-up")
+    try:
+        _timed_step("imports", _warm_imports)
+        if DATABASE_URL:
+            _retried_step("database", _warm_database)
+            if loop is not None:
+                _retried_step("async_database", lambda: asyncio.run_coroutine_threadsafe(_warm_async_database(), loop).result())
+        else:
+            print("[WARMUP] DATABASE_URL not set, skipping database warm-up")
+        _timed_step("optimization", _warm_optimization)
+        warmup_state["ready"] = True
+        print(f"[WARMUP] Ready: {warmup_state['timings_ms']}")
+    except Exception as e:
+        warmup_state["error"] = str(e)
+        warmup_state["failed"] = True
+        print(f"[WARMUP] Error: {str(e)}")
+        traceback.print_exc()
 
 app = FastAPI(title="Tray Optimizer MVP")
 
@@ -50,13 +150,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request profiling (X-Profile: 1); not installed at all unless REQUEST_PROFILING=1
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
 @app.get("/")
 def read_root():
     return {"message": "Tray Optimizer MVP API is running"}
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "database_url_set": bool(DATABASE_URL)}
+    return {"status": "healthy", "database_url_set": bool(DATABASE_URL), "optimizations_running": optimizations_running(), "single_flight": single_flight_stats(), "result_store": result_store.store_stats()}
+
+@app.on_event("startup")
+async def start_warm_up():
+    """Warm up in a background thread so the port is bound immediately; /ready reports completion."""
+    if WARMUP_ON_STARTUP:
+        loop = asyncio.get_running_loop()
+        threading.Thread(target=warm_up, args=(loop,), name="warm-up", daemon=True).start()
+    else:
+        warmup_state["ready"] = True
+
+@app.on_event("shutdown")
+async def shutdown_resources():
+    import sys
+    import database
+    shutdown_executor()
+    shutdown_jobs()
+    # The sharded engine's partition pool, if it was ever loaded
+    sharded = sys.modules.get("algorithms.sharded_algorithm")
+    if sharded is not None:
+        sharded.shutdown_pool()
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+
+@app.get("/ready")
+def readiness_check():
+    """
+    Readiness probe: 200 once warm-up has finished, 503 before that (or if it
+    failed). A database step that failed is being retried ("retrying").
+    """
+    body = {"status": "ready" if warmup_state["ready"] else "warming_up", **warmup_state}
+    if warmup_state["failed"]:
+        body["status"] = "error"
+    elif warmup_state["error"]:
+        body["status"] = "retrying"
+    if not warmup_state["ready"]:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+@app.get("/models")
+def get_models():
+    """List registered optimization engines and their capabilities."""
+    return {"models": list_engines()}
+
+@app.get("/slot-cache")
+def get_slot_cache_stats():
+    """Hit/miss counters of the per-SKU slot geometry memo (this process; process pool workers keep their own)."""
+    from algorithms.geometry import slot_cache_stats
+    return slot_cache_stats()
 
 def convert_numpy(obj):
     if isinstance(obj, dict):
@@ -88,6 +240,9 @@ def create_tray_config(config: dict, db: Session = Depends(get_db)):
         db.commit()
         db.refresh(tray)
         print("[POST /tray-configs] Saved tray config with id:", tray.id)
+        # Precompute slot geometry of every inventory list for this tray
+        refresh_slot_geometry(db, tray_config_id=tray.id)
+        db.commit()
         return tray
     except Exception as e:
         db.rollback()
@@ -103,172 +258,192 @@ def update_tray_config(config_id: int = Path(...), config: dict = None, db: Sess
     tray = db.query(TrayConfig).filter(TrayConfig.id == config_id).first()
     if not tray:
         raise HTTPException(status_code=404, detail="Tray configuration not found")
+    dimensions_before = (tray.tray_length_in, tray.tray_width_in, tray.tray_depth_in)
     for key, value in config.items():
         if hasattr(tray, key):
             setattr(tray, key, value)
     db.commit()
     db.refresh(tray)
+    if (tray.tray_length_in, tray.tray_width_in, tray.tray_depth_in) != dimensions_before:
+        # Stored geometry was derived from the old dimensions
+        refresh_slot_geometry(db, tray_config_id=tray.id)
+        db.commit()
     return tray
 
+def _read_inventory_upload(filename: str, file_content: bytes):
+    """
+    Parse an uploaded inventory CSV/Excel file into (inventory frame, daily
+    sales frame of date/sku/units or None). Blocking (openpyxl/pandas): call it
+    off the event loop.
+    """
+    import pandas as pd
+    daily_sales = None
+    df = None
+    # Determine file type and read accordingly
+    if filename.lower().endswith('.csv'):
+        try:
+            df = pd.read_csv(io.BytesIO(file_content), header=2)  # Try row 3 as header
+            if df.columns[0] not in ['SKU', 'sku_id']:
+                # If not the expected header, try first row
+                df = pd.read_csv(io.BytesIO(file_content), header=0)
+        except Exception as e:
+            print(f"[POST /import-inventory] CSV read error: {e}, trying header=0 fallback")
+            df = pd.read_csv(io.BytesIO(file_content), header=0)
+    elif filename.lower().endswith(('.xlsx', '.xls')):
+        import openpyxl
+        wb = openpyxl.load_workbook(io.BytesIO(file_content), data_only=True)
+        # Ignore 'Definitions' sheet for validation
+        sheet_names = [name for name in wb.sheetnames if name != 'Definitions']
+        print(f"[POST /import-inventory] Excel sheets (excluding Definitions): {sheet_names}")
+        # Annual template: single sheet, daily template: two sheets
+        if len(sheet_names) == 1 and sheet_names[0] in ["SKU Master", "Inventory Template"]:
+            ws = wb[sheet_names[0]]
+            headers = [cell.value for cell in next(ws.iter_rows(min_row=3, max_row=3))]
+            required = [
+                'SKU', 'Product Name', 'Length (in)', 'Width (in)', 'Height (in)',
+                'Weight (lb)', 'In Stock', 'Annual Sales'
+            ]
+            if not all(h in headers for h in required):
+                raise HTTPException(status_code=400, detail=f"Missing required columns in SKU Master: {required}")
+            # Read data into DataFrame
+            df = pd.DataFrame(ws.iter_rows(min_row=4, values_only=True), columns=headers)
+        elif len(sheet_names) == 2 and set(sheet_names) == {"SKU Master", "Daily Sales"}:
+            ws_sku = wb["SKU Master"]
+            ws_daily = wb["Daily Sales"]
+            sku_headers = [cell.value for cell in next(ws_sku.iter_rows(min_row=3, max_row=3))]
+            daily_headers = [cell.value for cell in next(ws_daily.iter_rows(min_row=3, max_row=3))]
+            sku_required = [
+                'SKU', 'Product Name', 'Length (in)', 'Width (in)', 'Height (in)',
+                'Weight (lb)', 'In Stock', 'Annual Sales'
+            ]
+            daily_required = ['Date', 'SKU', 'Units Sold']
+            if not all(h in sku_headers for h in sku_required):
+                raise HTTPException(status_code=400, detail=f"Missing required columns in SKU Master: {sku_required}")
+            if not all(h in daily_headers for h in daily_required):
+                raise HTTPException(status_code=400, detail=f"Missing required columns in Daily Sales: {daily_required}")
+            # Read data into DataFrames
+            df_sku = pd.DataFrame(ws_sku.iter_rows(min_row=4, values_only=True), columns=sku_headers)
+            df_daily = pd.DataFrame(ws_daily.iter_rows(min_row=4, values_only=True), columns=daily_headers)
+            # Use SKU Master for inventory import
+            df = df_sku
+            # Store daily sales data for later processing
+            daily_sales = df_daily
+        else:
+            raise HTTPException(status_code=400, detail="Excel file must have either one sheet named 'SKU Master' or two sheets named 'SKU Master' and 'Daily Sales'. (Other sheets like 'Definitions' are ignored.)")
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported file format. Please upload a CSV or Excel file."
+        )
+    print(f"[POST /import-inventory] Loaded {len(df)} rows, columns: {df.columns.tolist()}")
+    # Map new column names to database column names
+    column_mapping = {
+        'SKU': 'sku_id',
+        'Product Name': 'description',
+        'Length (in)': 'length_in',
+        'Width (in)': 'width_in',
+        'Height (in)': 'height_in',
+        'Weight (lb)': 'weight_lb',
+        'In Stock': 'on_hand_units',
+        'Annual Sales': 'annual_units_sold',
+    }
+    # Rename columns if they match the new template format
+    df_columns = df.columns.tolist()
+    if any(col in column_mapping for col in df_columns):
+        df = df.rename(columns=column_mapping)
+    # Drop empty rows (all NaN)
+    df = df.dropna(how='all')
+    if daily_sales is not None and daily_sales.empty:
+        daily_sales = None
+    if daily_sales is not None:
+        # Daily sales: parse the whole column at once, MM/DD/YYYY or any other format
+        sales = daily_sales.dropna(subset=['Date', 'SKU', 'Units Sold'])
+        date_str = sales['Date'].astype(str)
+        slashed = date_str.str.contains('/', regex=False)
+        dates = pd.Series(pd.NaT, index=sales.index, dtype='datetime64[ns]')
+        dates[slashed] = pd.to_datetime(date_str[slashed], format='%m/%d/%Y', errors='coerce')
+        dates[~slashed] = pd.to_datetime(date_str[~slashed], format='mixed', errors='coerce')
+        units = pd.to_numeric(sales['Units Sold'], errors='coerce')
+        valid = dates.notna() & units.notna()
+        if not valid.all():
+            print(f"[POST /import-inventory] Skipping {int((~valid).sum())} daily sales rows with an unreadable date or units")
+        codes = sales.loc[valid, 'SKU'].astype(str)
+        daily_sales = pd.DataFrame({'date': dates[valid], 'sku': codes, 'units': units[valid]})
+    return df, daily_sales
+
+
 @app.post("/import-inventory")
-async def import_inventory(file: UploadFile, inventory_list_id: str = Form(None), db: Session = Depends(get_db)):
-    """Import inventory data from CSV or Excel into database. Optionally associate with an inventory list."""
+async def import_inventory(file: UploadFile, inventory_list_id: str = Form(None), db: AsyncSession = Depends(get_async_db)):
+    """
+    Import inventory data from CSV or Excel into database. Optionally associate with an inventory list.
+
+    Description and dimensions live in the shared SKU master: importing a code
+    that other lists also hold with different values updates it for those lists
+    too (their next optimization uses the new dimensions; stored geometry
+    computed from the old ones is ignored).
+    """
+    import pandas as pd
     print(f"[POST /import-inventory] Processing file: {file.filename}")
     try:
         file_content = await file.read()
-        df = None
-        # Determine file type and read accordingly
-        if file.filename.lower().endswith('.csv'):
-            try:
-                df = pd.read_csv(io.BytesIO(file_content), header=2)  # Try row 3 as header
-                if df.columns[0] not in ['SKU', 'sku_id']:
-                    # If not the expected header, try first row
-                    df = pd.read_csv(io.BytesIO(file_content), header=0)
-            except Exception as e:
-                print(f"[POST /import-inventory] CSV read error: {e}, trying header=0 fallback")
-                df = pd.read_csv(io.BytesIO(file_content), header=0)
-        elif file.filename.lower().endswith(('.xlsx', '.xls')):
-            import openpyxl
-            wb = openpyxl.load_workbook(io.BytesIO(file_content), data_only=True)
-            # Ignore 'Definitions' sheet for validation
-            sheet_names = [name for name in wb.sheetnames if name != 'Definitions']
-            print(f"[POST /import-inventory] Excel sheets (excluding Definitions): {sheet_names}")
-            # Annual template: single sheet, daily template: two sheets
-            if len(sheet_names) == 1 and sheet_names[0] in ["SKU Master", "Inventory Template"]:
-                ws = wb[sheet_names[0]]
-                headers = [cell.value for cell in next(ws.iter_rows(min_row=3, max_row=3))]
-                required = [
-                    'SKU', 'Product Name', 'Length (in)', 'Width (in)', 'Height (in)',
-                    'Weight (lb)', 'In Stock', 'Annual Sales'
-                ]
-                if not all(h in headers for h in required):
-                    raise HTTPException(status_code=400, detail=f"Missing required columns in SKU Master: {required}")
-                # Read data into DataFrame
-                df = pd.DataFrame(ws.iter_rows(min_row=4, values_only=True), columns=headers)
-            elif len(sheet_names) == 2 and set(sheet_names) == {"SKU Master", "Daily Sales"}:
-                ws_sku = wb["SKU Master"]
-                ws_daily = wb["Daily Sales"]
-                sku_headers = [cell.value for cell in next(ws_sku.iter_rows(min_row=3, max_row=3))]
-                daily_headers = [cell.value for cell in next(ws_daily.iter_rows(min_row=3, max_row=3))]
-                sku_required = [
-                    'SKU', 'Product Name', 'Length (in)', 'Width (in)', 'Height (in)',
-                    'Weight (lb)', 'In Stock', 'Annual Sales'
-                ]
-                daily_required = ['Date', 'SKU', 'Units Sold']
-                if not all(h in sku_headers for h in sku_required):
-                    raise HTTPException(status_code=400, detail=f"Missing required columns in SKU Master: {sku_required}")
-                if not all(h in daily_headers for h in daily_required):
-                    raise HTTPException(status_code=400, detail=f"Missing required columns in Daily Sales: {daily_required}")
-                # Read data into DataFrames
-                df_sku = pd.DataFrame(ws_sku.iter_rows(min_row=4, values_only=True), columns=sku_headers)
-                df_daily = pd.DataFrame(ws_daily.iter_rows(min_row=4, values_only=True), columns=daily_headers)
-                # Use SKU Master for inventory import
-                df = df_sku
-                # Store daily sales data for later processing
-                daily_sales_df = df_daily
-            else:
-                raise HTTPException(status_code=400, detail="Excel file must have either one sheet named 'SKU Master' or two sheets named 'SKU Master' and 'Daily Sales'. (Other sheets like 'Definitions' are ignored.)")
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Unsupported file format. Please upload a CSV or Excel file."
-            )
-        print(f"[POST /import-inventory] Loaded {len(df)} rows, columns: {df.columns.tolist()}")
-        # Map new column names to database column names
-        column_mapping = {
-            'SKU': 'sku_id',
-            'Product Name': 'description',
-            'Length (in)': 'length_in',
-            'Width (in)': 'width_in',
-            'Height (in)': 'height_in',
-            'Weight (lb)': 'weight_lb',
-            'In Stock': 'on_hand_units',
-            'Annual Sales': 'annual_units_sold',
-        }
-        # Rename columns if they match the new template format
-        df_columns = df.columns.tolist()
-        if any(col in column_mapping for col in df_columns):
-            df = df.rename(columns=column_mapping)
-        # Drop empty rows (all NaN)
-        df = df.dropna(how='all')
+        df, daily_sales_df = await asyncio.to_thread(_read_inventory_upload, file.filename, file_content)
         
         # Clear existing inventory for this specific list only
         if inventory_list_id:
-            db.query(Inventory).filter(Inventory.inventory_list_id == inventory_list_id).delete()
+            await db.execute(delete(Inventory).where(Inventory.inventory_list_id == inventory_list_id))
         else:
             # If no inventory_list_id provided, clear all inventory (fallback behavior)
-            db.query(Inventory).delete()
+            await db.execute(delete(Inventory))
             
-        # Import new data
-        for _, row in df.iterrows():
-            # Skip rows missing required fields
-            if pd.isna(row.get('sku_id')):
-                continue
-                
-            # Ensure inventory_list_id is provided
-            if not inventory_list_id:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="inventory_list_id is required for importing inventory"
-                )
-                
-            inventory_item = Inventory(
-                sku_id=row['sku_id'],
-                description=row['description'],
-                length_in=row['length_in'],
-                width_in=row['width_in'],
-                height_in=row['height_in'],
-                weight_lb=row['weight_lb'],
-                on_hand_units=row['on_hand_units'],
-                annual_units_sold=row['annual_units_sold'],
-                daily_picks=None,
-                demand_std_dev=None,
-                inventory_list_id=inventory_list_id
+        # Import new data (rows missing a SKU are skipped) in batched INSERTs
+        items = df[df['sku_id'].notna()] if 'sku_id' in df.columns else df.iloc[0:0]
+        if not items.empty and not inventory_list_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="inventory_list_id is required for importing inventory"
             )
-            db.add(inventory_item)
+        # Description and dimensions go to the shared SKU master, quantities to the list
+        records = []
+        if not items.empty:
+            ids = await db.run_sync(upsert_skus, items)
+            quantities = items[['on_hand_units', 'annual_units_sold']].astype(object)
+            quantities = quantities.where(quantities.notna(), None)
+            records = [
+                dict(r, sku_id=ids[str(code)], inventory_list_id=inventory_list_id, daily_picks=None, demand_std_dev=None)
+                for code, r in zip(items['sku_id'], quantities.to_dict(orient="records"))
+            ]
+        for start in range(0, len(records), IMPORT_BATCH_ROWS):
+            await db.execute(insert(Inventory), records[start:start + IMPORT_BATCH_ROWS])
         
         # Process daily sales data if available
         daily_sales_count = 0
-        if 'daily_sales_df' in locals() and not daily_sales_df.empty and inventory_list_id:
+        if daily_sales_df is not None and inventory_list_id:
             from models import DailySales
             # Clear existing daily sales for this list
-            db.query(DailySales).filter(DailySales.inventory_list_id == inventory_list_id).delete()
+            await db.execute(delete(DailySales).where(DailySales.inventory_list_id == inventory_list_id))
             
-            # Import daily sales data
-            for _, row in daily_sales_df.iterrows():
-                if pd.isna(row.get('Date')) or pd.isna(row.get('SKU')) or pd.isna(row.get('Units Sold')):
-                    continue
-                    
-                try:
-                    # Parse date - handle multiple formats
-                    date_str = str(row['Date'])
-                    if '/' in date_str:
-                        # Handle MM/DD/YYYY format
-                        date_obj = pd.to_datetime(date_str, format='%m/%d/%Y')
-                    else:
-                        # Try other formats
-                        date_obj = pd.to_datetime(date_str)
-                        
-                    daily_sales_item = DailySales(
-                        date=date_obj,
-                        sku_id=str(row['SKU']),
-                        units_sold=int(row['Units Sold']),
-                        inventory_list_id=inventory_list_id
-                    )
-                    db.add(daily_sales_item)
-                    daily_sales_count += 1
-                except Exception as e:
-                    print(f"Error processing daily sales row: {row}, error: {e}")
-                    continue
+            # Import daily sales data (parsed with the upload)
+            ids = await db.run_sync(sku_ids, daily_sales_df['sku'].unique())
+            sales_records = [
+                {"date": date, "sku_id": ids[code], "units_sold": int(sold), "inventory_list_id": inventory_list_id}
+                for date, code, sold in zip(pd.DatetimeIndex(daily_sales_df['date']).to_pydatetime(), daily_sales_df['sku'], daily_sales_df['units'])
+            ]
+            for start in range(0, len(sales_records), IMPORT_BATCH_ROWS):
+                await db.execute(insert(DailySales), sales_records[start:start + IMPORT_BATCH_ROWS])
+            daily_sales_count = len(sales_records)
         
-        db.commit()
+        # Precompute slot geometry of the new inventory for every tray config (replaces the old rows)
+        if inventory_list_id:
+            await db.run_sync(refresh_slot_geometry, inventory_list_id, None, df[df['sku_id'].notna()])
+        
+        await db.commit()
         message = f"Successfully imported {len(df)} inventory items"
         if daily_sales_count > 0:
             message += f" and {daily_sales_count} daily sales records"
         print(f"[POST /import-inventory] {message}")
         return {"message": message}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"[POST /import-inventory] Error: {str(e)}")
         traceback.print_exc()
         raise HTTPException(
@@ -279,42 +454,33 @@ async def import_inventory(file: UploadFile, inventory_list_id: str = Form(None)
 @app.get("/inventory")
 def get_inventory(inventory_list_id: str = Query(None), db: Session = Depends(get_db)):
     """Get all inventory items, or those for a specific inventory list."""
-    query = db.query(Inventory)
+    query = select_inventory(INVENTORY_FIELDS).order_by(Inventory.id)
     if inventory_list_id:
-        query = query.filter(Inventory.inventory_list_id == inventory_list_id)
-    return query.all()
+        query = query.where(Inventory.inventory_list_id == inventory_list_id)
+    return [dict(row) for row in db.execute(query).mappings()]
 
 @app.get("/daily-sales")
 def get_daily_sales(inventory_list_id: str = Query(None), db: Session = Depends(get_db)):
     """Get daily sales data for a specific inventory list."""
     from models import DailySales
-    query = db.query(DailySales)
+    query = select_daily_sales().order_by(DailySales.id)
     if inventory_list_id:
-        query = query.filter(DailySales.inventory_list_id == inventory_list_id)
-    return query.all()
+        query = query.where(DailySales.inventory_list_id == inventory_list_id)
+    return [dict(row) for row in db.execute(query).mappings()]
 
 @app.post("/inventory-lists/{list_id}/copy-inventory")
 def copy_inventory_to_list(list_id: str, db: Session = Depends(get_db)):
-    """Copy all current inventory items to the specified inventory list."""
+    """Copy all current inventory items to the specified inventory list (quantities; SKUs are shared)."""
     from models import Inventory
-    items = db.query(Inventory).all()
-    for item in items:
-        new_item = Inventory(
-            sku_id=item.sku_id,
-            description=item.description,
-            length_in=item.length_in,
-            width_in=item.width_in,
-            height_in=item.height_in,
-            weight_lb=item.weight_lb,
-            on_hand_units=item.on_hand_units,
-            annual_units_sold=item.annual_units_sold,
-            daily_picks=item.daily_picks,
-            demand_std_dev=item.demand_std_dev,
-            inventory_list_id=list_id
-        )
-        db.add(new_item)
+    columns = ['sku_id', 'on_hand_units', 'annual_units_sold', 'daily_picks', 'demand_std_dev']
+    rows = db.execute(select(*[getattr(Inventory, c) for c in columns])).all()
+    records = [dict(zip(columns, row), inventory_list_id=list_id) for row in rows]
+    for start in range(0, len(records), IMPORT_BATCH_ROWS):
+        db.execute(insert(Inventory), records[start:start + IMPORT_BATCH_ROWS])
+    db.commit()
+    refresh_slot_geometry(db, inventory_list_id=list_id)
     db.commit()
-    return {"message": f"Copied {len(items)} inventory items to list {list_id}"}
+    return {"message": f"Copied {len(records)} inventory items to list {list_id}"}
 
 @app.get("/inventory-lists")
 def get_inventory_lists(db: Session = Depends(get_db)):
@@ -341,17 +507,17 @@ def create_inventory_list(list_data: dict, db: Session = Depends(get_db)):
 def update_on_shelf_units(list_id: str, on_shelf_data: dict, db: Session = Depends(get_db)):
     """Update on_shelf_units for inventory items based on analytics calculations."""
     try:
-        updated_count = 0
         data_list = on_shelf_data.get("on_shelf_data", [])
-        for item in data_list:
-            inventory_item = db.query(Inventory).filter(
-                Inventory.sku_id == item["sku_id"],
-                Inventory.inventory_list_id == list_id
-            ).first()
-            
-            if inventory_item:
-                inventory_item.on_shelf_units = item["on_shelf_units"]
-                updated_count += 1
+        existing = dict(db.execute(select_inventory(["sku_id", "id"]).where(Inventory.inventory_list_id == list_id)).all())
+        params = [{"b_id": existing[str(item["sku_id"])], "b_units": item["on_shelf_units"]} for item in data_list if str(item["sku_id"]) in existing]
+        # One executemany UPDATE instead of a SELECT + UPDATE per item
+        if params:
+            table = Inventory.__table__
+            db.execute(
+                update(table).where(table.c.id == bindparam("b_id")).values(on_shelf_units=bindparam("b_units")),
+                params,
+            )
+        updated_count = len(params)
         
         db.commit()
         return {"message": f"Updated on_shelf_units for {updated_count} items"}
@@ -362,6 +528,27 @@ def update_on_shelf_units(list_id: str, on_shelf_data: dict, db: Session = Depen
             detail=f"Failed to update on_shelf_units: {str(e)}"
         )
 
+# Columns the optimizers read from the inventory table
+OPTIMIZE_COLUMNS = [
+    'sku_id', 'description', 'length_in', 'width_in', 'height_in', 'weight_lb',
+    'on_hand_units', 'on_shelf_units', 'annual_units_sold', 'daily_picks', 'demand_std_dev',
+]
+
+async def load_inventory_df(db: AsyncSession, inventory_list_id: str = None):
+    """Load the optimizer input columns for an inventory list straight into a DataFrame."""
+    import pandas as pd
+    query = select_inventory(OPTIMIZE_COLUMNS)
+    if inventory_list_id:
+        query = query.where(Inventory.inventory_list_id == inventory_list_id)
+    result = await db.execute(query)
+    return pd.DataFrame(result.all(), columns=OPTIMIZE_COLUMNS)
+
+def check_rotation_support(model: str, rotation: bool):
+    """Reject rotation=True for engines that always keep slots in their computed orientation."""
+    if rotation and not resolve_engine(model).rotation:
+        rotation_engines = [e["name"] for e in list_engines() if e["rotation"]]
+        raise HTTPException(status_code=400, detail=f"Rotation is only supported by {rotation_engines}. Got: {model}")
+
 @app.post("/optimize")
 async def optimize(
     tray_length_in: int = Form(156),
@@ -372,71 +559,79 @@ async def optimize(
     buffer_pct: float   = Form(0.95),
     model: str = Form("rectpack"),
     inventory_list_id: str = Form(None),
-    db: Session = Depends(get_db)
+    classify_skus: bool = Form(False),
+    time_budget_ms: int = Form(None),
+    rotation: bool = Form(False),
+    divider_sizes: int = Form(None),
+    job_id: str = Form(None),
+    deadline_ms: int = Form(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Return tray plan JSON using database inventory and selected model."""
+    """
+    Return tray plan JSON using database inventory and selected model.
+    Identical concurrent requests share one run; requests with a job_id or
+    deadline_ms always run on their own.
+    """
+    if not is_registered(model):
+        raise HTTPException(status_code=400, detail=f"Unknown model: {model}. Available models: {engine_names()}")
+    check_rotation_support(model, rotation)
+    check_job_available(job_id)
     try:
         # Get inventory from database
-        query = db.query(Inventory)
-        if inventory_list_id:
-            query = query.filter(Inventory.inventory_list_id == inventory_list_id)
-        inventory_items = query.all()
+        df = await load_inventory_df(db, inventory_list_id)
         
-        if not inventory_items:
+        if df.empty:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No inventory data found. Please import inventory first."
             )
         
-        # Convert to DataFrame
-        df_data = []
-        for item in inventory_items:
-            df_data.append({
-                'sku_id': item.sku_id,
-                'description': item.description,
-                'length_in': item.length_in,
-                'width_in': item.width_in,
-                'height_in': item.height_in,
-                'weight_lb': item.weight_lb,
-                'on_hand_units': item.on_hand_units,
-                'on_shelf_units': item.on_shelf_units,  # Include calculated on-shelf units
-                'annual_units_sold': item.annual_units_sold,
-                'daily_picks': item.daily_picks,
-                'demand_std_dev': item.demand_std_dev
-            })
-        
-        import pandas as pd
-        df = pd.DataFrame(df_data)
+        import optimiser
         print(f"[POST /optimize] Optimizing {len(df)} inventory items with model: {model}")
         
-        # Run optimization based on model
-        if model in ["rectpack", "maximal-rectangles"]:
-            plan = optimiser.optimise(
-                df,
-                model=model,
-                tray_length_in=tray_length_in,
-                tray_width_in=tray_width_in,
-                tray_depth_in=tray_depth_in,
-                num_trays=num_trays,
-                weight_limit_lb=weight_limit_lb,
-                buffer_pct=buffer_pct,
-            )
-            
-            # Calculate appropriate KPIs
-            kpis = optimiser.calculate_kpis(
-                plan,
-                tray_length_in,
-                tray_width_in,
-                tray_depth_in,
-                weight_limit_lb
-            )
+        params = dict(
+            model=model,
+            tray_length_in=tray_length_in,
+            tray_width_in=tray_width_in,
+            tray_depth_in=tray_depth_in,
+            num_trays=num_trays,
+            weight_limit_lb=weight_limit_lb,
+            buffer_pct=buffer_pct,
+            classify=classify_skus,
+            time_budget_ms=time_budget_ms,
+            rotation=rotation,
+            divider_sizes=divider_sizes,
+        )
+        key = None if job_id or deadline_ms else plan_key("optimise_plan", df, **params)
+        # A complete result for the same key from any worker on this host
+        cached = await asyncio.to_thread(load_result, key) if key else None
+        
+        # Run optimization with the selected engine in the optimizer pool
+        if cached is not None:
+            plan, kpis = cached
+            print(f"[POST /optimize] Serving stored result {key[:12]}")
         else:
-            raise HTTPException(status_code=400, detail=f"Unknown model: {model}")
+            stored_geometry = await load_stored_geometry(db, inventory_list_id, tray_length_in, tray_width_in, tray_depth_in, buffer_pct)
+            async with job_run(job_id, deadline_ms) as run_kw:
+                plan, kpis = await run_single_flight(
+                    key,
+                    run_and_store,
+                    key,
+                    optimiser.optimise_plan,
+                    df,
+                    stored_geometry=stored_geometry,
+                    **params,
+                    **run_kw,
+                )
         
         plan_records = plan.to_dict(orient="records")
         plan_records = convert_numpy(plan_records)
         kpis = convert_numpy(kpis)
-        return {"plan": plan_records, "model": model, "kpis": kpis}
+        return {"plan": plan_records, "model": model, "kpis": kpis, "complete": "incomplete" not in kpis, "plan_key": key, "cached": cached is not None}
+    except RunCancelled:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Optimization cancelled (job {job_id})")
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[POST /optimize] Error: {str(e)}")
         traceback.print_exc()
@@ -445,6 +640,42 @@ async def optimize(
             detail=f"Optimization failed: {str(e)}"
         )
 
+@app.post("/estimate")
+async def estimate(
+    tray_length_in: float = Form(156),
+    tray_width_in: float  = Form(36),
+    tray_depth_in: float  = Form(18),
+    buffer_pct: float   = Form(0.95),
+    weight_limit_lb: float = Form(None),
+    inventory_list_id: str = Form(None),
+    rotation: bool = Form(False),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Fast expected tray count and utilization for a tray configuration, without packing."""
+    from algorithms.estimator import estimate_trays
+
+    df = await load_inventory_df(db, inventory_list_id)
+    if df.empty:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No inventory data found. Please import inventory first."
+        )
+    stored_geometry = await load_stored_geometry(db, inventory_list_id, tray_length_in, tray_width_in, tray_depth_in, buffer_pct)
+    try:
+        result = estimate_trays(
+            df,
+            stored_geometry=stored_geometry,
+            tray_width_in=tray_width_in,
+            tray_length_in=tray_length_in,
+            tray_depth_in=tray_depth_in,
+            buffer_pct=buffer_pct,
+            rotation=rotation,
+            weight_limit_lb=weight_limit_lb,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return convert_numpy(result)
+
 @app.post("/optimize-dividers")
 async def optimize_dividers(
     tray_length_in: int = Form(156),
@@ -453,90 +684,323 @@ async def optimize_dividers(
     buffer_pct: float   = Form(0.95),
     model: str = Form("rectpack"),
     inventory_list_id: str = Form(None),
-    db: Session = Depends(get_db)
+    classify_skus: bool = Form(False),
+    time_budget_ms: int = Form(None),
+    rotation: bool = Form(False),
+    divider_sizes: int = Form(None),
+    job_id: str = Form(None),
+    deadline_ms: int = Form(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Optimize divider sizes for each SKU using rectpack algorithm."""
+    """
+    Optimize divider sizes for each SKU using a layout-producing engine.
+    Identical concurrent requests share one run, as in /optimize.
+    """
+    if not is_registered(model) or not resolve_engine(model).layouts:
+        layout_engines = [e["name"] for e in list_engines() if e["layouts"]]
+        raise HTTPException(status_code=400, detail=f"Divider optimization requires a layout engine ({layout_engines}). Got: {model}")
+    check_rotation_support(model, rotation)
+    check_job_available(job_id)
     try:
         # Get inventory from database
-        query = db.query(Inventory)
-        if inventory_list_id:
-            query = query.filter(Inventory.inventory_list_id == inventory_list_id)
-        inventory_items = query.all()
+        df = await load_inventory_df(db, inventory_list_id)
         
-        if not inventory_items:
+        if df.empty:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No inventory data found. Please import inventory first."
             )
         
-        # Convert to DataFrame
-        df_data = []
-        for item in inventory_items:
-            df_data.append({
-                'sku_id': item.sku_id,
-                'description': item.description,
-                'length_in': item.length_in,
-                'width_in': item.width_in,
-                'height_in': item.height_in,
-                'weight_lb': item.weight_lb,
-                'on_hand_units': item.on_hand_units,
-                'on_shelf_units': item.on_shelf_units,  # Include calculated on-shelf units
-                'annual_units_sold': item.annual_units_sold,
-                'daily_picks': item.daily_picks,
-                'demand_std_dev': item.demand_std_dev
-            })
-        
-        import pandas as pd
-        df = pd.DataFrame(df_data)
+        import optimiser
         print(f"[POST /optimize-dividers] Optimizing dividers for {len(df)} SKUs with model: {model}")
         
-        # Run divider optimization
-        if model in ["rectpack", "maximal-rectangles"]:
-            result = optimiser.optimise(
-                df,
-                model=model,
-                tray_length_in=tray_length_in,
-                tray_width_in=tray_width_in,
-                tray_depth_in=tray_depth_in,
-                buffer_pct=buffer_pct,
-                inventory_list_id=inventory_list_id,
-            )
-            
-            # Calculate divider-specific KPIs
-            kpis = optimiser.calculate_divider_kpis(
-                result,
-                tray_length_in,
-                tray_width_in,
-                tray_depth_in,
-                buffer_pct
-            )
+        params = dict(
+            model=model,
+            tray_length_in=tray_length_in,
+            tray_width_in=tray_width_in,
+            tray_depth_in=tray_depth_in,
+            buffer_pct=buffer_pct,
+            inventory_list_id=inventory_list_id,
+            classify=classify_skus,
+            time_budget_ms=time_budget_ms,
+            rotation=rotation,
+            divider_sizes=divider_sizes,
+        )
+        key = None if job_id or deadline_ms else plan_key("optimise_dividers", df, **params)
+        # A complete result for the same key from any worker on this host
+        cached = await asyncio.to_thread(load_result, key) if key else None
+        
+        # Run divider optimization in the optimizer pool
+        if cached is not None:
+            result, kpis = cached
+            print(f"[POST /optimize-dividers] Serving stored result {key[:12]}")
         else:
-            raise HTTPException(status_code=400, detail=f"Divider optimization supports rectpack models only. Got: {model}")
+            stored_geometry = await load_stored_geometry(db, inventory_list_id, tray_length_in, tray_width_in, tray_depth_in, buffer_pct)
+            async with job_run(job_id, deadline_ms) as run_kw:
+                result, kpis = await run_single_flight(
+                    key,
+                    run_and_store,
+                    key,
+                    optimiser.optimise_dividers,
+                    df,
+                    stored_geometry=stored_geometry,
+                    **params,
+                    **run_kw,
+                )
         
         result_records = result.to_dict(orient="records")
         result_records = convert_numpy(result_records)
         kpis = convert_numpy(kpis)
         
-        # Debug: Print what we're returning
-        print(f"[POST /optimize-dividers] Returning {len(result_records)} divider records")
-        print(f"[POST /optimize-dividers] First record keys: {list(result_records[0].keys()) if result_records else 'No records'}")
-        print(f"[POST /optimize-dividers] KPI keys: {list(kpis.keys())}")
-        
         # Include tray layout data if available (for rectpack model)
         tray_layouts = result.attrs.get('tray_layouts', [])
-        print(f"[POST /optimize-dividers] Tray layouts available: {len(tray_layouts)}")
-        print(f"[POST /optimize-dividers] Tray layouts data: {tray_layouts}")
+        print(f"[POST /optimize-dividers] Returning {len(result_records)} divider records and {len(tray_layouts)} tray layouts")
         
         return {
             "dividers": result_records,
             "kpis": kpis,
             "model": model,
-            "trayLayouts": tray_layouts
+            "trayLayouts": tray_layouts,
+            "complete": "incomplete" not in kpis,
+            "plan_key": key,
+            "cached": cached is not None,
         }
+    except RunCancelled:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Divider optimization cancelled (job {job_id})")
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[POST /optimize-dividers] Error: {str(e)}")
         traceback.print_exc()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Divider optimization failed: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+@app.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    """
+    Latest progress event of a job (polling alternative to /jobs/{job_id}/events).
+    Jobs running on another worker are answered from the shared result store.
+    """
+    job = get_job(job_id)
+    if job is None:
+        event = result_store.get("job", job_id)
+        if event is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return {"job_id": job_id, "running": not event.get("done"), "event": event}
+    return {"job_id": job_id, "running": job.running, "event": job.last_event}
+
+@app.get("/plans/{plan_key}/layouts")
+def get_plan_layouts(plan_key: str):
+    """Tray layouts of a stored /optimize or /optimize-dividers result (plan_key from its response)."""
+    layouts = result_store.get("layouts", plan_key)
+    if layouts is None:
+        raise HTTPException(status_code=404, detail="No stored layouts for this plan (expired or never stored)")
+    return {"plan_key": plan_key, "trayLayouts": convert_numpy(layouts)}
+
+def check_profile_admin(x_admin_token: str = Header(None)):
+    """404 unless profiling is enabled; 403 without the admin token when one is configured."""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Request profiling is disabled (REQUEST_PROFILING=1 enables it)")
+    if PROFILE_ADMIN_TOKEN and x_admin_token != PROFILE_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/profiles")
+def get_profiles(_admin: None = Depends(check_profile_admin)):
+    """Saved request profiles, newest first."""
+    return list_profiles()
+
+@app.get("/admin/profiles/{profile_id}/{kind}")
+def download_profile(profile_id: str, kind: str, _admin: None = Depends(check_profile_admin)):
+    """
+    A saved profile: kind "pstats" (cProfile stats, for pstats / snakeviz) or
+    "collapsed" (folded stacks, for flamegraph.pl / speedscope).
+    """
+    suffixes = {"pstats": (".pstats", "application/octet-stream"), "collapsed": (".collapsed", "text/plain")}
+    if kind not in suffixes:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {list(suffixes)}")
+    suffix, media_type = suffixes[kind]
+    path = profile_path(profile_id, suffix)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type=media_type, filename=f"profile-{profile_id}{suffix}")
+
+@app.delete("/jobs/{job_id}")
+def cancel_job_endpoint(job_id: str):
+    """
+    Cancel a running optimization: the engine stops at its next check and the
+    optimize request answers 409. Returns 404 when no run with this job_id is active.
+    """
+    if not cancel_job(job_id):
+        raise HTTPException(status_code=404, detail="No running job with this id")
+    return {"job_id": job_id, "cancelling": True}
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-sent progress events of an optimization started with this job_id:
+    stage, rects_placed / rects_total, trays_open, best_trays and elapsed_s.
+    May be opened before the run starts; ends after the final done/failed event.
+    """
+    return StreamingResponse(
+        stream_job_events(watch_job(job_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/optimize-configs")
+async def optimize_configs(
+    config_ids: str = Form(...),
+    buffer_pct: float   = Form(0.95),
+    model: str = Form("rectpack"),
+    inventory_list_id: str = Form(None),
+    classify_skus: bool = Form(False),
+    time_budget_ms: int = Form(None),
+    rotation: bool = Form(False),
+    divider_sizes: int = Form(None),
+    _slot: None = Depends(optimization_slot),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Optimize one inventory list on several saved tray configs (comma-separated
+    config_ids) and compare them side by side. The inventory is loaded and
+    prepared once; the per-config runs go to the optimizer pool in parallel, as
+    far as free optimization slots allow.
+    """
+    if not is_registered(model):
+        raise HTTPException(status_code=400, detail=f"Unknown model: {model}. Available models: {engine_names()}")
+    check_rotation_support(model, rotation)
+    try:
+        ids = list(dict.fromkeys(int(i) for i in config_ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"config_ids must be comma-separated integers. Got: {config_ids}")
+    result = await db.execute(select(TrayConfig).where(TrayConfig.id.in_(ids)))
+    configs = {tray.id: tray for tray in result.scalars().all()}
+    missing = [i for i in ids if i not in configs]
+    if not ids or missing:
+        raise HTTPException(status_code=404, detail=f"Tray configurations not found: {missing or config_ids}")
+
+    import optimiser
+    started = time.perf_counter()
+    df = await load_inventory_df(db, inventory_list_id)
+    if df.empty:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No inventory data found. Please import inventory first."
+        )
+    df = optimiser.prepare_inventory(df, classify_skus)
+    tray_configs = [
+        {
+            "config_id": tray.id,
+            "name": tray.name,
+            "tray_length_in": tray.tray_length_in,
+            "tray_width_in": tray.tray_width_in,
+            "tray_depth_in": tray.tray_depth_in,
+            "num_trays": tray.num_trays,
+            "weight_limit_lb": tray.weight_limit_lb or 2205,
+        }
+        for tray in (configs[i] for i in ids)
+    ]
+    stored = [await load_config_geometry(db, inventory_list_id, i, buffer_pct) for i in ids]
+    prepare_ms = round((time.perf_counter() - started) * 1000, 1)
+    print(f"[POST /optimize-configs] {len(df)} SKUs on {len(ids)} tray configs with model: {model}")
+
+    # The configs run on this request's slot plus the slots free right now (never past the cap)
+    runs = await run_cpu_bound_batch([
+        functools.partial(
+            optimiser.optimise_plan,
+            df,
+            model=model,
+            tray_length_in=config["tray_length_in"],
+            tray_width_in=config["tray_width_in"],
+            tray_depth_in=config["tray_depth_in"],
+            num_trays=config["num_trays"],
+            weight_limit_lb=config["weight_limit_lb"],
+            buffer_pct=buffer_pct,
+            classify=classify_skus,
+            prepared=True,
+            time_budget_ms=time_budget_ms,
+            rotation=rotation,
+            divider_sizes=divider_sizes,
+            stored_geometry=stored_geometry,
+        )
+        for config, stored_geometry in zip(tray_configs, stored)
+    ])
+
+    # A config the inventory does not fit on gets an error row instead of failing the batch
+    comparison, kpis_by_config = [], {}
+    for config, run in zip(tray_configs, runs):
+        if isinstance(run, Exception):
+            print(f"[POST /optimize-configs] Config {config['config_id']} failed: {run}")
+            comparison.append({**config, "error": str(run)})
+            continue
+        plan, kpis = run
+        comparison.append(optimiser.config_comparison(config, plan, kpis, buffer_pct))
+        kpis_by_config[config["config_id"]] = kpis
+    ranked = sorted((row for row in comparison if "error" not in row), key=lambda row: (row["total_trays"], -(row["area_utilization_pct"] or 0)))
+    return convert_numpy({
+        "model": model,
+        "comparison": comparison,
+        "best_config_id": ranked[0]["config_id"] if ranked else None,
+        "kpis": kpis_by_config,
+        "prepare_ms": prepare_ms,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+    })
+
+@app.post("/tray-design-search")
+async def tray_design_search(
+    tray_lengths_in: str = Form("96:156:12"),
+    tray_widths_in: str = Form("24:36:6"),
+    tray_depths_in: str = Form("12,18"),
+    buffer_pcts: str = Form("0.95"),
+    refine_rounds: int = Form(1),
+    top_k: int = Form(5),
+    weight_limit_lb: float = Form(None),
+    model: str = Form("rectpack"),
+    inventory_list_id: str = Form(None),
+    rotation: bool = Form(False),
+    _slot: None = Depends(optimization_slot),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Search tray dimensions for a list: estimate every grid point (values as
+    '96,120,156' or 'start:stop:step'), confirm the best with the full packer
+    and return the Pareto frontier of tray count vs tray area.
+    """
+    from algorithms.design_search import search_tray_designs, parse_values
+
+    if not is_registered(model) or not resolve_engine(model).layouts:
+        layout_engines = [e["name"] for e in list_engines() if e["layouts"]]
+        raise HTTPException(status_code=400, detail=f"Design search confirms with a layout engine ({layout_engines}). Got: {model}")
+    check_rotation_support(model, rotation)
+    try:
+        grid = [parse_values(v, DESIGN_MAX_GRID_POINTS) for v in (tray_lengths_in, tray_widths_in, tray_depths_in, buffer_pcts)]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid dimension values: {e}")
+    if not all(grid) or any(v <= 0 for values in grid for v in values):
+        raise HTTPException(status_code=400, detail="Every dimension needs at least one positive value")
+    grid_points = len(grid[0]) * len(grid[1]) * len(grid[2]) * len(grid[3])
+    if grid_points > DESIGN_MAX_GRID_POINTS:
+        raise HTTPException(status_code=400, detail=f"Grid has {grid_points} points; the limit is {DESIGN_MAX_GRID_POINTS}")
+
+    df = await load_inventory_df(db, inventory_list_id)
+    if df.empty:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No inventory data found. Please import inventory first."
+        )
+    print(f"[POST /tray-design-search] {len(df)} SKUs over {grid_points} grid points")
+    result = await run_cpu_bound(
+        search_tray_designs,
+        df,
+        *grid,
+        refine_rounds=refine_rounds,
+        top_k=top_k,
+        model=model,
+        rotation=rotation,
+        weight_limit_lb=weight_limit_lb,
+    )
+    return convert_numpy(result)
+
+warmup_state["app_import_ms"] = round((time.perf_counter() - APP_IMPORT_STARTED) * 1000, 1)
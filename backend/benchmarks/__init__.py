@@ -0,0 +1 @@
+# Benchmark scripts for the tray optimizer backend (run from backend/ with python -m benchmarks.<name>)
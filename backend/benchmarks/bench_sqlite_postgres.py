@@ -0,0 +1,128 @@
+"""
+Import and optimize throughput on SQLite vs PostgreSQL, on the same data.
+
+Each backend runs in a fresh interpreter (DATABASE_URL is read at import)
+with the app in process through httpx.ASGITransport. Per run it times:
+  - /import-inventory of a two-sheet workbook (SKU master + daily sales)
+  - /inventory-lists/{id}/update-on-shelf-units for every SKU
+  - /inventory and /daily-sales reads of the list
+  - /optimize on the list (result store off, so every run packs)
+
+Backends: SQLite with default pragmas (SQLITE_TUNED=0), tuned SQLite
+(WAL, synchronous=NORMAL, cache_size, mmap_size) and, with --postgres-url,
+PostgreSQL. The same --seed gives every backend identical data.
+
+Run from backend/:
+    python -m benchmarks.bench_sqlite_postgres --skus 2000 --days 60 --runs 3
+    python -m benchmarks.bench_sqlite_postgres --postgres-url postgresql://user:pw@localhost/bench
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _worker(args):
+    import httpx
+    import numpy as np
+    from app import app
+    from benchmarks.load_test import synthetic_skus, synthetic_daily_sales, workbook
+
+    rng = np.random.default_rng(args.seed)
+    skus = synthetic_skus(args.skus, rng)
+    daily = synthetic_daily_sales(skus, args.days, rng)
+    body = workbook(skus, daily)
+    shelf = [{"sku_id": s, "on_shelf_units": int(max(1, u // 4))} for s, u in zip(skus["sku_id"], skus["on_hand_units"])]
+
+    async def timed(request):
+        started = time.perf_counter()
+        response = await request
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    runs = []
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=600) as client:
+            for i in range(args.runs):
+                list_id = (await client.post("/inventory-lists", json={"name": f"bench-{time.time()}-{i}"})).json()["id"]
+                run = {"import_s": await timed(client.post(
+                    "/import-inventory",
+                    files={"file": ("bench.xlsx", body, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+                    data={"inventory_list_id": list_id},
+                ))}
+                run["on_shelf_update_s"] = await timed(client.post(f"/inventory-lists/{list_id}/update-on-shelf-units", json={"on_shelf_data": shelf}))
+                run["inventory_read_s"] = await timed(client.get("/inventory", params={"inventory_list_id": list_id}))
+                run["daily_sales_read_s"] = await timed(client.get("/daily-sales", params={"inventory_list_id": list_id}))
+                run["optimize_s"] = await timed(client.post("/optimize", data={"inventory_list_id": list_id}))
+                runs.append(run)
+                print(f"[BENCH DB] run {i + 1}/{args.runs}: " + " ".join(f"{k}={v:.2f}" for k, v in run.items()), file=sys.stderr)
+    finally:
+        await app.router.shutdown()
+    return {"rows": {"inventory": len(skus), "daily_sales": len(daily)}, "runs": runs}
+
+
+def run_backend(name, env, args):
+    """Run the timed sequence for one backend in a fresh interpreter; returns its summary."""
+    command = [sys.executable, "-m", "benchmarks.bench_sqlite_postgres", "--worker",
+               "--skus", str(args.skus), "--days", str(args.days), "--runs", str(args.runs), "--seed", str(args.seed)]
+    print(f"[BENCH DB] {name}", file=sys.stderr)
+    out = subprocess.run(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    rows = result["rows"]["inventory"] + result["rows"]["daily_sales"]
+    summary = {key: round(statistics.median(r[key] for r in result["runs"]) * 1000, 1) for key in result["runs"][0]}
+    summary["import_rows_per_s"] = round(rows / (summary["import_s"] / 1000))
+    return {name: summary}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--skus", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=60, help="days of daily sales")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--postgres-url", default=None, help="PostgreSQL DATABASE_URL to compare against")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        # The app logs to stdout; keep it for the JSON result line only
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            result = asyncio.run(_worker(args))
+        print(json.dumps(result))
+        return
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_db_")
+    base_env = dict(os.environ, WARMUP_ON_STARTUP="0", RESULT_STORE_PATH="")
+    backends = [
+        ("sqlite (default pragmas)", dict(base_env, DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'default.db')}", SQLITE_TUNED="0")),
+        ("sqlite (tuned)", dict(base_env, DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'tuned.db')}", SQLITE_TUNED="1")),
+    ]
+    if args.postgres_url:
+        backends.append(("postgresql", dict(base_env, DATABASE_URL=args.postgres_url)))
+    else:
+        print("[BENCH DB] --postgres-url not given, comparing SQLite settings only", file=sys.stderr)
+
+    results = {}
+    for name, env in backends:
+        results.update(run_backend(name, env, args))
+    if args.json:
+        print(json.dumps(results))
+        return
+    columns = ["import_s", "import_rows_per_s", "on_shelf_update_s", "inventory_read_s", "daily_sales_read_s", "optimize_s"]
+    print(f"{'backend (median ms)':<26}" + "".join(f"{c:>20}" for c in columns))
+    for name, summary in results.items():
+        print(f"{name:<26}" + "".join(f"{summary[c]:>20}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
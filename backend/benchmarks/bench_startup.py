@@ -0,0 +1,130 @@
+"""
+Cold start benchmark for the FastAPI worker.
+
+Measures, over several fresh interpreters:
+  - import time of `app`
+  - time from process spawn to the first /health response (port bound)
+  - time from process spawn until /ready returns 200 (warm-up finished)
+  - latency of the first /inventory request after the worker is ready
+
+Run from backend/:
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --database-url postgresql://...
+Without --database-url a throwaway SQLite file is used.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url, timeout=5.0):
+    """Return (status_code, elapsed_s) or (None, elapsed_s) if the server is not up yet."""
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            resp.read()
+            return resp.status, time.perf_counter() - start
+    except urllib.error.HTTPError as e:
+        return e.code, time.perf_counter() - start
+    except (urllib.error.URLError, ConnectionError, socket.timeout):
+        return None, time.perf_counter() - start
+
+
+def measure_import(env):
+    code = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def measure_server(env, timeout_s=120.0):
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    result = {}
+    try:
+        while "first_response_s" not in result:
+            if time.perf_counter() - started > timeout_s:
+                raise TimeoutError("server did not respond")
+            code, _ = _get(f"{base}/health", timeout=1.0)
+            if code == 200:
+                result["first_response_s"] = time.perf_counter() - started
+            else:
+                time.sleep(0.01)
+        while "ready_s" not in result:
+            if time.perf_counter() - started > timeout_s:
+                raise TimeoutError("server never became ready")
+            code, _ = _get(f"{base}/ready", timeout=1.0)
+            if code == 200:
+                result["ready_s"] = time.perf_counter() - started
+            else:
+                time.sleep(0.02)
+        _, result["first_inventory_request_s"] = _get(f"{base}/inventory")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return result
+
+
+def _summary(values):
+    return {
+        "median_ms": round(statistics.median(values) * 1000, 1),
+        "min_ms": round(min(values) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_startup_")
+    env = dict(os.environ)
+    env["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    imports, servers = [], []
+    for i in range(args.runs):
+        imports.append(measure_import(env))
+        servers.append(measure_server(env))
+        print(f"[BENCH STARTUP] run {i + 1}/{args.runs}: import={imports[-1] * 1000:.0f}ms "
+              f"first_response={servers[-1]['first_response_s'] * 1000:.0f}ms "
+              f"ready={servers[-1]['ready_s'] * 1000:.0f}ms", file=sys.stderr)
+
+    results = {
+        "import_app": _summary(imports),
+        "time_to_first_response": _summary([s["first_response_s"] for s in servers]),
+        "time_to_ready": _summary([s["ready_s"] for s in servers]),
+        "first_inventory_request": _summary([s["first_inventory_request_s"] for s in servers]),
+    }
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for name, stats in results.items():
+            print(f"{name:<26} median {stats['median_ms']:>8} ms   (min {stats['min_ms']}, max {stats['max_ms']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Check that a run with a deadline returns close to it, KPIs included.
+
+Runs optimise_plan and optimise_dividers (the executor entry points behind
+/optimize and /optimize-dividers) on synthetic SKUs with a CancelToken
+deadline, and fails when either takes longer than deadline + tolerance.
+Everything after the engine stops (KPIs, bounds) counts against the deadline.
+
+Run from backend/:
+    python -m benchmarks.check_deadline
+    python -m benchmarks.check_deadline --skus 2000 --deadline-ms 1000 --model rectpack-portfolio
+"""
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+import numpy as np
+
+
+def main():
+    from optimiser import optimise_plan, optimise_dividers
+    from algorithms.cancellation import CancelToken
+    from benchmarks.load_test import synthetic_skus
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--skus", type=int, default=1000)
+    parser.add_argument("--deadline-ms", type=int, default=2000)
+    parser.add_argument("--tolerance-ms", type=int, default=500, help="allowed overrun past the deadline")
+    parser.add_argument("--model", default="rectpack")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = synthetic_skus(args.skus, np.random.default_rng(args.seed))
+    df["on_shelf_units"] = df["on_hand_units"]
+    failed = False
+    for run in (optimise_plan, optimise_dividers):
+        started = time.perf_counter()
+        # The engines log to stdout
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            plan, kpis = run(df.copy(), model=args.model, cancel_token=CancelToken(deadline_ms=args.deadline_ms))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        ok = elapsed_ms <= args.deadline_ms + args.tolerance_ms
+        failed |= not ok
+        state = "incomplete" if kpis.get("incomplete") else "complete"
+        print(f"[DEADLINE CHECK] {run.__name__}: {elapsed_ms:.0f} ms for a {args.deadline_ms} ms deadline ({state}) {'ok' if ok else 'TOO SLOW'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
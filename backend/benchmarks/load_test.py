@@ -0,0 +1,232 @@
+"""
+Endpoint load test against an in-process app and a throwaway SQLite database.
+
+Seeds --lists inventory lists of --skus synthetic SKUs (with --days of daily
+sales each) through /import-inventory, then drives a weighted mix of
+/inventory, /daily-sales, /optimize, /optimize-dividers and /import-inventory
+from --concurrency concurrent clients for --duration seconds, through
+httpx.ASGITransport (no sockets; the app, its executor and the database all
+run in this process, as in one uvicorn worker).
+
+Reports per endpoint: requests, throughput, p50/p95/p99 latency, error rate
+and 429 rejections (optimizer busy; counted apart from errors).
+
+Run from backend/:
+    python -m benchmarks.load_test --concurrency 8 --duration 30
+    python -m benchmarks.load_test --mix inventory=5,optimize=1 --executor process
+The shared result store is off unless --result-store is given, so repeated
+optimize requests are measured rather than answered from the store.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+DEFAULT_MIX = "inventory=30,daily-sales=20,optimize=6,optimize-dividers=4,import-inventory=2"
+# Optimize parameter variants, so not every request has the same plan_key
+BUFFER_PCTS = (0.95, 0.9, 0.85)
+SKU_COLUMNS = {
+    "sku_id": "SKU",
+    "description": "Product Name",
+    "length_in": "Length (in)",
+    "width_in": "Width (in)",
+    "height_in": "Height (in)",
+    "weight_lb": "Weight (lb)",
+    "on_hand_units": "In Stock",
+    "annual_units_sold": "Annual Sales",
+}
+
+
+def synthetic_skus(n: int, rng) -> pd.DataFrame:
+    """n SKUs that all fit the default 156 x 36 x 18 in tray."""
+    return pd.DataFrame({
+        "sku_id": [f"LT{i:06d}" for i in range(n)],
+        "description": [f"Load test item {i}" for i in range(n)],
+        "length_in": rng.uniform(1, 20, n).round(1),
+        "width_in": rng.uniform(1, 14, n).round(1),
+        "height_in": rng.uniform(0.5, 12, n).round(1),
+        "weight_lb": rng.uniform(0.1, 20, n).round(2),
+        "on_hand_units": rng.integers(1, 200, n),
+        "annual_units_sold": rng.integers(1, 2000, n),
+    })
+
+
+def synthetic_daily_sales(skus: pd.DataFrame, days: int, rng) -> pd.DataFrame:
+    """Sparse daily sales: each SKU sells on about a third of the days."""
+    dates = pd.date_range(end=pd.Timestamp.today().normalize(), periods=days)
+    sku_idx, day_idx = np.nonzero(rng.random((len(skus), days)) < 1 / 3)
+    return pd.DataFrame({
+        "Date": dates[day_idx].strftime("%m/%d/%Y"),
+        "SKU": skus["sku_id"].to_numpy()[sku_idx],
+        "Units Sold": rng.integers(1, 20, len(sku_idx)),
+    })
+
+
+def workbook(skus: pd.DataFrame, daily: pd.DataFrame) -> bytes:
+    """The two-sheet import template (SKU Master + Daily Sales, headers on row 3)."""
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        skus.rename(columns=SKU_COLUMNS).to_excel(writer, sheet_name="SKU Master", startrow=2, index=False)
+        daily.to_excel(writer, sheet_name="Daily Sales", startrow=2, index=False)
+    return buffer.getvalue()
+
+
+def inventory_csv(skus: pd.DataFrame) -> bytes:
+    return skus.rename(columns=SKU_COLUMNS).to_csv(index=False).encode()
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"inventory", "daily-sales", "optimize", "optimize-dividers", "import-inventory"}
+    if unknown:
+        raise SystemExit(f"Unknown endpoints in --mix: {sorted(unknown)}")
+    return mix
+
+
+async def seed(client, args, rng):
+    """Create the inventory lists (plus one scratch list per client for imports)."""
+    lists = []
+    for i in range(args.lists):
+        skus = synthetic_skus(args.skus, rng)
+        daily = synthetic_daily_sales(skus, args.days, rng)
+        list_id = (await client.post("/inventory-lists", json={"name": f"load-test-{i}"})).json()["id"]
+        response = await client.post(
+            "/import-inventory",
+            files={"file": ("seed.xlsx", workbook(skus, daily), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+            data={"inventory_list_id": list_id},
+        )
+        response.raise_for_status()
+        shelf = [{"sku_id": s, "on_shelf_units": int(max(1, u // 4))} for s, u in zip(skus["sku_id"], skus["on_hand_units"])]
+        (await client.post(f"/inventory-lists/{list_id}/update-on-shelf-units", json={"on_shelf_data": shelf})).raise_for_status()
+        lists.append(list_id)
+        print(f"[LOAD TEST] Seeded list {i + 1}/{args.lists}: {len(skus)} SKUs, {len(daily)} daily sales rows", file=sys.stderr)
+    scratch = []
+    for i in range(args.concurrency):
+        scratch.append((await client.post("/inventory-lists", json={"name": f"load-test-scratch-{i}"})).json()["id"])
+    return lists, scratch
+
+
+def request_for(endpoint: str, lists: list, scratch_list: str, import_body: bytes, rng: random.Random):
+    """(method, url, kwargs) of one request to endpoint."""
+    list_id = rng.choice(lists)
+    if endpoint == "inventory":
+        return "GET", "/inventory", {"params": {"inventory_list_id": list_id}}
+    if endpoint == "daily-sales":
+        return "GET", "/daily-sales", {"params": {"inventory_list_id": list_id}}
+    if endpoint == "import-inventory":
+        return "POST", "/import-inventory", {
+            "files": {"file": ("load.csv", import_body, "text/csv")},
+            "data": {"inventory_list_id": scratch_list},
+        }
+    return "POST", f"/{endpoint}", {"data": {"inventory_list_id": list_id, "buffer_pct": str(rng.choice(BUFFER_PCTS))}}
+
+
+async def client_loop(client, index, args, mix, lists, scratch, import_body, deadline, samples):
+    rng = random.Random(args.seed + index)
+    endpoints, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        endpoint = rng.choices(endpoints, weights)[0]
+        method, url, kwargs = request_for(endpoint, lists, scratch[index], import_body, rng)
+        started = time.perf_counter()
+        try:
+            status = (await client.request(method, url, **kwargs)).status_code
+        except Exception as e:
+            print(f"[LOAD TEST] {endpoint} raised {e}", file=sys.stderr)
+            status = None
+        samples.append((endpoint, status, time.perf_counter() - started))
+
+
+def summarize(samples: list, elapsed_s: float) -> dict:
+    report = {}
+    for endpoint in sorted({s[0] for s in samples}):
+        statuses = [s[1] for s in samples if s[0] == endpoint]
+        latencies = np.array([s[2] for s in samples if s[0] == endpoint]) * 1000
+        errors = sum(1 for s in statuses if s is None or (s >= 400 and s != 429))
+        report[endpoint] = {
+            "requests": len(statuses),
+            "throughput_rps": round(len(statuses) / elapsed_s, 2),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 1),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 1),
+            "error_rate": round(errors / len(statuses), 4),
+            "rejected_429": statuses.count(429),
+        }
+    return report
+
+
+async def run(args):
+    import httpx
+    from app import app
+
+    mix = parse_mix(args.mix)
+    rng = np.random.default_rng(args.seed)
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=args.timeout) as client:
+            lists, scratch = await seed(client, args, rng)
+            import_body = inventory_csv(synthetic_skus(args.skus, rng))
+            samples = []
+            print(f"[LOAD TEST] {args.concurrency} clients for {args.duration}s, mix {mix}", file=sys.stderr)
+            started = time.perf_counter()
+            deadline = started + args.duration
+            await asyncio.gather(*[
+                client_loop(client, i, args, mix, lists, scratch, import_body, deadline, samples)
+                for i in range(args.concurrency)
+            ])
+            # Requests started before the deadline finish after it
+            elapsed_s = time.perf_counter() - started
+    finally:
+        await app.router.shutdown()
+    return summarize(samples, elapsed_s), elapsed_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load after seeding")
+    parser.add_argument("--lists", type=int, default=2)
+    parser.add_argument("--skus", type=int, default=300, help="SKUs per inventory list")
+    parser.add_argument("--days", type=int, default=30, help="days of daily sales per list")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,... (default: %(default)s)")
+    parser.add_argument("--executor", choices=["thread", "process"], default=None, help="OPTIMIZE_EXECUTOR for this run")
+    parser.add_argument("--result-store", action="store_true", help="keep the shared result store on (temp file)")
+    parser.add_argument("--timeout", type=float, default=600.0, help="per-request timeout, seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own log output")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    # Configure before app (and its settings modules) are imported
+    tmpdir = tempfile.mkdtemp(prefix="load_test_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'load.db')}"
+    os.environ["WARMUP_ON_STARTUP"] = "0"
+    os.environ["RESULT_STORE_PATH"] = os.path.join(tmpdir, "results.sqlite3") if args.result_store else ""
+    if args.executor:
+        os.environ["OPTIMIZE_EXECUTOR"] = args.executor
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+        report, elapsed_s = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps({"elapsed_s": round(elapsed_s, 2), "endpoints": report}))
+        return
+    print(f"{'endpoint':<20}{'requests':>9}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}{'429s':>7}")
+    for endpoint, stats in report.items():
+        print(f"{endpoint:<20}{stats['requests']:>9}{stats['throughput_rps']:>9}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+              f"{stats['p99_ms']:>10}{stats['error_rate']:>9.1%}{stats['rejected_429']:>7}")
+    print(f"total {sum(s['requests'] for s in report.values())} requests in {elapsed_s:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
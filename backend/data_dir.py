@@ -0,0 +1,46 @@
+"""
+Private on-disk location for the API's own files (result store, profiles).
+
+Files there are trusted when read back (the result store unpickles its
+entries), so they must not live anywhere another local user can write:
+APP_DATA_DIR defaults to ~/.verticallift, and every directory handed out is
+created 0700 and refused when it is owned by someone else or writable by
+group/others.
+"""
+import os
+import stat
+
+APP_DATA_DIR = os.getenv("APP_DATA_DIR", os.path.join(os.path.expanduser("~"), ".verticallift"))
+
+
+def _check_private(path: str, st):
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by uid {st.st_uid}, not this process (uid {os.getuid()})")
+    if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"{path} is writable by group/others (mode {stat.S_IMODE(st.st_mode):o})")
+
+
+def private_dir(path: str) -> str:
+    """Create path (mode 0700) if missing; PermissionError unless it is a directory only we can write."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode):
+        raise PermissionError(f"{path} is not a directory")
+    _check_private(path, st)
+    return path
+
+
+def private_file(path: str) -> str:
+    """
+    PermissionError unless path sits in a private directory and, when it
+    exists, is a regular file only we can write.
+    """
+    private_dir(os.path.dirname(os.path.abspath(path)))
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return path
+    if not stat.S_ISREG(st.st_mode):
+        raise PermissionError(f"{path} is not a regular file")
+    _check_private(path, st)
+    return path
@@ -0,0 +1,183 @@
+"""
+Database engines and session dependencies.
+
+The sync engine (psycopg2 / sqlite) backs the simple CRUD endpoints. The async
+engine (asyncpg / aiosqlite) backs the heavy endpoints so DB waits don't block
+the event loop. Both are created lazily from DATABASE_URL and share the pool
+settings below.
+
+Single-site installs can run on SQLite without a database server: set
+SQLITE_PATH (or a sqlite:/// DATABASE_URL). Every SQLite connection is then
+put in WAL mode (readers don't block the writer) with the tuned pragmas below,
+unless SQLITE_TUNED=0.
+"""
+import asyncio
+import os
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+from dotenv import load_dotenv
+from models import Base
+
+load_dotenv()  # Loads .env file from project root
+
+SQLITE_PATH = os.getenv("SQLITE_PATH")
+DATABASE_URL = os.getenv("DATABASE_URL") or (f"sqlite:///{os.path.abspath(SQLITE_PATH)}" if SQLITE_PATH else None)
+
+# Pool / timeout settings (per engine, per worker process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))        # seconds to wait for a pooled connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))        # seconds before a connection is recycled
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "10"))  # seconds to open a new connection
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "60"))  # seconds per statement (asyncpg)
+
+# SQLite pragmas, applied to every new connection
+SQLITE_TUNED = os.getenv("SQLITE_TUNED", "1") != "0"
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")         # NORMAL is durable across app crashes in WAL mode
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", "65536"))           # page cache per connection
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", "268435456"))   # memory-mapped reads
+
+# Initialize database connections lazily
+engine = None
+SessionLocal = None
+async_engine = None
+AsyncSessionLocal = None
+_engine_lock = threading.Lock()
+_async_tables_ready = False
+_async_tables_lock = None
+
+
+def _require_url():
+    if not DATABASE_URL:
+        raise ValueError("DATABASE_URL environment variable is not set")
+    return DATABASE_URL
+
+
+def _is_sqlite(url) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        # Wait for a concurrent writer instead of failing with "database is locked"
+        cursor.execute(f"PRAGMA busy_timeout={int(DB_CONNECT_TIMEOUT * 1000)}")
+    finally:
+        cursor.close()
+
+
+def _tune_sqlite(sync_engine):
+    if SQLITE_TUNED and _is_sqlite(sync_engine.url):
+        event.listen(sync_engine, "connect", _sqlite_pragmas)
+
+
+def _pool_kwargs(url) -> dict:
+    if _is_sqlite(url):
+        # SQLite picks its own pool class; QueuePool sizing doesn't apply
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+
+def async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its asyncio driver (asyncpg / aiosqlite)."""
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    sa_url = make_url(url)
+    backend = sa_url.get_backend_name()
+    if backend == "postgresql":
+        query = dict(sa_url.query)
+        # asyncpg takes "ssl" instead of libpq's "sslmode"
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        sa_url = sa_url.set(drivername="postgresql+asyncpg", query=query)
+    elif backend == "sqlite":
+        sa_url = sa_url.set(drivername="sqlite+aiosqlite")
+    return sa_url.render_as_string(hide_password=False)
+
+
+def get_engine():
+    global engine
+    if engine is None:
+        with _engine_lock:
+            if engine is None:
+                url = _require_url()
+                if url.startswith("postgres://"):
+                    url = "postgresql://" + url[len("postgres://"):]
+                connect_args = {} if _is_sqlite(url) else {"connect_timeout": int(DB_CONNECT_TIMEOUT)}
+                new_engine = create_engine(url, pool_pre_ping=True, connect_args=connect_args, **_pool_kwargs(url))
+                _tune_sqlite(new_engine)
+                Base.metadata.create_all(bind=new_engine)
+                engine = new_engine
+    return engine
+
+
+def get_session_local():
+    global SessionLocal
+    if SessionLocal is None:
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    return SessionLocal
+
+
+def get_db():
+    db = get_session_local()()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_async_engine():
+    global async_engine
+    if async_engine is None:
+        with _engine_lock:
+            if async_engine is None:
+                from sqlalchemy.ext.asyncio import create_async_engine
+                url = async_database_url(_require_url())
+                if _is_sqlite(url):
+                    connect_args = {"timeout": DB_CONNECT_TIMEOUT}
+                else:
+                    connect_args = {"timeout": DB_CONNECT_TIMEOUT, "command_timeout": DB_COMMAND_TIMEOUT}
+                new_engine = create_async_engine(url, pool_pre_ping=True, connect_args=connect_args, **_pool_kwargs(url))
+                _tune_sqlite(new_engine.sync_engine)
+                async_engine = new_engine
+    return async_engine
+
+
+def get_async_session_local():
+    global AsyncSessionLocal
+    if AsyncSessionLocal is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        AsyncSessionLocal = async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+    return AsyncSessionLocal
+
+
+async def ensure_async_tables():
+    """Create tables through the async engine once per process (concurrent first requests wait for one create_all)."""
+    global _async_tables_ready, _async_tables_lock
+    if _async_tables_ready:
+        return
+    if _async_tables_lock is None:
+        _async_tables_lock = asyncio.Lock()
+    async with _async_tables_lock:
+        if not _async_tables_ready:
+            async with get_async_engine().begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            _async_tables_ready = True
+
+
+async def get_async_db():
+    await ensure_async_tables()
+    async with get_async_session_local()() as db:
+        yield db
@@ -0,0 +1,163 @@
+"""
+Runs CPU-bound optimization work off the event loop.
+
+Optimizations are submitted to a thread or process pool (OPTIMIZE_EXECUTOR) and
+each worker process admits at most OPTIMIZE_MAX_CONCURRENCY of them at a time.
+Requests over the limit get an immediate 429 with Retry-After instead of queueing.
+Identical concurrent requests (same plan_key) share one run (run_single_flight).
+"""
+import asyncio
+import contextlib
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import HTTPException, status
+from profiling import PROFILING_ENABLED, current_capture
+
+OPTIMIZE_EXECUTOR = os.getenv("OPTIMIZE_EXECUTOR", "thread")  # "thread" or "process"
+OPTIMIZE_MAX_WORKERS = int(os.getenv("OPTIMIZE_MAX_WORKERS", "2"))
+OPTIMIZE_MAX_CONCURRENCY = int(os.getenv("OPTIMIZE_MAX_CONCURRENCY", str(OPTIMIZE_MAX_WORKERS)))
+OPTIMIZE_RETRY_AFTER_S = int(os.getenv("OPTIMIZE_RETRY_AFTER_S", "5"))
+
+_executor = None
+_semaphore = None
+_running = 0          # optimization slots currently held on this worker
+# plan_key -> task of the run that identical requests are waiting on
+_in_flight = {}
+_flight_stats = {"leaders": 0, "followers": 0}
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        if OPTIMIZE_EXECUTOR == "process":
+            # spawn: forking a process that already runs uvicorn threads is not safe
+            _executor = ProcessPoolExecutor(
+                max_workers=OPTIMIZE_MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        elif OPTIMIZE_EXECUTOR == "thread":
+            _executor = ThreadPoolExecutor(max_workers=OPTIMIZE_MAX_WORKERS, thread_name_prefix="optimize")
+        else:
+            raise ValueError(f"OPTIMIZE_EXECUTOR must be 'thread' or 'process', got {OPTIMIZE_EXECUTOR!r}")
+        print(f"[EXECUTOR] Started {OPTIMIZE_EXECUTOR} pool with {OPTIMIZE_MAX_WORKERS} workers")
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(OPTIMIZE_MAX_CONCURRENCY)
+    return _semaphore
+
+
+def optimizations_running() -> int:
+    return _running
+
+
+async def optimization_slot():
+    """
+    FastAPI dependency that holds one optimization slot for the whole request.
+    Fails fast with 429 + Retry-After when every slot on this worker is taken.
+    """
+    semaphore = _get_semaphore()
+    if semaphore.locked():
+        print(f"[EXECUTOR] Rejecting optimization: {OPTIMIZE_MAX_CONCURRENCY} already running")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Optimizer busy ({OPTIMIZE_MAX_CONCURRENCY} runs in progress). Retry shortly.",
+            headers={"Retry-After": str(OPTIMIZE_RETRY_AFTER_S)},
+        )
+    global _running
+    async with semaphore:
+        _running += 1
+        try:
+            yield
+        finally:
+            _running -= 1
+
+
+held_optimization_slot = contextlib.asynccontextmanager(optimization_slot)
+
+
+async def run_cpu_bound(func, *args, **kwargs):
+    """Run func(*args, **kwargs) in the optimization pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    capture = current_capture() if PROFILING_ENABLED else None
+    if capture is not None:
+        call = capture.wrap(call, process=OPTIMIZE_EXECUTOR == "process")
+    return await loop.run_in_executor(get_executor(), call)
+
+
+async def run_cpu_bound_batch(calls):
+    """
+    Run several calls (zero-argument callables, e.g. functools.partial) for a
+    request that already holds one optimization slot. That slot plus the slots
+    free right now each work through the calls in turn, so the batch never takes
+    this worker past OPTIMIZE_MAX_CONCURRENCY runs. Returns the results in call
+    order, with an exception in place of a failed call's result.
+    """
+    global _running
+    semaphore = _get_semaphore()
+    extra = 0
+    while extra < len(calls) - 1 and not semaphore.locked():
+        await semaphore.acquire()
+        extra += 1
+    _running += extra
+
+    results = [None] * len(calls)
+    queue = iter(range(len(calls)))
+
+    async def work():
+        for i in queue:
+            try:
+                results[i] = await run_cpu_bound(calls[i])
+            except Exception as e:
+                results[i] = e
+
+    try:
+        await asyncio.gather(*[work() for _ in range(1 + extra)])
+    finally:
+        _running -= extra
+        for _ in range(extra):
+            semaphore.release()
+    return results
+
+
+async def run_single_flight(key, func, *args, **kwargs):
+    """
+    run_cpu_bound(func, ...) under an optimization slot, shared by concurrent
+    callers with the same key: the first caller runs it, callers arriving while
+    it runs wait for the same result (or exception) without taking a slot.
+    key=None always runs. The run is not tied to the first caller, so it
+    finishes for the others even if that client goes away.
+    """
+    if key is None:
+        async with held_optimization_slot():
+            return await run_cpu_bound(func, *args, **kwargs)
+    task = _in_flight.get(key)
+    if task is None:
+        async def lead():
+            async with held_optimization_slot():
+                return await run_cpu_bound(func, *args, **kwargs)
+        task = asyncio.ensure_future(lead())
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+        _flight_stats["leaders"] += 1
+    else:
+        _flight_stats["followers"] += 1
+        print(f"[EXECUTOR] Joining in-flight run {key[:12]} ({_flight_stats['followers']} coalesced so far)")
+    return await asyncio.shield(task)
+
+
+def single_flight_stats() -> dict:
+    return {**_flight_stats, "in_flight": len(_in_flight)}
@@ -0,0 +1,214 @@
+"""
+Registry of optimization jobs, keyed by a client-chosen job_id.
+
+An optimize request that carries a job_id gets a ProgressReporter and a
+CancelToken for the engine. Progress events are fanned out to every
+GET /jobs/{job_id}/events subscriber as server-sent events, and
+DELETE /jobs/{job_id} sets the token. With the thread executor, events go
+straight onto the event loop and the token holds a threading.Event. With
+the process executor, events go through a Manager queue that a drain
+thread forwards, and the token holds a Manager Event. Requests without a
+job_id report nothing; a deadline alone still gets a token. The latest event
+of each stage, and the final one, of each job also go to the shared result
+store (off the event loop), so its status can be read from any worker.
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import HTTPException, status
+import result_store
+from algorithms.progress import ProgressReporter
+from algorithms.cancellation import CancelToken, RunCancelled
+from execution import OPTIMIZE_EXECUTOR
+
+# Finished jobs are kept this long so late subscribers still get the final event
+# (and jobs opened by a subscriber but never run, once nobody is listening)
+JOB_RETENTION_S = int(os.getenv("JOB_RETENTION_S", "300"))
+# Jobs opened by subscribers that have not run yet; more are refused with 429
+JOB_MAX_WAITING = int(os.getenv("JOB_MAX_WAITING", "1000"))
+# Comment line sent to idle subscribers so proxies keep the stream open
+SSE_KEEPALIVE_S = 15
+
+_jobs = {}
+_manager = None
+
+
+class _Job:
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.created_at = time.monotonic()
+        self.last_event = None
+        self.subscribers = set()
+        self.running = False
+        self.finished_at = None
+        self.cancel_token = None
+        self.stored_stage = None
+
+    def publish(self, event: dict):
+        """Runs on the event loop."""
+        self.last_event = event
+        for queue in self.subscribers:
+            queue.put_nowait(event)
+        # Other workers answer GET /jobs/{job_id} from the shared store; counter
+        # updates within a stage are left out to keep writes off the hot path
+        if event.get("done") or event.get("stage") != self.stored_stage:
+            self.stored_stage = event.get("stage")
+            result_store.put_later("job", self.job_id, event, JOB_RETENTION_S)
+
+
+class _LoopSink:
+    """Thread executor: hand events from the worker thread to the event loop."""
+
+    def __init__(self, job: _Job, loop):
+        self.job = job
+        self.loop = loop
+
+    def put(self, event: dict):
+        self.loop.call_soon_threadsafe(self.job.publish, event)
+
+
+def _get_manager():
+    global _manager
+    if _manager is None:
+        # spawn, like the process executor itself
+        _manager = multiprocessing.get_context("spawn").Manager()
+    return _manager
+
+
+def shutdown_jobs():
+    global _manager
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None
+
+
+def _drain(queue, job: _Job, loop):
+    """Process executor: forward events from the Manager queue until the None sentinel."""
+    while True:
+        event = queue.get()
+        if event is None:
+            return
+        loop.call_soon_threadsafe(job.publish, event)
+
+
+def _is_stale(job: _Job, now: float) -> bool:
+    """Nobody listening and finished (or, never run, created) more than JOB_RETENTION_S ago."""
+    if job.running or job.subscribers:
+        return False
+    since = job.finished_at if job.finished_at is not None else job.created_at
+    return now - since > JOB_RETENTION_S
+
+
+def get_job(job_id: str, create: bool = False):
+    """The job for job_id (created if asked; subscribers may arrive before the run)."""
+    now = time.monotonic()
+    for stale in [j for j in _jobs.values() if _is_stale(j, now)]:
+        del _jobs[stale.job_id]
+    if create and job_id not in _jobs:
+        _jobs[job_id] = _Job(job_id)
+    return _jobs.get(job_id)
+
+
+def check_job_available(job_id: str = None):
+    """409 when a run with this job_id is still in progress."""
+    job = get_job(job_id) if job_id else None
+    if job is not None and job.running:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job {job_id} is already running")
+
+
+def cancel_job(job_id: str) -> bool:
+    """Ask a running job to stop; False when there is no such running job."""
+    job = get_job(job_id)
+    if job is None or not job.running or job.cancel_token is None:
+        return False
+    job.cancel_token.cancel()
+    print(f"[JOBS] Cancelling job {job_id}")
+    return True
+
+
+@asynccontextmanager
+async def job_run(job_id: str = None, deadline_ms: int = None):
+    """
+    Yields the engine keyword arguments for one run: progress (a ProgressReporter,
+    with a job_id) and cancel_token (with a job_id or a deadline), else None.
+    Publishes the final done/cancelled/failed event when the block exits.
+    """
+    if not job_id:
+        yield {"progress": None, "cancel_token": CancelToken(deadline_ms=deadline_ms) if deadline_ms else None}
+        return
+    check_job_available(job_id)
+    job = get_job(job_id, create=True)
+    job.running, job.finished_at, job.last_event, job.stored_stage = True, None, None, None
+    loop = asyncio.get_running_loop()
+    queue = drain = None
+    if OPTIMIZE_EXECUTOR == "process":
+        queue = _get_manager().Queue()
+        drain = loop.run_in_executor(None, _drain, queue, job, loop)
+        reporter = ProgressReporter(queue)
+        job.cancel_token = CancelToken(_get_manager().Event(), deadline_ms)
+    else:
+        reporter = ProgressReporter(_LoopSink(job, loop))
+        job.cancel_token = CancelToken(deadline_ms=deadline_ms)
+    reporter.stage("queued")
+    outcome = {"stage": "failed"}
+    try:
+        yield {"progress": reporter, "cancel_token": job.cancel_token}
+        outcome = {"stage": "done"}
+    except RunCancelled:
+        outcome = {"stage": "cancelled"}
+        raise
+    except Exception as e:
+        outcome["error"] = str(e)
+        raise
+    finally:
+        if drain is not None:
+            queue.put(None)
+            await drain
+        # Let events the worker scheduled before it returned reach subscribers first
+        await asyncio.sleep(0)
+        job.publish(dict(job.last_event or {}, **outcome, done=True, elapsed_s=round(time.perf_counter() - reporter.started, 2)))
+        job.running, job.finished_at, job.cancel_token = False, time.monotonic(), None
+        print(f"[JOBS] Job {job_id} {outcome['stage']}")
+
+
+def _sse(event: dict) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+def watch_job(job_id: str) -> _Job:
+    """
+    The job a subscriber streams, created when it has not run yet.
+    429 once JOB_MAX_WAITING such jobs exist, so unknown ids cannot pile up.
+    """
+    job = get_job(job_id)
+    if job is None:
+        waiting = sum(1 for j in _jobs.values() if not j.running and j.finished_at is None)
+        if waiting >= JOB_MAX_WAITING:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many jobs waiting for a run")
+        job = get_job(job_id, create=True)
+    return job
+
+
+async def stream_job_events(job: _Job):
+    """Server-sent events for a job (from watch_job): the latest event, then every new one until done."""
+    queue = asyncio.Queue()
+    job.subscribers.add(queue)
+    try:
+        if job.last_event is not None:
+            yield _sse(job.last_event)
+            if job.last_event.get("done"):
+                return
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_S)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield _sse(event)
+            if event.get("done"):
+                return
+    finally:
+        job.subscribers.discard(queue)
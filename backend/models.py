@@ -1,7 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.dialects.postgresql import UUID
 import uuid
 import datetime
 
@@ -24,15 +23,27 @@ class TrayConfig(Base):
     num_trays = Column(Integer)
     weight_limit_lb = Column(Float)
 
-class Inventory(Base):
-    __tablename__ = "inventory"
+class Sku(Base):
+    """
+    SKU master shared by all inventory lists: the code and the physical item
+    (description, dimensions, weight). Inventory and daily sales rows reference
+    it by the integer id; the API keeps exposing the code as sku_id.
+    """
+    __tablename__ = "skus"
     id = Column(Integer, primary_key=True, index=True)
-    sku_id = Column(String, index=True)
+    sku_code = Column(String, unique=True, index=True, nullable=False)
     description = Column(String)
     length_in = Column(Float)
     width_in = Column(Float)
     height_in = Column(Float)
     weight_lb = Column(Float)
+
+class Inventory(Base):
+    """Per-list quantities and demand of one SKU."""
+    __tablename__ = "inventory"
+    id = Column(Integer, primary_key=True, index=True)
+    sku_id = Column(Integer, ForeignKey("skus.id"), index=True, nullable=False)
+    sku = relationship("Sku")
     on_hand_units = Column(Integer)
     on_shelf_units = Column(Integer)  # Calculated optimal on-shelf units from analytics
     annual_units_sold = Column(Integer)
@@ -50,7 +61,37 @@ class DailySales(Base):
     __tablename__ = "daily_sales"
     id = Column(Integer, primary_key=True, index=True)
     date = Column(DateTime, nullable=False)
-    sku_id = Column(String, index=True, nullable=False)
+    sku_id = Column(Integer, ForeignKey("skus.id"), index=True, nullable=False)
     units_sold = Column(Integer, nullable=False)
     inventory_list_id = Column(String, ForeignKey("inventory_lists.id", ondelete="CASCADE"), nullable=False)
-    inventory_list = relationship("InventoryList") 
\ No newline at end of file
+    inventory_list = relationship("InventoryList")
+
+    __table_args__ = (
+        Index('ix_daily_sales_list_sku', 'inventory_list_id', 'sku_id'),
+    )
+
+class SlotGeometry(Base):
+    """
+    Derived per-SKU slot geometry for one (inventory list, tray config, buffer):
+    vertical orientation, layers and footprint dims. Written on inventory import
+    and tray config save; the item dimensions it was computed from are kept so
+    rows whose SKU dimensions changed since are ignored.
+    """
+    __tablename__ = "slot_geometry"
+    id = Column(Integer, primary_key=True, index=True)
+    inventory_list_id = Column(String, ForeignKey("inventory_lists.id", ondelete="CASCADE"), nullable=False)
+    tray_config_id = Column(Integer, ForeignKey("tray_configs.id", ondelete="CASCADE"), nullable=False)
+    buffer_pct = Column(Float, nullable=False)
+    sku_id = Column(String, nullable=False)
+    length_in = Column(Float)
+    width_in = Column(Float)
+    height_in = Column(Float)
+    height_orientation = Column(String)
+    layers = Column(Float)
+    grid_dim1 = Column(Float)
+    grid_dim2 = Column(Float)
+
+    __table_args__ = (
+        UniqueConstraint('inventory_list_id', 'tray_config_id', 'buffer_pct', 'sku_id', name='uq_slot_geometry_key'),
+        Index('ix_slot_geometry_list_config', 'inventory_list_id', 'tray_config_id'),
+    )
@@ -1,8 +1,8 @@
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple, Optional
-from algorithms.rectpack_algorithm import optimise_rectpack
-from algorithms.simple_algorithm import optimise_simple
+from algorithms.registry import is_registered, load_engine
+from algorithms.tiers import sku_tier_labels
 
 def is_small_item(length_in, width_in, height_in, weight_lb, description=""):
     """
@@ -77,11 +77,61 @@ def is_small_item(length_in, width_in, height_in, weight_lb, description=""):
         'surface_to_volume_ratio': surface_area / volume if volume > 0 else 0
     }
 
-def optimise(df: pd.DataFrame, model="simple", **kw):
+TOSS_BIN_SMALL_WORDS = ['small', 'tiny', 'mini', 'micro', 'nano']
+TOSS_BIN_LARGE_WORDS = ['large', 'big', 'huge', 'bulky', 'heavy']
+
+def toss_bin_scores(df: pd.DataFrame) -> np.ndarray:
     """
-    Main optimization function - supports multiple algorithms
+    Vectorized version of is_small_item scoring for a whole DataFrame.
+    Returns the toss bin score for every row (lower score = better candidate).
+    """
+    length = df['length_in'].to_numpy(dtype=float)
+    width = df['width_in'].to_numpy(dtype=float)
+    height = df['height_in'].to_numpy(dtype=float)
+    weight = df['weight_lb'].to_numpy(dtype=float)
+    
+    volume = length * width * height
+    surface_area = 2 * (length * width + length * height + width * height)
+    longest_dim = np.maximum(np.maximum(length, width), height)
+    ratio = np.divide(surface_area, volume, out=np.zeros_like(volume), where=volume > 0)
+    
+    # Same thresholds as is_small_item; NaN comparisons fall through to the default bucket
+    score = np.select([volume < 100, volume < 500, volume < 1000], [0, 1, 2], default=3)
+    score += np.select([weight < 1, weight < 5, weight < 10], [0, 1, 2], default=3)
+    score += np.select([longest_dim < 6, longest_dim < 12, longest_dim < 18], [0, 1, 2], default=3)
+    score += np.select([ratio > 3, ratio < 1.5], [-1, 1], default=0)
+    
+    # Description-based hints
+    if 'description' in df.columns:
+        desc = df['description'].fillna('').astype(str).str.lower()
+        score -= desc.str.contains('|'.join(TOSS_BIN_SMALL_WORDS), regex=True).to_numpy(dtype=int)
+        score += 2 * desc.str.contains('|'.join(TOSS_BIN_LARGE_WORDS), regex=True).to_numpy(dtype=int)
+    
+    return score
+
+def classify_skus(df: pd.DataFrame, tray_width: float = 36, tray_length: float = 156, buffer_pct: float = 0.95):
+    """
+    Add toss_bin_score, is_toss_bin_candidate and tier columns in one pass
+    """
+    print(f"[CLASSIFY] Scoring toss bins and tiers for {len(df)} SKUs")
+    
+    df_classified = df.copy()
+    # Toss bin scores do not depend on the tray; reuse them when prepare_inventory already added them
+    if 'toss_bin_score' not in df_classified.columns:
+        score = toss_bin_scores(df_classified)
+        df_classified['toss_bin_score'] = score
+        df_classified['is_toss_bin_candidate'] = score <= 3  # Low score = good candidate
+    df_classified['tier'] = sku_tier_labels(df_classified, tray_width * buffer_pct, tray_length * buffer_pct)
+    
+    print(f"[CLASSIFY] Toss bin candidates: {int(df_classified['is_toss_bin_candidate'].sum())}")
+    return df_classified
+
+def prepare_inventory(df: pd.DataFrame, classify=False):
+    """
+    Tray-independent input preparation: log and check the input, and with
+    classify=True add the toss bin scores. Batch runs over several tray
+    configs do this once and pass prepared=True to optimise().
     """
-    print(f"[MAIN] Using {model} optimizer")
     print(f"[MAIN] Input DataFrame shape: {df.shape}")
     print(f"[MAIN] Input DataFrame columns: {list(df.columns)}")
     print(f"[MAIN] Input DataFrame sample:")
@@ -97,49 +147,253 @@ def optimise(df: pd.DataFrame, model="simple", **kw):
         else:
             print(f"[MAIN] Warning: Missing column {col}")
     
-    if model == "rectpack" or model == "maximal-rectangles":
-        return optimise_rectpack(df, **kw)
-    elif model == "simple":
-        return optimise_simple(df, **kw)
-    else:
+    if classify and 'toss_bin_score' not in df.columns:
+        df = df.copy()
+        score = toss_bin_scores(df)
+        df['toss_bin_score'] = score
+        df['is_toss_bin_candidate'] = score <= 3
+    return df
+
+def optimise(df: pd.DataFrame, model="simple", classify=False, prepared=False, **kw):
+    """
+    Main optimization function - supports multiple algorithms.
+    With classify=True the toss bin / tier columns are added before packing.
+    """
+    print(f"[MAIN] Using {model} optimizer")
+    if not prepared:
+        df = prepare_inventory(df, classify)
+    
+    if classify:
+        df = classify_skus(
+            df,
+            kw.get('tray_width_in', 36),
+            kw.get('tray_length_in', 156),
+            kw.get('buffer_pct', 0.95)
+        )
+    
+    if not is_registered(model):
         print(f"[MAIN] Unknown model '{model}', defaulting to simple optimizer")
-        return optimise_simple(df, **kw)
+        model = "simple"
+    
+    engine = load_engine(model)
+    if kw.get('cancel_token'):
+        kw['cancel_token'].check()
+    if kw.get('progress'):
+        kw['progress'].stage("engine", model=model, skus=len(df))
+    return engine(df, **kw)
+
+def optimise_plan(df: pd.DataFrame, model="rectpack", tray_length_in=156, tray_width_in=36, tray_depth_in=18, weight_limit_lb=2205, **kw):
+    """
+    Run optimise() and calculate_kpis() in one call.
+    Module-level so it can be submitted to a thread or process pool.
+    """
+    plan = optimise(
+        df,
+        model=model,
+        tray_length_in=tray_length_in,
+        tray_width_in=tray_width_in,
+        tray_depth_in=tray_depth_in,
+        weight_limit_lb=weight_limit_lb,
+        **kw
+    )
+    if kw.get('progress'):
+        kw['progress'].stage("kpis")
+    kpis = calculate_kpis(plan, tray_length_in, tray_width_in, tray_depth_in, weight_limit_lb)
+    add_bound_kpis(kpis, plan, tray_length_in, tray_width_in, kw.get('buffer_pct', 0.95))
+    add_engine_stats(kpis, plan)
+    return plan, kpis
+
+def optimise_dividers(df: pd.DataFrame, model="rectpack", tray_length_in=156, tray_width_in=36, tray_depth_in=18, buffer_pct=0.95, **kw):
+    """
+    Run optimise() and calculate_divider_kpis() in one call (executor entry point).
+    """
+    result = optimise(
+        df,
+        model=model,
+        tray_length_in=tray_length_in,
+        tray_width_in=tray_width_in,
+        tray_depth_in=tray_depth_in,
+        buffer_pct=buffer_pct,
+        **kw
+    )
+    if kw.get('progress'):
+        kw['progress'].stage("kpis")
+    kpis = calculate_divider_kpis(result, tray_length_in, tray_width_in, tray_depth_in, buffer_pct)
+    add_bound_kpis(kpis, result, tray_length_in, tray_width_in, buffer_pct)
+    add_engine_stats(kpis, result)
+    return result, kpis
+
+def tray_weights(tray_layouts, df: pd.DataFrame) -> List[float]:
+    """
+    Weight on each tray of a layout, splitting every SKU's stocked weight
+    evenly over the slots it occupies.
+    """
+    from algorithms.geometry import quantity_column
+
+    sku_weight = (df['weight_lb'].fillna(0) * df[quantity_column(df)].fillna(0)).groupby(df['sku_id'].astype(str)).sum()
+    slot_count = {}
+    for tray in tray_layouts:
+        for slot in tray['slots']:
+            slot_count[slot['sku_id']] = slot_count.get(slot['sku_id'], 0) + 1
+    return [
+        sum(sku_weight.get(slot['sku_id'], 0.0) / slot_count[slot['sku_id']] for slot in tray['slots'])
+        for tray in tray_layouts
+    ]
+
+def config_comparison(tray_config: Dict, plan: pd.DataFrame, kpis: Dict, buffer_pct=0.95) -> Dict:
+    """
+    One row of the multi-config comparison: trays, utilization and weight headroom
+    of a plan on one tray config. Utilization and per-tray weights come from the
+    tray layouts when the engine produced them.
+    """
+    weight_limit = tray_config.get('weight_limit_lb') or 0
+    tray_layouts = plan.attrs.get('tray_layouts')
+    trays = kpis['total_trays']
+    row = {
+        **tray_config,
+        'total_trays': trays,
+        'fits_available_trays': trays <= tray_config['num_trays'] if tray_config.get('num_trays') else None,
+        'lower_bound_trays': kpis.get('lower_bound_trays'),
+        'gap_pct': kpis.get('gap_pct'),
+        'area_utilization_pct': kpis.get('area_utilization_pct'),
+        'weight_utilization_pct': kpis.get('weight_utilization_pct'),
+        'total_weight_lb': kpis.get('total_weight_lb'),
+        'weight_headroom_lb': round(trays * weight_limit - kpis['total_weight_lb'], 2) if weight_limit and 'total_weight_lb' in kpis else None,
+        'min_tray_weight_headroom_lb': None,
+    }
+    if tray_layouts:
+        W = int(tray_config['tray_width_in'] * buffer_pct)
+        L = int(tray_config['tray_length_in'] * buffer_pct)
+        slot_area = sum(s['width_in'] * s['length_in'] for tray in tray_layouts for s in tray['slots'])
+        row['area_utilization_pct'] = round(100 * slot_area / (trays * W * L), 1)
+        weights = tray_weights(tray_layouts, plan)
+        row['total_weight_lb'] = round(sum(weights), 2)
+        if weight_limit:
+            row['weight_utilization_pct'] = round(100 * sum(weights) / (trays * weight_limit), 1)
+            row['weight_headroom_lb'] = round(trays * weight_limit - sum(weights), 2)
+            row['min_tray_weight_headroom_lb'] = round(weight_limit - max(weights), 2)
+    return row
+
+def add_engine_stats(kpis, result_df):
+    """
+    Copy the engine's own stats (slot cache hits/misses, incomplete marker) into the
+    KPIs, lifting trays_saved_by_rotation to the top level in rotation mode.
+    """
+    if result_df.attrs.get('slot_cache'):
+        kpis['slot_cache'] = result_df.attrs['slot_cache']
+    if result_df.attrs.get('incomplete'):
+        # Partial plan: the run hit its deadline before every slot was placed
+        kpis['incomplete'] = result_df.attrs['incomplete']
+    engine_stats = result_df.attrs.get('engine_stats')
+    if not engine_stats:
+        return kpis
+    kpis['engine_stats'] = engine_stats
+    if 'rotation' in engine_stats:
+        kpis['trays_saved_by_rotation'] = engine_stats['rotation']['trays_saved_by_rotation']
+    return kpis
+
+def add_bound_kpis(kpis, result_df, tray_length_in, tray_width_in, buffer_pct=0.95):
+    """
+    Add lower_bound_trays and gap_pct to the KPIs. Engines may supply their own
+    bounds in attrs['lower_bounds']; otherwise they come from the tray layouts,
+    or from the per-SKU slots for engines without layouts.
+    """
+    from algorithms.bounds import lower_bounds, layout_lower_bounds, gap_pct
+
+    W, L = int(tray_width_in * buffer_pct), int(tray_length_in * buffer_pct)
+    tray_layouts = result_df.attrs.get('tray_layouts')
+    bounds = result_df.attrs.get('lower_bounds')
+    if bounds is None and tray_layouts:
+        bounds = layout_lower_bounds(tray_layouts, W, L)
+    elif bounds is None and {'slot_w_in', 'slot_l_in', 'trays_needed'} <= set(result_df.columns):
+        copies = result_df['trays_needed'].fillna(1).astype(int).clip(lower=0).to_numpy()
+        bounds = lower_bounds(
+            np.repeat(result_df['slot_w_in'].to_numpy(dtype=float), copies),
+            np.repeat(result_df['slot_l_in'].to_numpy(dtype=float), copies),
+            W, L,
+        )
+    if bounds is None:
+        return kpis
+
+    kpis['lower_bound_trays'] = bounds['lower_bound_trays']
+    # The gap needs an actual tray count, which only layout engines produce
+    kpis['gap_pct'] = gap_pct(len(tray_layouts), bounds['lower_bound_trays']) if tray_layouts else None
+    kpis['lower_bounds'] = bounds
+    return kpis
+
+def _without_attrs(df):
+    """
+    Shallow copy of df without attrs. pandas deep-copies attrs (the tray layouts)
+    into every Series taken from the frame, which dominates KPI time on big plans.
+    """
+    attrs = df.attrs
+    df.attrs = {}
+    try:
+        return df.copy(deep=False)
+    finally:
+        df.attrs = attrs
+
+def _column(df, name, default):
+    """Values of a column as a list (a default per row when it is missing)."""
+    return df[name].tolist() if name in df.columns else [default] * len(df)
+
+def _slot_series(df, name, legacy_name):
+    """
+    Slot dimension per row, NaN as 0. The engines write slot_w_in/slot_l_in;
+    slot_width_in/slot_length_in are the names of the old optimiser.
+    """
+    column = name if name in df.columns else legacy_name
+    if column not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    return pd.to_numeric(df[column], errors='coerce').fillna(0)
+
+def _slot_usage(df, tray_layouts, tray_area):
+    """
+    Tray count, total slot area and total slot area x layers of a plan.
+    Layout engines give the real tray count and every placed slot. Engines
+    without layouts give trays_needed slots per row, and need at least as
+    many trays as that slot area fills.
+    """
+    layers = pd.to_numeric(df['layers'], errors='coerce').fillna(1) if 'layers' in df.columns else pd.Series(1, index=df.index)
+    if tray_layouts:
+        layers_by_sku = dict(zip(df['sku_id'].astype(str), layers)) if 'sku_id' in df.columns else {}
+        slots = [slot for tray in tray_layouts for slot in tray['slots']]
+        area = sum(slot['width_in'] * slot['length_in'] for slot in slots)
+        volume = sum(slot['width_in'] * slot['length_in'] * layers_by_sku.get(str(slot['sku_id']), 1) for slot in slots)
+        return len(tray_layouts), area, volume
+
+    copies = df['trays_needed'].fillna(1) if 'trays_needed' in df.columns else pd.Series(1, index=df.index)
+    slot_area = _slot_series(df, 'slot_w_in', 'slot_width_in') * _slot_series(df, 'slot_l_in', 'slot_length_in') * copies
+    area = float(slot_area.sum())
+    volume = float((slot_area * layers).sum())
+    trays = int(copies.max()) if len(df) else 1
+    if tray_area > 0:
+        trays = max(trays, int(np.ceil(area / tray_area)))
+    return trays, area, volume
 
 def calculate_kpis(plan_df, tray_length_in, tray_width_in, tray_depth_in, weight_limit_lb):
     """
     Calculate KPIs for the optimization plan
     """
     print(f"[KPIs] Calculating KPIs for {len(plan_df)} SKUs")
+    tray_layouts = plan_df.attrs.get('tray_layouts')
+    plan_df = _without_attrs(plan_df)
     
     # Basic tray utilization
-    total_trays = plan_df['trays_needed'].max() if 'trays_needed' in plan_df.columns else 1
     tray_area = tray_length_in * tray_width_in
     tray_volume = tray_area * tray_depth_in
     
     # Calculate total slot area used
-    total_slot_area = 0
-    total_slot_volume = 0
-    total_units = 0
-    
-    for _, row in plan_df.iterrows():
-        slot_area = row.get('slot_width_in', 0) * row.get('slot_length_in', 0)
-        slot_volume = slot_area * row.get('layers', 1)
-        units = row.get('on_shelf_units', 0)
-        
-        total_slot_area += slot_area
-        total_slot_volume += slot_volume
-        total_units += units
+    total_trays, total_slot_area, total_slot_volume = _slot_usage(plan_df, tray_layouts, tray_area)
+    units = _column(plan_df, 'on_shelf_units', 0)
+    total_units = sum(units)
     
     # Utilization metrics
     area_utilization = (total_slot_area / (total_trays * tray_area)) * 100 if total_trays > 0 else 0
     volume_utilization = (total_slot_volume / (total_trays * tray_volume)) * 100 if total_trays > 0 else 0
     
     # Weight analysis
-    total_weight = 0
-    for _, row in plan_df.iterrows():
-        units = row.get('on_shelf_units', 0)
-        weight_per_unit = row.get('weight_lb', 0)
-        total_weight += units * weight_per_unit
+    total_weight = sum(u * w for u, w in zip(units, _column(plan_df, 'weight_lb', 0)))
     
     weight_utilization = (total_weight / (total_trays * weight_limit_lb)) * 100 if total_trays > 0 else 0
     
@@ -162,6 +416,8 @@ def calculate_divider_kpis(df_result, tray_length_in, tray_width_in, tray_depth_
     Calculate divider-specific KPIs
     """
     print(f"[DIVIDER KPIs] Calculating divider KPIs")
+    tray_layouts = df_result.attrs.get('tray_layouts')
+    df_result = _without_attrs(df_result)
     
     # Convert to JSON-serializable format
     def convert_numpy(obj):
@@ -184,27 +440,13 @@ def calculate_divider_kpis(df_result, tray_length_in, tray_width_in, tray_depth_
     # Calculate basic metrics
     total_skus = len(df_result)
     
-    # Handle NaN values in trays_needed
-    if 'trays_needed' in df_result.columns:
-        trays_needed_series = df_result['trays_needed'].fillna(1)
-        total_trays = trays_needed_series.max() if len(trays_needed_series) > 0 else 1
-    else:
-        total_trays = 1
-    
     # Slot utilization
-    total_slot_area = 0
-    total_tray_area = total_trays * tray_length_in * tray_width_in * (buffer_pct ** 2)
-    
-    for _, row in df_result.iterrows():
-        slot_width = row.get('slot_width_in', 0)
-        slot_length = row.get('slot_length_in', 0)
-        
-        # Handle NaN values
-        if pd.isna(slot_width) or pd.isna(slot_length):
-            slot_width = 0
-            slot_length = 0
-            
-        total_slot_area += slot_width * slot_length
+    effective_tray_area = tray_length_in * tray_width_in * (buffer_pct ** 2)
+    total_trays, total_slot_area, _ = _slot_usage(df_result, tray_layouts, effective_tray_area)
+    total_tray_area = total_trays * effective_tray_area
+    
+    slot_width_series = _slot_series(df_result, 'slot_w_in', 'slot_width_in')
+    slot_length_series = _slot_series(df_result, 'slot_l_in', 'slot_length_in')
     
     area_utilization = (total_slot_area / total_tray_area) * 100 if total_tray_area > 0 else 0
     
@@ -219,12 +461,8 @@ def calculate_divider_kpis(df_result, tray_length_in, tray_width_in, tray_depth_
     max_layers = layers_series.max()
     
     # Calculate additional KPIs for frontend compatibility - handle NaN values
-    slot_width_series = df_result.get('slot_width_in', pd.Series([0] * len(df_result)))
-    slot_width_series = slot_width_series.fillna(0)  # Replace NaN with 0
     avg_slot_width = slot_width_series.mean() if len(df_result) > 0 else 0
     
-    slot_length_series = df_result.get('slot_length_in', pd.Series([0] * len(df_result)))
-    slot_length_series = slot_length_series.fillna(0)  # Replace NaN with 0
     avg_slot_length = slot_length_series.mean() if len(df_result) > 0 else 0
     
     on_shelf_series = df_result.get('on_shelf_units', pd.Series([0] * len(df_result)))
@@ -262,35 +500,8 @@ def classify_sku_tiers(df, tray_width, tray_length, buffer_pct=0.95):
     """
     print(f"[TIERS] Classifying {len(df)} SKUs into tiers")
     
-    # Calculate effective tray dimensions
-    W_eff = tray_width * buffer_pct
-    L_eff = tray_length * buffer_pct
-    
-    # Determine quantity column
-    if 'on_shelf_units' in df.columns:
-        quantity_col = 'on_shelf_units'
-    elif 'on_hand_units' in df.columns:
-        quantity_col = 'on_hand_units'
-    else:
-        quantity_col = 'annual_units_sold'
-    
-    # Simple tier classification
-    tiers = []
-    for _, row in df.iterrows():
-        # Check if SKU fits in tray
-        if row['width_in'] > W_eff or row['length_in'] > L_eff:
-            tier = 'oversized'
-        elif row['width_in'] < 6 and row['length_in'] < 6 and row['height_in'] < 6:
-            tier = 'small'
-        elif row['width_in'] < 12 and row['length_in'] < 12 and row['height_in'] < 12:
-            tier = 'medium'
-        else:
-            tier = 'large'
-        
-        tiers.append(tier)
-    
     df_tiered = df.copy()
-    df_tiered['tier'] = tiers
+    df_tiered['tier'] = sku_tier_labels(df_tiered, tray_width * buffer_pct, tray_length * buffer_pct)
     
     # Count tiers
     tier_counts = df_tiered['tier'].value_counts()
@@ -305,6 +516,7 @@ def handle_small_skus(small_skus_df, tray_width, tray_length, buffer_pct=0.95):
     print(f"[SMALL SKUs] Handling {len(small_skus_df)} small SKUs")
     
     # Use the simple optimizer for small SKUs too
+    optimise_simple = load_engine("simple")
     result_df = optimise_simple(small_skus_df, tray_width, tray_length, 18, buffer_pct)
     
     print(f"[SMALL SKUs] Small SKU optimization complete")
@@ -1,14 +1,7 @@
 import pandas as pd
 import numpy as np
-import cvxpy as cp
 from typing import Dict, List, Tuple, Optional
 import json
-from algorithms import (
-    optimise_rectpack,
-    optimise_simple,
-    optimise_cvxpy_continuous,
-    optimise_cvxpy_discrete
-)
 
 def is_small_item(length_in, width_in, height_in, weight_lb, description=""):
     """
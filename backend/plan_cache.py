@@ -0,0 +1,60 @@
+"""
+Content keys and the shared cache of optimization results.
+
+plan_key hashes the inventory rows actually loaded (not just the list id, so
+an edited list gets a new key) together with every request parameter that
+changes the result. Concurrent requests with the same key share one run
+(execution.run_single_flight), and complete results are kept in the host's
+result store so any worker can answer a repeat request or serve the layouts.
+"""
+import hashlib
+import json
+import pandas as pd
+import result_store
+
+
+def plan_key(kind: str, df: pd.DataFrame, **params) -> str:
+    """Hex digest identifying the result of running `kind` on df with params."""
+    digest = hashlib.sha256()
+    digest.update(kind.encode())
+    digest.update(json.dumps(list(map(str, df.columns))).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def store_result(key: str, result):
+    """
+    Keep a (frame, kpis) result under key: the frame and kpis as "plan", its
+    tray layouts separately as "layouts" so they can be served on their own.
+    Partial (deadline) results are not kept.
+    """
+    frame, kpis = result
+    if "incomplete" in kpis:
+        return
+    layouts = frame.attrs.get("tray_layouts")
+    stored = frame.copy(deep=False)
+    stored.attrs = {k: v for k, v in frame.attrs.items() if k != "tray_layouts"}
+    result_store.put("plan", key, (stored, kpis))
+    if layouts is not None:
+        result_store.put("layouts", key, layouts)
+
+
+def load_result(key: str):
+    """The (frame, kpis) stored under key with its layouts back in attrs, or None."""
+    hit = result_store.get("plan", key)
+    if hit is None:
+        return None
+    frame, kpis = hit
+    layouts = result_store.get("layouts", key)
+    if layouts is not None:
+        frame.attrs["tray_layouts"] = layouts
+    return frame, kpis
+
+
+def run_and_store(key: str, func, *args, **kwargs):
+    """Worker side: func(*args, **kwargs), stored under key (when there is one) before returning."""
+    result = func(*args, **kwargs)
+    if key is not None:
+        store_result(key, result)
+    return result
@@ -0,0 +1,246 @@
+"""
+Opt-in profiling of single requests.
+
+With REQUEST_PROFILING=1 the app installs ProfilingMiddleware; a request sent
+with the header "X-Profile: 1" (or ?profile=1) then runs under
+- cProfile on the event loop thread, plus a cProfile of its optimizer call in
+  the executor worker (thread or process), merged into one pstats file;
+- a sampler that reads every thread's stack through sys._current_frames()
+  every PROFILE_SAMPLE_INTERVAL_S (and the worker's own thread in process
+  mode), written as collapsed stacks ("frame;frame;frame count") ready for
+  flamegraph.pl or speedscope.
+Both are saved in PROFILE_DIR under a profile id returned in the X-Profile-Id
+response header and served by the /admin/profiles endpoints. One request is
+profiled at a time; samples include whatever else the process ran meanwhile.
+Without REQUEST_PROFILING nothing is installed, so requests pay nothing.
+"""
+import contextvars
+import cProfile
+import collections
+import functools
+import json
+import os
+import pstats
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+PROFILING_ENABLED = os.getenv("REQUEST_PROFILING", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "verticallift-profiles"))
+PROFILE_SAMPLE_INTERVAL_S = float(os.getenv("PROFILE_SAMPLE_INTERVAL_S", "0.005"))
+# Newest profiles kept on disk
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+# When set, required (X-Admin-Token header) to trigger profiling and to read profiles
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+
+PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+_current = contextvars.ContextVar("profile_capture", default=None)
+_one_at_a_time = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Sampler:
+    """Background thread counting collapsed stacks of the given threads (all but itself when None)."""
+
+    def __init__(self, thread_ids=None, interval_s: float = PROFILE_SAMPLE_INTERVAL_S):
+        self.thread_ids = thread_ids
+        self.interval_s = interval_s
+        self.counts = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> collections.Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.thread_ids is not None and ident not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+
+def _write_collapsed(path: str, counts: collections.Counter):
+    with open(path, "w") as f:
+        for stack, count in counts.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+def _read_collapsed(path: str) -> collections.Counter:
+    counts = collections.Counter()
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            counts[stack] += int(count)
+    return counts
+
+
+def profiled_call(profile_id: str, part: str, sample: bool, call):
+    """
+    Worker side: run call() under cProfile (and, when sample, a sampler of this
+    thread), leaving <profile_id>.<part>.prof / .collapsed in PROFILE_DIR for
+    the request to merge.
+    """
+    profiler = cProfile.Profile()
+    sampler = _Sampler({threading.get_ident()}).start() if sample else None
+    profiler.enable()
+    try:
+        return call()
+    finally:
+        profiler.disable()
+        base = os.path.join(PROFILE_DIR, f"{profile_id}.{part}")
+        profiler.dump_stats(base + ".prof")
+        if sampler is not None:
+            _write_collapsed(base + ".collapsed", sampler.stop())
+
+
+class ProfileCapture:
+    """Profiling state of one request."""
+
+    def __init__(self, method: str, path: str):
+        self.profile_id = uuid.uuid4().hex
+        self.meta = {"profile_id": self.profile_id, "method": method, "path": path, "created": time.time()}
+        self.parts = []
+        self.profiler = cProfile.Profile()
+        self.sampler = _Sampler()
+        self.started = None
+
+    def wrap(self, call, process: bool):
+        """The executor call, profiled in the worker."""
+        part = f"worker{len(self.parts)}"
+        self.parts.append(part)
+        return functools.partial(profiled_call, self.profile_id, part, process, call)
+
+    def start(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        self.started = time.perf_counter()
+        self.sampler.start()
+        self.profiler.enable()
+
+    def finish(self, status_code):
+        self.profiler.disable()
+        counts = self.sampler.stop()
+        base = os.path.join(PROFILE_DIR, self.profile_id)
+        stats = pstats.Stats(self.profiler)
+        for part in self.parts:
+            part_base = f"{base}.{part}"
+            if os.path.exists(part_base + ".prof"):
+                stats.add(part_base + ".prof")
+                os.remove(part_base + ".prof")
+            if os.path.exists(part_base + ".collapsed"):
+                counts.update(_read_collapsed(part_base + ".collapsed"))
+                os.remove(part_base + ".collapsed")
+        stats.dump_stats(base + ".pstats")
+        _write_collapsed(base + ".collapsed", counts)
+        self.meta.update(
+            status_code=status_code,
+            duration_ms=round((time.perf_counter() - self.started) * 1000, 1),
+            samples=self.sampler.samples,
+            worker_calls=len(self.parts),
+        )
+        with open(base + ".json", "w") as f:
+            json.dump(self.meta, f)
+        print(f"[PROFILING] Saved profile {self.profile_id} for {self.meta['method']} {self.meta['path']} ({self.meta['duration_ms']} ms)")
+        _prune()
+
+
+def current_capture():
+    """The ProfileCapture of the request being handled, or None."""
+    return _current.get()
+
+
+def _prune():
+    metas = sorted(list_profiles(), key=lambda m: m["created"], reverse=True)
+    for meta in metas[PROFILE_KEEP:]:
+        for suffix in (".json", ".pstats", ".collapsed"):
+            path = os.path.join(PROFILE_DIR, meta["profile_id"] + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def list_profiles() -> list:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    metas = []
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith(".json"):
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                metas.append(json.load(f))
+    return sorted(metas, key=lambda m: m["created"], reverse=True)
+
+
+def profile_path(profile_id: str, suffix: str):
+    """Path of a saved profile file, or None for an unknown or malformed id."""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id + suffix)
+    return path if os.path.exists(path) else None
+
+
+def _wants_profile(scope) -> bool:
+    headers = dict(scope.get("headers") or [])
+    if PROFILE_ADMIN_TOKEN and headers.get(b"x-admin-token", b"").decode() != PROFILE_ADMIN_TOKEN:
+        return False
+    if headers.get(b"x-profile", b"").strip() in (b"1", b"true"):
+        return True
+    return re.search(rb"(^|&)profile=(1|true)(&|$)", scope.get("query_string", b"")) is not None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling the requests that ask for it (see module docstring)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            return await self.app(scope, receive, send)
+        if not _one_at_a_time.acquire(blocking=False):
+            async def send_skipped(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-profile-skipped", b"busy")]
+                await send(message)
+            return await self.app(scope, receive, send_skipped)
+
+        capture = ProfileCapture(scope["method"], scope["path"])
+        status = {}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", capture.profile_id.encode())]
+            await send(message)
+
+        token = _current.set(capture)
+        capture.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _current.reset(token)
+            try:
+                capture.finish(status.get("code"))
+            finally:
+                _one_at_a_time.release()
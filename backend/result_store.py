@@ -0,0 +1,175 @@
+"""
+Host-local result store shared by every worker process.
+
+A single SQLite file in WAL mode (readers never block the writer, so all
+uvicorn workers on the host can use it at once) holding namespaced
+key -> value entries with an expiry:
+- "plan": finished /optimize and /optimize-dividers results, by plan_key;
+- "layouts": the tray layouts of those results, by plan_key;
+- "job": the latest progress event of each job, by job_id.
+Values are pickled and zlib-compressed, so the file must be writable by this
+API alone: it defaults to APP_DATA_DIR (a 0700 directory, see data_dir.py),
+and a file or directory another user could write is refused (the store then
+stays off). Expired rows are ignored on read and deleted every
+RESULT_STORE_CLEANUP_S. RESULT_STORE_PATH="" turns the store off.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from data_dir import APP_DATA_DIR, private_file
+
+RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", os.path.join(APP_DATA_DIR, "results.sqlite3"))
+RESULT_STORE_TTL_S = int(os.getenv("RESULT_STORE_TTL_S", "3600"))
+RESULT_STORE_CLEANUP_S = int(os.getenv("RESULT_STORE_CLEANUP_S", "300"))
+# Level 1: most of the size win for a fraction of the CPU of the default level
+COMPRESS_LEVEL = 1
+
+_lock = threading.Lock()
+_conn = None
+_conn_pid = None
+_refused = None
+_last_cleanup = 0.0
+# put_later(): (namespace, key) -> (value, ttl_s) waiting for the writer thread
+_pending = {}
+_pending_ready = threading.Condition()
+_writer_pid = None
+
+
+def _connect():
+    """This process's connection (reopened after a fork), or None when the store is off."""
+    global _conn, _conn_pid, _refused
+    if not RESULT_STORE_PATH or _refused:
+        return None
+    if _conn is None or _conn_pid != os.getpid():
+        try:
+            private_file(RESULT_STORE_PATH)
+        except PermissionError as e:
+            _refused = str(e)
+            print(f"[RESULT STORE] Store disabled, {RESULT_STORE_PATH} is not private: {e}")
+            return None
+        conn = sqlite3.connect(RESULT_STORE_PATH, timeout=5, check_same_thread=False, isolation_level=None)
+        os.chmod(RESULT_STORE_PATH, 0o600)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, expires_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_expires_at ON entries (expires_at)")
+        _conn, _conn_pid = conn, os.getpid()
+    return _conn
+
+
+def encode(value) -> bytes:
+    return zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), COMPRESS_LEVEL)
+
+
+def decode(blob: bytes):
+    return pickle.loads(zlib.decompress(blob))
+
+
+def put(namespace: str, key: str, value, ttl_s: int = RESULT_STORE_TTL_S) -> bool:
+    """Store value under (namespace, key) for ttl_s seconds; False when the store is off or failed."""
+    try:
+        blob = encode(value)
+        with _lock:
+            conn = _connect()
+            if conn is None:
+                return False
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, blob, now + ttl_s),
+            )
+            _cleanup(conn, now)
+        return True
+    except Exception as e:
+        # The store is an optimization; a locked or unwritable file must not fail the request
+        print(f"[RESULT STORE] Could not write {namespace}/{key}: {e}")
+        return False
+
+
+def put_later(namespace: str, key: str, value, ttl_s: int = RESULT_STORE_TTL_S):
+    """
+    put() on this process's writer thread, for callers on the event loop that
+    must not wait on the file lock. Writes keep their order; a value still
+    waiting is replaced by a newer one for the same key.
+    """
+    global _writer_pid
+    if not RESULT_STORE_PATH:
+        return
+    with _pending_ready:
+        _pending[(namespace, key)] = (value, ttl_s)
+        if _writer_pid != os.getpid():
+            _writer_pid = os.getpid()
+            threading.Thread(target=_write_pending, name="result-store-writer", daemon=True).start()
+        _pending_ready.notify()
+
+
+def _write_pending():
+    while True:
+        with _pending_ready:
+            while not _pending:
+                _pending_ready.wait()
+            batch = list(_pending.items())
+            _pending.clear()
+        for (namespace, key), (value, ttl_s) in batch:
+            put(namespace, key, value, ttl_s)
+
+
+def get(namespace: str, key: str, default=None):
+    """The unexpired value under (namespace, key), else default."""
+    try:
+        with _lock:
+            conn = _connect()
+            if conn is None:
+                return default
+            row = conn.execute(
+                "SELECT value FROM entries WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, time.time()),
+            ).fetchone()
+        return decode(row[0]) if row else default
+    except Exception as e:
+        print(f"[RESULT STORE] Could not read {namespace}/{key}: {e}")
+        return default
+
+
+def delete(namespace: str, key: str):
+    try:
+        with _lock:
+            conn = _connect()
+            if conn is not None:
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+    except Exception as e:
+        print(f"[RESULT STORE] Could not delete {namespace}/{key}: {e}")
+
+
+def _cleanup(conn, now: float):
+    """Delete expired rows, at most every RESULT_STORE_CLEANUP_S per process."""
+    global _last_cleanup
+    if now - _last_cleanup < RESULT_STORE_CLEANUP_S:
+        return
+    _last_cleanup = now
+    removed = conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+    if removed:
+        print(f"[RESULT STORE] Removed {removed} expired entries")
+
+
+def store_stats() -> dict:
+    """Entry counts per namespace (unexpired), for /health."""
+    try:
+        with _lock:
+            conn = _connect()
+            if conn is None:
+                return {"enabled": False, "refused": _refused} if _refused else {"enabled": False}
+            rows = conn.execute(
+                "SELECT namespace, COUNT(*), SUM(LENGTH(value)) FROM entries WHERE expires_at > ? GROUP BY namespace",
+                (time.time(),),
+            ).fetchall()
+        return {"enabled": True, "path": RESULT_STORE_PATH, "entries": {ns: {"count": n, "bytes": b} for ns, n, b in rows}}
+    except Exception as e:
+        return {"enabled": True, "path": RESULT_STORE_PATH, "error": str(e)}
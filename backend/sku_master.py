@@ -0,0 +1,122 @@
+"""
+SKU master (skus table) helpers.
+
+Inventory and daily sales rows hold the integer Sku.id. These helpers map SKU
+codes to ids on the way in, and select inventory with the SKU attributes
+joined back in (the code as sku_id) on the way out, so the API keeps its
+response shape. Runs on a sync Session; async callers go through
+AsyncSession.run_sync.
+"""
+import pandas as pd
+from sqlalchemy import select, insert, update, bindparam
+from models import Sku, Inventory, DailySales
+
+# Attributes of the physical item, kept once in the master
+SKU_COLUMNS = ["description", "length_in", "width_in", "height_in", "weight_lb"]
+# Every field of an inventory row as the API returns it
+INVENTORY_FIELDS = [
+    "id", "sku_id", "description", "length_in", "width_in", "height_in", "weight_lb",
+    "on_hand_units", "on_shelf_units", "annual_units_sold", "daily_picks", "demand_std_dev", "inventory_list_id",
+]
+# Codes per IN (...) lookup, well under SQLite's bound-parameter limit
+LOOKUP_BATCH = 5000
+
+
+def select_inventory(columns: list):
+    """SELECT of inventory fields by name: sku_id is the SKU code, SKU attributes come from the master."""
+    selected = []
+    for column in columns:
+        if column == "sku_id":
+            selected.append(Sku.sku_code.label("sku_id"))
+        elif column in SKU_COLUMNS:
+            selected.append(getattr(Sku, column))
+        else:
+            selected.append(getattr(Inventory, column))
+    return select(*selected).select_from(Inventory).join(Sku, Inventory.sku_id == Sku.id)
+
+
+def select_daily_sales():
+    """SELECT of daily sales rows with the SKU code as sku_id."""
+    return (
+        select(DailySales.id, DailySales.date, Sku.sku_code.label("sku_id"), DailySales.units_sold, DailySales.inventory_list_id)
+        .select_from(DailySales)
+        .join(Sku, DailySales.sku_id == Sku.id)
+    )
+
+
+def _existing_ids(session, codes: list) -> dict:
+    ids = {}
+    for start in range(0, len(codes), LOOKUP_BATCH):
+        batch = codes[start:start + LOOKUP_BATCH]
+        ids.update(session.execute(select(Sku.sku_code, Sku.id).where(Sku.sku_code.in_(batch))).all())
+    return ids
+
+
+def _insert_new(session, rows: list):
+    """
+    INSERT master rows, skipping codes another transaction added meanwhile
+    (ON CONFLICT DO NOTHING on PostgreSQL and SQLite); callers re-select the ids.
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        session.execute(insert(Sku), rows)
+        return
+    session.execute(dialect_insert(Sku).on_conflict_do_nothing(index_elements=["sku_code"]), rows)
+
+
+def sku_ids(session, codes) -> dict:
+    """code -> id for codes, adding bare master rows for unknown codes (e.g. sales of unlisted SKUs)."""
+    codes = list(dict.fromkeys(str(c) for c in codes))
+    ids = _existing_ids(session, codes)
+    missing = [{"sku_code": c} for c in codes if c not in ids]
+    if missing:
+        _insert_new(session, missing)
+        ids.update(_existing_ids(session, [m["sku_code"] for m in missing]))
+    return ids
+
+
+def _existing_rows(session, codes: list) -> dict:
+    """code -> (id, *SKU_COLUMNS) of the master rows of codes."""
+    rows = {}
+    for start in range(0, len(codes), LOOKUP_BATCH):
+        batch = codes[start:start + LOOKUP_BATCH]
+        query = select(Sku.sku_code, Sku.id, *(getattr(Sku, c) for c in SKU_COLUMNS)).where(Sku.sku_code.in_(batch))
+        rows.update((row[0], tuple(row[1:])) for row in session.execute(query))
+    return rows
+
+
+def upsert_skus(session, items: pd.DataFrame) -> dict:
+    """
+    Add or update the master rows of items (sku_id codes plus SKU_COLUMNS):
+    the latest import of a code sets its description and dimensions for every
+    list. Only rows whose values differ are updated. Returns code -> id.
+    """
+    frame = items[["sku_id"] + SKU_COLUMNS].astype(object)
+    frame = frame.where(frame.notna(), None)
+    frame["sku_id"] = frame["sku_id"].astype(str)
+    records = {r["sku_id"]: r for r in frame.to_dict(orient="records")}
+    existing = _existing_rows(session, list(records))
+    ids = {code: row[0] for code, row in existing.items()}
+
+    changed = [
+        dict({f"b_{c}": r[c] for c in SKU_COLUMNS}, b_id=ids[code])
+        for code, r in records.items()
+        if code in existing and tuple(r[c] for c in SKU_COLUMNS) != existing[code][1:]
+    ]
+    new = [dict({c: r[c] for c in SKU_COLUMNS}, sku_code=code) for code, r in records.items() if code not in ids]
+    if new:
+        # A concurrent import of the same codes may insert them first; theirs is kept
+        _insert_new(session, new)
+        ids.update(_existing_ids(session, [n["sku_code"] for n in new]))
+    if changed:
+        print(f"[SKU MASTER] Updating description/dimensions of {len(changed)} existing SKUs (shared by every list that holds them)")
+        table = Sku.__table__
+        session.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values({c: bindparam(f"b_{c}") for c in SKU_COLUMNS}),
+            changed,
+        )
+    return ids
@@ -0,0 +1,156 @@
+"""
+Persisted per-SKU slot geometry (SlotGeometry side table).
+
+Orientation, layers and footprint dims depend only on the SKU dimensions and
+the tray depth, so they are computed once per (inventory list, tray config)
+when inventory is imported or a tray config is saved (for GEOMETRY_BUFFER_PCT),
+instead of on every optimization. The optimize endpoints load the rows for the
+matching tray config and buffer and hand them to the engines as
+stored_geometry; a buffer with no rows yet is computed and stored on that
+first request.
+"""
+import os
+import traceback
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.exc import SQLAlchemyError
+from models import Inventory, TrayConfig, SlotGeometry
+from sku_master import select_inventory
+
+# Buffer the geometry is precomputed for (the optimize form default)
+GEOMETRY_BUFFER_PCT = float(os.getenv("GEOMETRY_BUFFER_PCT", "0.95"))
+
+# Tray dimensions / buffers closer than this are the same (stored as floats)
+MATCH_TOLERANCE = 1e-6
+
+DIMENSION_COLUMNS = ["length_in", "width_in", "height_in"]
+GEOMETRY_COLUMNS = ["height_orientation", "layers", "grid_dim1", "grid_dim2"]
+
+
+def geometry_rows(df: pd.DataFrame, inventory_list_id: str, tray_config: TrayConfig, buffer_pct: float = GEOMETRY_BUFFER_PCT) -> list:
+    """SlotGeometry rows for every SKU of df on one tray config."""
+    from algorithms.geometry import choose_vertical_orientation
+
+    if df.empty or not tray_config.tray_depth_in:
+        return []
+    orientation = choose_vertical_orientation(df, tray_config.tray_depth_in * buffer_pct)
+    layers = np.where(np.isnan(orientation["layers"]) | (orientation["layers"] <= 0), 1, orientation["layers"])
+    frame = pd.DataFrame({
+        "inventory_list_id": inventory_list_id,
+        "tray_config_id": tray_config.id,
+        "buffer_pct": buffer_pct,
+        "sku_id": df["sku_id"].astype(str).to_numpy(),
+        **{c: df[c].to_numpy(dtype=float) for c in DIMENSION_COLUMNS},
+        "height_orientation": orientation["height_orientation"],
+        "layers": layers,
+        "grid_dim1": orientation["grid_dim1"],
+        "grid_dim2": orientation["grid_dim2"],
+    }).drop_duplicates("sku_id", keep="last")
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict(orient="records")
+
+
+def refresh_slot_geometry(session, inventory_list_id: str = None, tray_config_id: int = None, df: pd.DataFrame = None, buffer_pct: float = GEOMETRY_BUFFER_PCT, only_buffer: bool = False) -> int:
+    """
+    Recompute the stored geometry for one inventory list (all tray configs), one
+    tray config (all lists) or one pair, replacing what was there (every buffer,
+    or only buffer_pct with only_buffer=True). df may carry the list's inventory
+    when the caller already has it (import). Runs on a sync Session; async
+    callers go through AsyncSession.run_sync. Returns rows written.
+    """
+    try:
+        # Savepoint: a failure here must not take the caller's import / save down with it
+        with session.begin_nested():
+            return _refresh(session, inventory_list_id, tray_config_id, df, buffer_pct, only_buffer)
+    except (SQLAlchemyError, ValueError) as e:
+        print(f"[SLOT GEOMETRY] Could not store geometry: {e}")
+        return 0
+    except Exception:
+        print(f"[SLOT GEOMETRY] ERROR: unexpected failure storing geometry (list {inventory_list_id}, tray config {tray_config_id})")
+        traceback.print_exc()
+        return 0
+
+
+def _refresh(session, inventory_list_id, tray_config_id, df, buffer_pct, only_buffer=False):
+    configs_query = select(TrayConfig)
+    if tray_config_id is not None:
+        configs_query = configs_query.where(TrayConfig.id == tray_config_id)
+    configs = session.execute(configs_query).scalars().all()
+
+    if inventory_list_id is not None:
+        list_ids = [inventory_list_id]
+    else:
+        list_ids = session.execute(select(Inventory.inventory_list_id).distinct()).scalars().all()
+
+    stale = delete(SlotGeometry)
+    if inventory_list_id is not None:
+        stale = stale.where(SlotGeometry.inventory_list_id == inventory_list_id)
+    if tray_config_id is not None:
+        stale = stale.where(SlotGeometry.tray_config_id == tray_config_id)
+    if only_buffer:
+        stale = stale.where(func.abs(SlotGeometry.buffer_pct - buffer_pct) < MATCH_TOLERANCE)
+    session.execute(stale)
+
+    written = 0
+    for list_id in list_ids:
+        items = df
+        if items is None or list_id != inventory_list_id:
+            result = session.execute(select_inventory(["sku_id"] + DIMENSION_COLUMNS).where(Inventory.inventory_list_id == list_id))
+            items = pd.DataFrame(result.all(), columns=["sku_id"] + DIMENSION_COLUMNS)
+        items = items.dropna(subset=["sku_id"])
+        for config in configs:
+            rows = geometry_rows(items, list_id, config, buffer_pct)
+            if rows:
+                session.execute(insert(SlotGeometry), rows)
+                written += len(rows)
+    print(f"[SLOT GEOMETRY] Stored {written} rows for {len(list_ids)} list(s) x {len(configs)} tray config(s)")
+    return written
+
+
+async def load_stored_geometry(db, inventory_list_id: str, tray_length_in: float, tray_width_in: float, tray_depth_in: float, buffer_pct: float):
+    """
+    Stored geometry for a list on the tray config with these dimensions, as a
+    DataFrame indexed by sku_id (with the dimensions it was computed from), or
+    None when there is no matching tray config or nothing stored.
+    """
+    if not inventory_list_id:
+        return None
+    config_id = (await db.execute(
+        select(TrayConfig.id).where(
+            func.abs(TrayConfig.tray_length_in - tray_length_in) < MATCH_TOLERANCE,
+            func.abs(TrayConfig.tray_width_in - tray_width_in) < MATCH_TOLERANCE,
+            func.abs(TrayConfig.tray_depth_in - tray_depth_in) < MATCH_TOLERANCE,
+        ).order_by(TrayConfig.id).limit(1)
+    )).scalar_one_or_none()
+    if config_id is None:
+        return None
+    return await load_config_geometry(db, inventory_list_id, config_id, buffer_pct)
+
+
+async def load_config_geometry(db, inventory_list_id: str, tray_config_id: int, buffer_pct: float):
+    """
+    Stored geometry for a list on one tray config (see load_stored_geometry).
+    The first request for a buffer with nothing stored computes and stores it.
+    """
+    stored = await _select_geometry(db, inventory_list_id, tray_config_id, buffer_pct)
+    if stored.empty:
+        written = await db.run_sync(refresh_slot_geometry, inventory_list_id, tray_config_id, None, buffer_pct, True)
+        if not written:
+            return None
+        await db.commit()
+        stored = await _select_geometry(db, inventory_list_id, tray_config_id, buffer_pct)
+    # Two first requests may both have stored the buffer; the rows are the same
+    return stored.drop_duplicates("sku_id", keep="last").set_index("sku_id")
+
+
+async def _select_geometry(db, inventory_list_id, tray_config_id, buffer_pct):
+    columns = ["sku_id"] + DIMENSION_COLUMNS + GEOMETRY_COLUMNS
+    result = await db.execute(
+        select(*[getattr(SlotGeometry, c) for c in columns]).where(
+            SlotGeometry.inventory_list_id == inventory_list_id,
+            SlotGeometry.tray_config_id == tray_config_id,
+            func.abs(SlotGeometry.buffer_pct - buffer_pct) < MATCH_TOLERANCE,
+        )
+    )
+    return pd.DataFrame(result.all(), columns=columns)
@@ -0,0 +1,24 @@
+"""
+Shared fixtures. The tests import the backend modules the way the app does
+(from backend/ as the working directory), so put backend/ on sys.path.
+
+Run from backend/:
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def skus():
+    """300 synthetic SKUs that fit the default tray, on-shelf units set."""
+    from benchmarks.load_test import synthetic_skus
+
+    df = synthetic_skus(300, np.random.default_rng(0))
+    df["on_shelf_units"] = df["on_hand_units"]
+    return df
@@ -0,0 +1,96 @@
+"""
+The tray lower bounds never exceed the optimum. Optima come from brute force
+on small integer instances: every assignment of items to bins, each bin
+checked by trying every integer position for every item.
+"""
+import functools
+import itertools
+
+import numpy as np
+import pytest
+
+from algorithms.bounds import l2_bound_1d, lower_bounds
+
+
+def min_bins(items, fits):
+    """Fewest bins for items, where fits(tuple_of_items) says whether a bin holds them."""
+    n = len(items)
+    for k in range(1, n + 1):
+        # Item i goes into one of the bins already used or the next new one
+        def assign(i, bins):
+            if i == n:
+                return all(fits(tuple(sorted(b))) for b in bins)
+            for b in bins:
+                b.append(items[i])
+                if fits(tuple(sorted(b))) and assign(i + 1, bins):
+                    return True
+                b.pop()
+            if len(bins) < k:
+                bins.append([items[i]])
+                if fits((items[i],)) and assign(i + 1, bins):
+                    return True
+                bins.pop()
+            return False
+        if assign(0, []):
+            return k
+    return n
+
+
+def tray_fits(W, L, rotation):
+    @functools.lru_cache(maxsize=None)
+    def fits(rects):
+        if sum(w * l for w, l in rects) > W * L:
+            return False
+        grid = np.zeros((W, L), dtype=bool)
+
+        def place(i):
+            if i == len(rects):
+                return True
+            w, l = rects[i]
+            for dw, dl in {(w, l), (l, w)} if rotation else {(w, l)}:
+                for x, y in itertools.product(range(W - dw + 1), range(L - dl + 1)):
+                    if not grid[x:x + dw, y:y + dl].any():
+                        grid[x:x + dw, y:y + dl] = True
+                        if place(i + 1):
+                            grid[x:x + dw, y:y + dl] = False
+                            return True
+                        grid[x:x + dw, y:y + dl] = False
+            return False
+        return place(0)
+    return fits
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_l2_1d_at_most_optimum(seed):
+    rng = np.random.default_rng(seed)
+    C = int(rng.integers(5, 20))
+    sizes = [int(s) for s in rng.integers(1, C + 1, int(rng.integers(1, 9)))]
+    optimum = min_bins(sorted(sizes, reverse=True), lambda b: sum(b) <= C)
+    assert l2_bound_1d(sizes, C) <= optimum
+
+
+@pytest.mark.parametrize("rotation", [False, True])
+@pytest.mark.parametrize("seed", range(60))
+def test_tray_bounds_at_most_optimum(seed, rotation):
+    rng = np.random.default_rng(seed)
+    W, L = (int(v) for v in rng.integers(3, 7, 2))
+    n = int(rng.integers(2, 7))
+    # Sides up to the full tray, so about half the items are over half of it
+    w = rng.integers(1, W + 1, n)
+    l = rng.integers(1, L + 1, n)
+    if rotation:
+        keep = ((w <= W) & (l <= L)) | ((l <= W) & (w <= L))
+        w, l = w[keep], l[keep]
+    rects = sorted(((int(a), int(b)) for a, b in zip(w, l)), key=lambda r: -r[0] * r[1])
+    if not rects:
+        return
+    optimum = min_bins(rects, tray_fits(W, L, rotation))
+    bounds = lower_bounds(w, l, W, L, rotation=rotation)
+    assert bounds['lower_bound_trays'] <= optimum
+    assert bounds['lower_bound_trays'] >= bounds['area']
+
+
+def test_l2_beats_area_bound():
+    # Three items just over half the bin: area says 2, any packing needs 3
+    assert l2_bound_1d([6, 6, 6], 10) == 3
+    assert lower_bounds([6, 6, 6], [9, 9, 9], 10, 10)['lower_bound_trays'] == 3
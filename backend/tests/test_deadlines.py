@@ -0,0 +1,53 @@
+"""
+Every engine stops at its deadline and returns a marked partial plan.
+The token's deadline has already passed when the engine starts, so each
+engine runs until its first check and returns from there.
+"""
+import time
+
+import pytest
+
+from algorithms.cancellation import CancelToken, RunCancelled
+from algorithms.registry import engine_names
+from optimiser import optimise, optimise_plan
+from plan_cache import store_result
+
+# Generous for one slow CPU; without the deadline the larger engines take several seconds
+RETURN_WITHIN_S = 3.0
+
+
+def expired_token():
+    token = CancelToken(deadline_ms=1)
+    time.sleep(0.01)
+    return token
+
+
+@pytest.mark.parametrize("model", engine_names(include_aliases=False))
+def test_engine_returns_partial_plan_at_deadline(model, skus):
+    started = time.perf_counter()
+    plan = optimise(skus, model=model, cancel_token=expired_token())
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < RETURN_WITHIN_S
+    marker = plan.attrs.get('incomplete')
+    assert marker and marker['reason'] == 'deadline'
+    assert 0 < len(marker['unplaced_skus']) <= len(skus)
+    # SKUs that were not reached stay in the plan
+    assert set(plan['sku_id']) == set(skus['sku_id'])
+
+
+@pytest.mark.parametrize("model", ["rectpack", "simple"])
+def test_partial_plan_kpis_are_marked_and_not_stored(model, skus, monkeypatch):
+    stored = []
+    monkeypatch.setattr("plan_cache.result_store.put", lambda *args: stored.append(args))
+    plan, kpis = optimise_plan(skus, model=model, cancel_token=expired_token())
+    assert kpis['incomplete']['reason'] == 'deadline'
+    store_result("key", (plan, kpis))
+    assert stored == []
+
+
+def test_cancelled_run_raises(skus):
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(RunCancelled):
+        optimise(skus, model="rectpack", cancel_token=token)
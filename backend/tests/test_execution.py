@@ -0,0 +1,94 @@
+"""run_single_flight: concurrent identical requests share one run and take one slot."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+import execution
+
+
+@pytest.fixture
+def one_slot(monkeypatch):
+    """A fresh thread pool and a single optimization slot, torn down afterwards."""
+    monkeypatch.setattr(execution, "OPTIMIZE_EXECUTOR", "thread")
+    monkeypatch.setattr(execution, "OPTIMIZE_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(execution, "_executor", None)
+    monkeypatch.setattr(execution, "_semaphore", None)
+    monkeypatch.setattr(execution, "_in_flight", {})
+    monkeypatch.setattr(execution, "_flight_stats", {"leaders": 0, "followers": 0})
+    yield
+    execution.shutdown_executor()
+
+
+class CountingRun:
+    """A slow CPU-bound stand-in that counts how often it actually ran."""
+
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def __call__(self, value):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.2)
+        if self.fail:
+            raise ValueError("engine failed")
+        return {"value": value}
+
+
+def test_same_key_runs_once(one_slot):
+    run = CountingRun()
+
+    async def main():
+        return await asyncio.gather(*[execution.run_single_flight("key-a", run, 1) for _ in range(4)])
+
+    results = asyncio.run(main())
+    assert run.calls == 1
+    # Followers get the leader's result object, and none of them needed a slot
+    assert all(result is results[0] for result in results)
+    assert execution.single_flight_stats() == {"leaders": 1, "followers": 3, "in_flight": 0}
+
+
+def test_followers_share_the_exception(one_slot):
+    run = CountingRun(fail=True)
+
+    async def main():
+        return await asyncio.gather(*[execution.run_single_flight("key-b", run, 1) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert run.calls == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    assert execution.single_flight_stats()["in_flight"] == 0
+
+
+def test_finished_runs_are_not_reused(one_slot):
+    run = CountingRun()
+
+    async def main():
+        await execution.run_single_flight("key-c", run, 1)
+        await execution.run_single_flight("key-c", run, 1)
+        await execution.run_single_flight(None, run, 1)
+        await execution.run_single_flight(None, run, 1)
+
+    asyncio.run(main())
+    assert run.calls == 4
+    assert execution.single_flight_stats()["followers"] == 0
+
+
+def test_other_keys_need_their_own_slot(one_slot):
+    run = CountingRun()
+
+    async def main():
+        return await asyncio.gather(
+            execution.run_single_flight("key-d", run, 1),
+            execution.run_single_flight("key-e", run, 2),
+            return_exceptions=True,
+        )
+
+    first, second = asyncio.run(main())
+    assert first == {"value": 1}
+    # The only slot is held by key-d's run, so key-e is turned away with a 429
+    assert getattr(second, "status_code", None) == 429
+    assert run.calls == 1
@@ -0,0 +1,55 @@
+"""slot_grid against the per-SKU loop it replaced in the rectpack engine."""
+import numpy as np
+import pytest
+
+from algorithms.geometry import slot_grid
+
+
+def slot_grid_loop(units, dim1, dim2, effective_tray_width, effective_tray_length):
+    """The original per-row search from rectpack_algorithm."""
+    widths, lengths = [], []
+    for u, d1, d2 in zip(units, dim1, dim2):
+        best_width, best_length = d1, d2
+        min_waste = float('inf')
+        for cols in range(1, min(int(np.sqrt(u)) + 3, int(effective_tray_width / d1) + 1)):
+            rows = int(np.ceil(u / cols))
+            if rows <= 0:
+                continue
+            slot_w = cols * d1
+            slot_l = rows * d2
+            if slot_w <= effective_tray_width and slot_l <= effective_tray_length:
+                waste = (cols * rows) - u
+                if waste < min_waste:
+                    min_waste = waste
+                    best_width = slot_w
+                    best_length = slot_l
+        if best_width > effective_tray_width or best_length > effective_tray_length:
+            best_width = min(d1, effective_tray_width)
+            best_length = min(d2, effective_tray_length)
+        widths.append(best_width)
+        lengths.append(best_length)
+    return np.array(widths), np.array(lengths)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_slot_grid_matches_loop(seed):
+    rng = np.random.default_rng(seed)
+    n = 500
+    W = rng.uniform(10, 40)
+    L = rng.uniform(30, 160)
+    units = rng.integers(1, 600, n)
+    # Some items wider or longer than the tray, so the no-fit path is covered
+    dim1 = rng.uniform(0.3, W * 1.2, n).round(1)
+    dim2 = rng.uniform(0.3, L / 4, n).round(1)
+
+    grid = slot_grid(units, dim1, dim2, W, L)
+    widths, lengths = slot_grid_loop(units, dim1, dim2, W, L)
+
+    np.testing.assert_array_equal(grid["slot_w"], widths)
+    np.testing.assert_array_equal(grid["slot_l"], lengths)
+    assert not grid["found"].all()
+
+
+def test_slot_grid_empty():
+    grid = slot_grid([], [], [], 34.2, 148.2)
+    assert all(len(values) == 0 for values in grid.values())
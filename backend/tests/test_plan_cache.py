@@ -0,0 +1,46 @@
+"""plan_key: identical requests share a key, anything that changes the result does not."""
+import os
+import subprocess
+import sys
+
+from plan_cache import plan_key
+
+
+def test_same_request_same_key(skus):
+    key = plan_key("optimize", skus, model="rectpack", buffer_pct=0.95, tray_config_id=1)
+    assert key == plan_key("optimize", skus.copy(), model="rectpack", buffer_pct=0.95, tray_config_id=1)
+    # Keyword order does not matter
+    assert key == plan_key("optimize", skus, tray_config_id=1, buffer_pct=0.95, model="rectpack")
+
+
+def test_key_ignores_index(skus):
+    shifted = skus.copy()
+    shifted.index = shifted.index + 1000
+    assert plan_key("optimize", skus, model="rectpack") == plan_key("optimize", shifted, model="rectpack")
+
+
+def test_key_changes_with_rows_params_and_kind(skus):
+    key = plan_key("optimize", skus, model="rectpack", buffer_pct=0.95)
+    edited = skus.copy()
+    edited.loc[0, "on_shelf_units"] += 1
+    assert key != plan_key("optimize", edited, model="rectpack", buffer_pct=0.95)
+    assert key != plan_key("optimize", skus.iloc[::-1], model="rectpack", buffer_pct=0.95)
+    assert key != plan_key("optimize", skus.drop(columns=["description"]), model="rectpack", buffer_pct=0.95)
+    assert key != plan_key("optimize", skus, model="rectpack", buffer_pct=0.9)
+    assert key != plan_key("optimize", skus, model="simple", buffer_pct=0.95)
+    assert key != plan_key("optimize-dividers", skus, model="rectpack", buffer_pct=0.95)
+
+
+def test_key_stable_across_processes(skus):
+    # Workers in other processes must find results stored by this one
+    code = (
+        "import numpy as np\n"
+        "from benchmarks.load_test import synthetic_skus\n"
+        "from plan_cache import plan_key\n"
+        "df = synthetic_skus(300, np.random.default_rng(0))\n"
+        "df['on_shelf_units'] = df['on_hand_units']\n"
+        "print(plan_key('optimize', df, model='rectpack', buffer_pct=0.95))\n"
+    )
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, "-c", code], cwd=backend, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == plan_key("optimize", skus, model="rectpack", buffer_pct=0.95)
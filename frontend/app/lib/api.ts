@@ -18,6 +18,12 @@ export const API_ENDPOINTS = {
     inventoryListId ? apiUrl(`/daily-sales?inventory_list_id=${inventoryListId}`) : apiUrl('/daily-sales'),
   optimize: () => apiUrl('/optimize'),
   optimizeDividers: () => apiUrl('/optimize-dividers'),
+  estimate: () => apiUrl('/estimate'),
+  optimizeConfigs: () => apiUrl('/optimize-configs'),
+  trayDesignSearch: () => apiUrl('/tray-design-search'),
+  jobEvents: (jobId: string) => apiUrl(`/jobs/${jobId}/events`),
+  job: (jobId: string) => apiUrl(`/jobs/${jobId}`),
+  planLayouts: (planKey: string) => apiUrl(`/plans/${planKey}/layouts`),
   importInventory: () => apiUrl('/import-inventory'),
   importDailySales: () => apiUrl('/import-daily-sales'),
   updateOnShelfUnits: (inventoryListId: string) => 